@@ -19,6 +19,23 @@ ENTITY_PATH = DATA_PATH / "entities"
 ICON_PATH = DATA_PATH / "icons"
 CACHE = DATA_PATH / "cache"
 
+# Number of background processes rendering awarded stickers; 0 renders lazily
+STICKER_PRERENDER_WORKERS = 2
+# Requests wait this long for a sticker being prerendered, then render it
+STICKER_PRERENDER_WAIT_S = 5
+# Least recently used stickers are evicted when the cache grows over this
+STICKER_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Printer is considered dead after this long without a heartbeat
+PRINTER_TTL_S = 60
+# Print jobs sent to printers concurrently (at most one per printer)
+PRINT_WORKERS = 4
+PRINT_MAX_ATTEMPTS = 5
+# Failed jobs are retried at least this long, so a printer restarting within
+# its TTL still gets them
+PRINT_RETRY_WINDOW_S = PRINTER_TTL_S
+PRINT_TIMEOUT_S = 15
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
@@ -86,7 +103,12 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
-    "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+    "DEFAULT_RENDERER_CLASSES": ("game.renderers.ORJSONRenderer",),
+    "DEFAULT_PARSER_CLASSES": (
+        "game.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="announcement",
+            name="updatedAt",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
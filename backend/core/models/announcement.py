@@ -36,7 +36,7 @@ class AnnouncementManager(models.Manager):
         )
 
     def get_team(self, team: Optional[Team]) -> QuerySet[Announcement]:
-        return self.get_visible().filter(teams=team).prefetch_related("readevent_set")
+        return self.get_visible().filter(teams=team)
 
     def get_visible(self) -> QuerySet[Announcement]:
         return (
@@ -67,6 +67,7 @@ class Announcement(models.Model):
     type: AnnouncementType = enum.EnumField(AnnouncementType, default=AnnouncementType.normal)  # type: ignore
     appearDatetime = models.DateTimeField("Time of public appearance")
     content = models.TextField("Message content")
+    updatedAt = models.DateTimeField(auto_now=True)
     teams = models.ManyToManyField(Team)
     read = models.ManyToManyField(User, through="ReadEvent")
 
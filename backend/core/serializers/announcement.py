@@ -1,7 +1,10 @@
+from collections import defaultdict
+from typing import Any, Iterable, Optional
+
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 
-from core.models.announcement import Announcement, AnnouncementType
+from core.models.announcement import Announcement, AnnouncementType, ReadEvent
 from core.models.team import Team
 from core.models.user import User
 from core.serializers.fields import TextEnumSerializer
@@ -74,9 +77,15 @@ class AnnouncementSerializer(serializers.ModelSerializer):
 
 
 def team_serialize_announcement(
-    announcement: Announcement, *, read: bool, org_info: bool = False
+    announcement: Announcement,
+    *,
+    read: bool,
+    org_info: bool = False,
+    readBy: Optional[Iterable[str]] = None,
 ):
-    orgInfo = {"readBy": set([a.team.name for a in announcement.read.all()])}
+    if org_info and readBy is None:
+        readBy = set([a.team.name for a in announcement.read.all()])
+    orgInfo = {"readBy": sorted(readBy or [])}
     return {
         "id": announcement.id,
         "type": announcement.type.name,
@@ -85,3 +94,38 @@ def team_serialize_announcement(
         "appearDatetime": announcement.appearDatetime,
         **(orgInfo if org_info else {}),
     }
+
+
+def team_serialize_announcements(
+    announcements: Iterable[Announcement],
+    *,
+    user: User,
+    read: Optional[bool] = None,
+    org_info: bool = False,
+) -> list[dict[str, Any]]:
+    """
+    Serializes announcements like team_serialize_announcement; whether the
+    user read them (unless given by read) and which teams read them is
+    fetched by a single query for all of them
+    """
+    announcements = list(announcements)
+    readByUser: set[int] = set()
+    readBy: defaultdict[int, set[str]] = defaultdict(set)
+    if read is None or org_info:
+        readEvents = ReadEvent.objects.filter(
+            announcement__in=announcements
+        ).values_list("announcement", "user", "user__team__name")
+        for announcementId, userId, teamName in readEvents:
+            if userId == user.id:
+                readByUser.add(announcementId)
+            if teamName is not None:
+                readBy[announcementId].add(teamName)
+    return [
+        team_serialize_announcement(
+            a,
+            read=a.id in readByUser if read is None else read,
+            org_info=org_info,
+            readBy=readBy[a.id],
+        )
+        for a in announcements
+    ]
@@ -1,13 +1,56 @@
+from typing import Optional
+
+from django.db.models.query import QuerySet
 from django.shortcuts import get_object_or_404
 from rest_framework import filters, viewsets
 from rest_framework.decorators import action
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
 from rest_framework.response import Response
 
 from core.models.announcement import Announcement, AnnouncementType
 from core.serializers import AnnouncementSerializer
-from core.serializers.announcement import team_serialize_announcement
+from core.serializers.announcement import team_serialize_announcements
+
+
+class AnnouncementCursorPagination(CursorPagination):
+    """
+    Opt-in pagination of team announcement lists: it applies only to requests
+    asking for a cursor or a page size, so clients expecting the whole list
+    keep getting it
+    """
+
+    ordering = ("-appearDatetime", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (
+            self.cursor_query_param not in request.query_params
+            and self.page_size_query_param not in request.query_params
+        ):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+def team_announcements_response(
+    request: Request,
+    announcements: QuerySet[Announcement],
+    *,
+    unpaginatedLimit: Optional[int] = None,
+) -> Response:
+    paginator = AnnouncementCursorPagination()
+    page = paginator.paginate_queryset(announcements, request)
+    data = team_serialize_announcements(
+        page if page is not None else announcements[:unpaginatedLimit],
+        user=request.user,
+        org_info=request.user.is_org,
+    )
+    if page is None:
+        return Response(data)
+    return paginator.get_paginated_response(data)
 
 
 class AnnouncementViewSet(viewsets.ModelViewSet):
@@ -27,12 +70,6 @@ class AnnouncementViewSet(viewsets.ModelViewSet):
 
     @action(detail=False)
     def public(self, request: Request) -> Response:
-        announcements = Announcement.objects.get_public()[:5]
-        return Response(
-            [
-                team_serialize_announcement(
-                    a, read=request.user in a.read.all(), org_info=request.user.is_org
-                )
-                for a in announcements
-            ]
+        return team_announcements_response(
+            request, Announcement.objects.get_public(), unpaginatedLimit=5
         )
@@ -15,6 +15,7 @@ from game.models import (
     DbTask,
     DbTaskAssignment,
     DbTaskPreference,
+    DbTeamRoundMetrics,
     DbTeamState,
     DbTurn,
     DbWorldState,
@@ -57,18 +58,17 @@ class DbActionAdmin(admin.ModelAdmin):
         "actionType",
         "description",
         "args",
-        "last_interaction_type",
+        "status",
+        "author",
         "entities",
     ]
+    list_filter = ["status"]
+    list_select_related = ["author"]
 
     @admin.display(ordering="entitiesRevision")
     def entities(self, obj: DbAction):
         return DbEntities.objects.get(id=obj.entitiesRevision)
 
-    # @admin.display(ordering="interactions__phase")
-    def last_interaction_type(self, obj: DbAction):
-        return obj.lastInteraction().phase
-
 
 @admin.register(DbEntities)
 class DbEntitiesAdmin(admin.ModelAdmin):
@@ -199,6 +199,13 @@ class DbTurnAdmin(admin.ModelAdmin):
     ordering = ["id"]
 
 
+@admin.register(DbTeamRoundMetrics)
+class DbTeamRoundMetricsAdmin(admin.ModelAdmin):
+    list_display = get_list_display_all(DbTeamRoundMetrics)
+    list_filter = ["team"]
+    ordering = ["turn", "team"]
+
+
 @admin.register(Printer)
 class PrinterAdmin(admin.ModelAdmin):
     list_display = get_list_display_all(Printer)
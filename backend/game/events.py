@@ -0,0 +1,139 @@
+import sys
+import threading
+from collections import deque
+from typing import Any, NamedTuple, Optional
+
+from django.db import close_old_connections
+
+from game.models import DbGameEvent
+
+
+class GameEvent(NamedTuple):
+    seq: int
+    type: str
+    data: dict[str, Any]
+    # Teams the event concerns; None for events concerning everybody
+    teams: Optional[frozenset[str]]
+
+    @staticmethod
+    def fromDb(event: DbGameEvent) -> "GameEvent":
+        teams = frozenset(event.teams) if event.teams is not None else None
+        return GameEvent(event.id, event.type, event.data, teams)
+
+    def visibleTo(self, teamId: Optional[str]) -> bool:
+        return teamId is None or self.teams is None or teamId in self.teams
+
+    def serialize(self, teamId: Optional[str]) -> dict[str, Any]:
+        data = dict(self.data)
+        if self.teams is not None:
+            # Players learn only about their own team
+            data["teams"] = sorted(
+                self.teams if teamId is None else self.teams & {teamId}
+            )
+        return {"seq": self.seq, "type": self.type, **data}
+
+
+class EventsPage(NamedTuple):
+    events: list[GameEvent]
+    last: int
+    # The client missed events (they fell out of the buffer or the database
+    # was reset) and has to refetch everything
+    reset: bool
+
+
+class EventBus:
+    """
+    Stream of compact "something changed" events (new team states, map or
+    world change, new announcement, map diff, turn change) for clients that
+    would otherwise poll. Events are published into the database
+    (DbGameEvent.objects.publish), so their numbering is shared by all server
+    processes and survives restarts. A client asks for events after the last
+    number it has seen and waits until there are some.
+
+    Each process follows the table from a single background thread, one query
+    per poll interval (and right after a local commit), and keeps the recent
+    events in memory. Waiting clients sleep on a condition, so idle
+    connections cost no queries. Without a poll interval the bus is refreshed
+    only by explicit refresh() calls.
+    """
+
+    def __init__(self, bufferSize: int = 1024, pollInterval: Optional[float] = 1):
+        self.pollInterval = pollInterval
+        self._condition = threading.Condition()
+        self._events: deque[GameEvent] = deque(maxlen=bufferSize)
+        # None until the first refresh
+        self._last: Optional[int] = None
+        self._refreshLock = threading.Lock()
+        self._threadLock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def last(self) -> int:
+        self._ensureLoaded()
+        with self._condition:
+            return self._last or 0
+
+    def poke(self) -> None:
+        """
+        Refresh right away, an event has just been committed
+        """
+        self._wakeup.set()
+
+    def refresh(self) -> None:
+        """
+        Load the events published since the last refresh by any process. Ids
+        are assigned in commit order, as sqlite serializes write transactions.
+        """
+        with self._refreshLock:
+            with self._condition:
+                last = self._last
+            if last is None:
+                newest = DbGameEvent.objects.order_by("-id")[: self._events.maxlen]
+                rows = list(newest)[::-1]
+            else:
+                rows = list(DbGameEvent.objects.filter(id__gt=last).order_by("id"))
+            with self._condition:
+                self._events.extend(GameEvent.fromDb(e) for e in rows)
+                self._last = rows[-1].id if rows else (last or 0)
+                self._condition.notify_all()
+
+    def since(self, seq: int, timeout: Optional[float] = None) -> EventsPage:
+        """
+        Events after seq; waits up to timeout for the first one
+        """
+        self._ensureLoaded()
+        with self._condition:
+            self._condition.wait_for(lambda: (self._last or 0) > seq, timeout=timeout)
+            last = self._last or 0
+            oldest = self._events[0].seq if self._events else last + 1
+            if seq > last or seq + 1 < oldest:
+                return EventsPage([], last, reset=True)
+            events = [e for e in self._events if e.seq > seq]
+            return EventsPage(events, last, reset=False)
+
+    def _ensureLoaded(self) -> None:
+        if self._last is None:
+            self.refresh()
+        if self.pollInterval is None:
+            return
+        with self._threadLock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._loop, name="game-events", daemon=True
+            )
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            self._wakeup.wait(timeout=self.pollInterval)
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                self.refresh()
+            except Exception as e:
+                sys.stderr.write(f"*** GAME EVENTS REFRESH FAILED: {e}\n")
+
+
+GAME_EVENTS = EventBus()
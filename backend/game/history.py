@@ -0,0 +1,161 @@
+import itertools
+from typing import Any, Iterable, Iterator, Literal, NamedTuple
+
+from game.entities import Entities
+from game.models import DbInteraction, DbState, DbTeamState, DbWorldState
+
+ColumnKind = Literal["int", "float", "str", "time"]
+Batch = dict[str, list[Any]]
+
+
+class Table(NamedTuple):
+    """
+    A table of the game history streamed as columnar batches
+    """
+
+    name: str
+    schema: dict[str, ColumnKind]
+    batches: Iterator[Batch]
+
+
+def batched(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    it = iter(rows)
+    while batch := list(itertools.islice(it, size)):
+        yield batch
+
+
+def toColumns(names: Iterable[str], rows: list[tuple]) -> Batch:
+    return dict(zip(names, map(list, zip(*rows))))
+
+
+ACTIONS_SCHEMA: dict[str, ColumnKind] = {
+    "interaction": "int",
+    "action": "int",
+    "actionType": "str",
+    "team": "str",
+    "phase": "str",
+    "author": "str",
+    "created": "time",
+    "state": "int",
+    "description": "str",
+}
+
+
+def actionBatches(batchSize: int) -> Iterator[Batch]:
+    """
+    The action log, one row per interaction in the order they happened
+    """
+    rows = (
+        DbInteraction.objects.order_by("id")
+        .values_list(
+            "id",
+            "action",
+            "action__actionType",
+            "action__team",
+            "phase",
+            "author__username",
+            "created",
+            "new_state",
+            "action__description",
+        )
+        .iterator(chunk_size=batchSize)
+    )
+    for batch in batched(rows, batchSize):
+        yield toColumns(
+            ACTIONS_SCHEMA,
+            [
+                (i, a, t, team or "", phase.name, author or "", c, s, d or "")
+                for i, a, t, team, phase, author, c, s, d in batch
+            ],
+        )
+
+
+def teamStatesSchema(entities: Entities) -> dict[str, ColumnKind]:
+    schema: dict[str, ColumnKind] = {
+        "teamState": "int",
+        "team": "str",
+        "population": "float",
+        "techs": "int",
+    }
+    schema.update({resourceId: "float" for resourceId in entities.resources})
+    return schema
+
+
+def teamStateBatches(entities: Entities, batchSize: int) -> Iterator[Batch]:
+    """
+    Every distinct team state with its resource vector (one column per
+    resource, amounts the team doesn't have are 0). States share unchanged
+    team states, see stateBatches for which state uses which.
+    """
+    resourceIds = list(entities.resources)
+    schema = teamStatesSchema(entities)
+    rows = (
+        DbTeamState.objects.order_by("id")
+        .values_list("id", "team", "data")
+        .iterator(chunk_size=batchSize)
+    )
+    for batch in batched(rows, batchSize):
+        yield toColumns(
+            schema,
+            [
+                (
+                    teamStateId,
+                    team,
+                    float(data.get("population", 0)),
+                    len(data.get("techs", [])),
+                    *(float(data["resources"].get(r, 0)) for r in resourceIds),
+                )
+                for teamStateId, team, data in batch
+            ],
+        )
+
+
+STATES_SCHEMA: dict[str, ColumnKind] = {
+    "state": "int",
+    "turn": "int",
+    "team": "str",
+    "teamState": "int",
+}
+
+
+def stateBatches(batchSize: int) -> Iterator[Batch]:
+    """
+    Which team state each team had in each state, with the turn of the state
+    """
+    rows = (
+        DbState.teamStates.through.objects.order_by("dbstate", "dbteamstate__team")
+        .values_list(
+            "dbstate", "dbstate__worldState", "dbteamstate__team", "dbteamstate"
+        )
+        .iterator(chunk_size=batchSize)
+    )
+    turns: dict[int, int] = {}
+    for batch in batched(rows, batchSize):
+        missing = {worldState for _, worldState, _, _ in batch} - turns.keys()
+        for worldState, data in DbWorldState.objects.filter(id__in=missing).values_list(
+            "id", "data"
+        ):
+            turns[worldState] = data.get("turn", 0)
+        yield toColumns(
+            STATES_SCHEMA,
+            [
+                (state, turns[worldState], team, teamState)
+                for state, worldState, team, teamState in batch
+            ],
+        )
+        # States mostly share world states with their predecessors, keep only
+        # the turn the next batch likely continues with
+        lastWorldState = batch[-1][1]
+        turns = {lastWorldState: turns[lastWorldState]}
+
+
+def historyTables(entities: Entities, batchSize: int) -> list[Table]:
+    return [
+        Table("actions", ACTIONS_SCHEMA, actionBatches(batchSize)),
+        Table(
+            "teamStates",
+            teamStatesSchema(entities),
+            teamStateBatches(entities, batchSize),
+        ),
+        Table("states", STATES_SCHEMA, stateBatches(batchSize)),
+    ]
@@ -0,0 +1,51 @@
+import time
+from argparse import ArgumentParser
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.management.commands.pullentities import setFilename
+from game.entityParser import EntityParser
+from game.gameGlue import stateSerialize
+from game.readModel import buildTeamReadModel
+from game.renderers import ORJSONRenderer
+from game.state import GameState
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the stock and the orjson renderer on the payloads of "
+        "state/latest and team dashboards of an initial game state"
+    )
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument("setname", nargs="?", default="TEST")
+        parser.add_argument("-r", "--repeat", type=int, default=20)
+
+    def handle(self, setname: str, repeat: int, *args, **kwargs) -> None:
+        entities = EntityParser.load(settings.ENTITY_PATH / setFilename(setname))
+        state = GameState.create_initial(entities)
+
+        payloads: dict[str, Callable[[], Any]] = {
+            "state/latest": lambda: stateSerialize(state),
+            "dashboard (all teams)": lambda: [
+                buildTeamReadModel(state, team, entities)["dashboard"]
+                for team in state.teamStates
+            ],
+        }
+        for name, makePayload in payloads.items():
+            start = time.perf_counter()
+            payload = makePayload()
+            buildTime = time.perf_counter() - start
+            print(f"{name}: payload built in {1000 * buildTime:.1f} ms")
+
+            for renderer in [JSONRenderer(), ORJSONRenderer()]:
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    size = len(renderer.render(payload))
+                elapsed = (time.perf_counter() - start) / repeat
+                print(
+                    f"    {type(renderer).__name__}: {1000 * elapsed:.2f} ms, {size} B"
+                )
@@ -0,0 +1,50 @@
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from core.management.commands.pullentities import setFilename
+from core.models.team import Team
+from game.entities import Building, BuildingUpgrade, TeamAttribute, Tech, Vyroba
+from game.entityParser import EntityParser
+from game.models import StickerType
+from game.stickers import makeSticker
+
+
+class Command(BaseCommand):
+    help = "Measure how long it takes to render stickers for all entities"
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument("setname", nargs="?", default="TEST")
+        parser.add_argument("-r", "--repeat", type=int, default=3)
+
+    def handle(self, setname: str, repeat: int, *args, **kwargs) -> None:
+        entities = EntityParser.load(settings.ENTITY_PATH / setFilename(setname))
+        teamEntity = entities.teams.value(0)
+        team = Team(id=teamEntity.id, name=teamEntity.name, color=teamEntity.color)
+
+        stickers = []
+        for e in entities.values():
+            if isinstance(e, Tech):
+                stickers.extend((e, t) for t in StickerType)
+            elif isinstance(e, (Vyroba, Building, BuildingUpgrade, TeamAttribute)):
+                stickers.append((e, StickerType.regular))
+
+        for run in range(repeat):
+            times: defaultdict[str, float] = defaultdict(float)
+            counts: defaultdict[str, int] = defaultdict(int)
+            for e, stype in stickers:
+                start = time.perf_counter()
+                makeSticker(e, team, stype, entities=entities)
+                times[type(e).__name__] += time.perf_counter() - start
+                counts[type(e).__name__] += 1
+
+            total = sum(times.values())
+            print(f"Run {run + 1}: {len(stickers)} stickers in {total:.2f} s")
+            for name, t in sorted(times.items()):
+                print(f"    {name}: {counts[name]}× {1000 * t / counts[name]:.1f} ms")
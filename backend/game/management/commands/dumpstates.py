@@ -1,46 +1,35 @@
-import json
-from django.core.management import BaseCommand
-from game.models import DbState
+from argparse import ArgumentParser
 from pathlib import Path
 
+from django.core.management import BaseCommand
 
-class Command(BaseCommand):
-    def __init__(self, *args, **kwargs):
-        super(Command, self).__init__(*args, **kwargs)
-
-    def add_arguments(self, parser):
-        parser.add_argument("outputdir", type=str)
+from game.stateArchive import dumpStates, openArchive
 
-    def handle(self, outputdir, *args, **kwargs):
-        outputdir = Path(outputdir)
-        outputdir.mkdir(exist_ok=True, parents=True)
-        states = DbState.objects.all().order_by("id")
 
-        for s in states:
-            intact = s.interaction
-            if intact is None:
-                continue
-            name = f"{intact.created}_{intact.action.actionType}_{intact.phase}"
+class Command(BaseCommand):
+    help = (
+        "Dump all the game states into a compressed JSON Lines archive "
+        "(zstd if the name ends with .zst, gzip otherwise), see loadstates"
+    )
 
-            dump = {
-                "actionType": s.interaction.action.actionType,
-                "actionType": s.interaction.action.description,
-                "state": {
-                    "map": s.mapState.data,
-                    "world": s.worldState.data,
-                    "teamNum": s.teamStates.all().count(),
-                    "teams": {ts.team.id: ts.data for ts in s.teamStates.all()},
-                },
-            }
-            with open(outputdir / f"{name}.json", "w") as f:
-                json.dump(dump, f, indent=4)
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument("output", type=str, help="e.g. states.jsonl.gz")
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="States fetched at once",
+        )
+        parser.add_argument(
+            "--no-dedup",
+            action="store_true",
+            help="Write blobs with repeated content in full",
+        )
 
-        for s in states:
-            dump = {
-                "map": s.mapState.data,
-                "world": s.worldState.data,
-                "teamNum": s.teamStates.all().count(),
-                "teams": {ts.team.id: ts.data for ts in s.teamStates.all()},
-            }
-            with open(outputdir / f"raw_{s.id}.json", "w") as f:
-                json.dump(dump, f, indent=4)
+    def handle(
+        self, output: str, batch_size: int, no_dedup: bool, *args, **kwargs
+    ) -> None:
+        with openArchive(Path(output), "w") as f:
+            count = dumpStates(f, batchSize=batch_size, dedup=not no_dedup)
+        self.stdout.write(f"Dumped {count} states into {output}")
@@ -0,0 +1,164 @@
+import datetime
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any, Optional
+
+from django.core.management import BaseCommand, CommandError
+
+from game.history import Batch, ColumnKind, Table, historyTables
+from game.models import DbEntities
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # Only the NumPy format is available
+    pyarrow = None  # type: ignore
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # type: ignore
+
+
+class ArrowTableWriter:
+    """
+    Writes batches into a single Parquet or Arrow IPC file
+    """
+
+    TYPES = {
+        "int": lambda: pyarrow.int64(),
+        "float": lambda: pyarrow.float64(),
+        "str": lambda: pyarrow.string(),
+        "time": lambda: pyarrow.timestamp("us", tz="UTC"),
+    }
+
+    def __init__(self, path: Path, schema: dict[str, ColumnKind], format: str):
+        self.schema = pyarrow.schema(
+            [(name, self.TYPES[kind]()) for name, kind in schema.items()]
+        )
+        self.format = format
+        if format == "parquet":
+            self.writer = pyarrow.parquet.ParquetWriter(
+                path, self.schema, compression="zstd"
+            )
+        else:
+            self.writer = pyarrow.ipc.new_file(
+                path,
+                self.schema,
+                options=pyarrow.ipc.IpcWriteOptions(compression="zstd"),
+            )
+
+    def write(self, batch: Batch) -> None:
+        table = pyarrow.Table.from_pydict(batch, schema=self.schema)
+        if self.format == "parquet":
+            self.writer.write_table(table)
+        else:
+            self.writer.write(table)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class NumpyTableWriter:
+    """
+    Writes each batch into a compressed .npz file of its own, so memory stays
+    bounded by a batch. Load the parts and concatenate the columns.
+    """
+
+    TYPES = {
+        "int": "int64",
+        "float": "float64",
+        "str": "str",
+        "time": "datetime64[us]",
+    }
+
+    def __init__(self, path: Path, schema: dict[str, ColumnKind], format: str):
+        self.path = path
+        self.schema = schema
+        self.parts = 0
+
+    def write(self, batch: Batch) -> None:
+        columns: dict[str, Any] = {}
+        for name, kind in self.schema.items():
+            values = batch[name]
+            if kind == "time":
+                values = [
+                    v.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+                    for v in values
+                ]
+            columns[name] = numpy.array(values, dtype=self.TYPES[kind])
+        numpy.savez_compressed(
+            self.path.with_name(f"{self.path.stem}-{self.parts:05}.npz"), **columns
+        )
+        self.parts += 1
+
+    def close(self) -> None:
+        pass
+
+
+FORMATS = {
+    "parquet": ArrowTableWriter,
+    "arrow": ArrowTableWriter,
+    "npz": NumpyTableWriter,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the game history for offline analysis: the action log "
+        "(actions), resource vectors of all team states (teamStates) and the "
+        "team states of each state (states), one columnar file per table"
+    )
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument("outputdir", type=str)
+        parser.add_argument(
+            "-f",
+            "--format",
+            choices=list(FORMATS),
+            default=None,
+            help=(
+                "Defaults to parquet if pyarrow (requirements-analysis.txt) "
+                "is installed, npz otherwise"
+            ),
+        )
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows fetched and written at once",
+        )
+
+    def handle(
+        self, outputdir: str, format: Optional[str], batch_size: int, *args, **kwargs
+    ) -> None:
+        if format is None:
+            format = "parquet" if pyarrow is not None else "npz"
+        if format in ("parquet", "arrow") and pyarrow is None:
+            raise CommandError(f"Format {format} requires pyarrow")
+        if format == "npz" and numpy is None:
+            raise CommandError("Format npz requires numpy")
+
+        try:
+            _, entities = DbEntities.objects.get_revision()
+        except DbEntities.DoesNotExist:
+            raise CommandError("Entities not loaded, try reseting the game")
+
+        outputDir = Path(outputdir)
+        outputDir.mkdir(exist_ok=True, parents=True)
+        for table in historyTables(entities, batch_size):
+            self.exportTable(table, outputDir, format)
+
+    def exportTable(self, table: Table, outputDir: Path, format: str) -> None:
+        path = outputDir / f"{table.name}.{format}"
+        writer = FORMATS[format](path, table.schema, format)
+        rows = 0
+        try:
+            for batch in table.batches:
+                writer.write(batch)
+                rows += len(next(iter(batch.values())))
+        finally:
+            writer.close()
+        self.stdout.write(f"{table.name}: {rows} rows")
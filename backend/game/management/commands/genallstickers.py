@@ -1,11 +1,12 @@
+import os
+from pathlib import Path
+
 from django.core.management import BaseCommand
+
 from core.models.team import Team
 from game.entities import Building, BuildingUpgrade, Vyroba
 from game.models import DbEntities, StickerType
-from pathlib import Path
-
-
-from game.stickers import makeSticker
+from game.stickers import StickerFile, renderStickerFiles
 
 
 class Command(BaseCommand):
@@ -25,10 +26,15 @@ class Command(BaseCommand):
             choices=[t.id for t in entities.teams.values()],
             default=entities.teams.value(0).id,
         )
+        parser.add_argument(
+            "-j",
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of rendering processes",
+        )
 
-    def handle(self, outputdir, team, *args, **kwargs):
-        outputdir = Path(outputdir)
-        outputdir.mkdir(exist_ok=True, parents=True)
+    def handle(self, outputdir, team, workers, *args, **kwargs):
         try:
             _, entities = DbEntities.objects.get_revision()
         except DbEntities.DoesNotExist:
@@ -36,15 +42,27 @@ class Command(BaseCommand):
 
         dbTeam = Team.objects.get(id=team)
 
+        stickers = []
         for t in entities.techs.values():
             for stickerType in [
                 StickerType.regular,
                 StickerType.techSmall,
                 StickerType.techFirst,
             ]:
-                img = makeSticker(t, dbTeam, stickerType, entities=entities)
-                img.save(str(outputdir / f"{t.id}-{stickerType}.png"))
+                stickers.append(
+                    StickerFile(t.id, dbTeam, stickerType, f"{t.id}-{stickerType}.png")
+                )
         for e in entities.values():
             if isinstance(e, (Vyroba, Building, BuildingUpgrade)):
-                img = makeSticker(e, dbTeam, StickerType.regular, entities=entities)
-                img.save(str(outputdir / f"{e.id}.png"))
+                stickers.append(
+                    StickerFile(e.id, dbTeam, StickerType.regular, f"{e.id}.png")
+                )
+
+        report = renderStickerFiles(
+            stickers, Path(outputdir), workers=workers, progress=self.progress
+        )
+        self.stdout.write(report.summary())
+
+    def progress(self, done: int, total: int) -> None:
+        self.stdout.write(f"\r{done}/{total}", ending="\n" if done == total else "")
+        self.stdout.flush()
@@ -1,16 +1,19 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal
-from typing import Any
-from django.core.management import BaseCommand
-
 from pathlib import Path
-from game.entities import Entities, TeamEntity
-from game.state import GameState
+from typing import Any, NamedTuple
 
+import django
 import plotly.graph_objects as go
 import plotly.io as pio
+from django.core.management import BaseCommand
+from django.db.models import Count
 from plotly.subplots import make_subplots
 
-from game.models import DbAction, DbEntities, DbState, DbSticker, StickerType
+from game.models import DbAction, DbEntities, DbSticker, StickerType
+from game.stats import iterRoundMetrics
 
 
 pio.templates["civilizace"] = go.layout.Template(
@@ -40,35 +43,12 @@ pio.templates["civilizace"] = go.layout.Template(
 pio.templates.default = "none+civilizace"
 
 
-def isRoundEnd(prevState, state):
-    return prevState.world.turn != state.world.turn
-
-
-def teamStat(team: TeamEntity, states: list[GameState], entities: Entities):
-    stat: list[dict[str, Decimal | int]] = []
-    prodSum = 0
-    weightedSum = 0
-    for prevState, state in zip(states, states[1:]):
-        if isRoundEnd(prevState, state):
-            tState = state.teamStates[team]
-            prod = 0
-            for resource, amount in tState.resources.items():
-                if resource.isTradableProduction:
-                    prod += amount
-            prodSum += prod
-            stat.append(
-                {
-                    "obyvatele": tState.resources.get(entities.obyvatel, Decimal(0)),
-                    "populace": tState.population,
-                    "techy": len(tState.techs),
-                    "productions": prod,
-                    "prodSum": prodSum,
-                }
-            )
-    return stat
-
-
-def plotTeamGraph(team, overview, outputdir):
+class TeamInfo(NamedTuple):
+    id: str
+    name: str
+
+
+def plotTeamGraph(team: TeamInfo, overview, outputdir):
     l = overview["stat"]
     turns = [x + 1 for x in range(len(l))]
 
@@ -350,53 +330,90 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("output", type=str)
+        parser.add_argument(
+            "-j",
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of processes rendering team pages",
+        )
 
-    def handle(self, output, *args, **kwargs):
+    def handle(self, output, workers, *args, **kwargs):
         outputDir = Path(output)
         outputDir.mkdir(exist_ok=True, parents=True)
 
-        states = [s.toIr() for s in DbState.objects.all().order_by("id")]
         revision, entities = DbEntities.objects.get_revision()
-
-        overview = {t: {"attacks": 0} for t in entities.teams.values()}
-
-        for team in entities.teams.values():
+        teams = list(entities.teams.values())
+
+        overview: dict[Any, dict[str, Any]] = {
+            t: {"attacks": 0, "stat": []} for t in teams
+        }
+        prodSums = {t: Decimal(0) for t in teams}
+        weightedSums = {t: Decimal(0) for t in teams}
+        for _, metrics in iterRoundMetrics(entities):
+            for team in teams:
+                if (row := metrics.get(team.id)) is None:
+                    continue
+                prodSums[team] += row["productions"]
+                weightedSums[team] += row["weightedProductions"]
+                row["prodSum"] = prodSums[team]
+                row["weightedSum"] = weightedSums[team]
+                overview[team]["stat"].append(row)
+
+        for team in teams:
             print(f"Statistiky pro tým {team.name}")
             fname = outputDir / f"{team.name}.csv"
             print(fname)
             with open(fname, "w") as f:
-                stat = teamStat(team, states, entities)
                 f.write("populace, obvyatele, techy, produkce, materialy\n")
-                for l in stat:
+                for l in overview[team]["stat"]:
                     f.write(
                         f'{l["populace"]}, {l["obyvatele"]}, {l["techy"]}, {l["productions"]}, {l["prodSum"]}\n'
                     )
-                overview[team]["stat"] = stat
-
-        for action in DbAction.objects.all():
-            if "team" not in action.args:
-                continue
-            tId = action.args["team"]
-            t = entities[tId]
-            overview[t]["interactions"] = overview[t].get("interactions", 0) + 1
-            if action.actionType == "ArmyDeployAction":
-                overview[t]["attacks"] = overview[t].get("attacks", 0) + 1
-            if action.actionType == "BuildAction":
-                overview[t]["buildings"] = overview[t].get("buildings", 0) + 1
-
-        techStickers = list(DbSticker.objects.filter(type=StickerType.techFirst))
+
+        actionCounts = (
+            DbAction.objects.filter(team__isnull=False)
+            .values_list("team", "actionType")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+        for tId, actionType, count in actionCounts:
+            o = overview[entities.teams[tId]]
+            o["interactions"] = o.get("interactions", 0) + count
+            if actionType == "ArmyDeployAction":
+                o["attacks"] = o.get("attacks", 0) + count
+            if actionType == "BuildAction":
+                o["buildings"] = o.get("buildings", 0) + count
+
+        techsFirst = dict(
+            DbSticker.objects.filter(type=StickerType.techFirst)
+            .values_list("team")
+            .annotate(count=Count("id"))
+            .order_by()
+        )
         for t, o in overview.items():
-            ts = [x.id for x in techStickers if x.team.id == t.id]
-            o["techsFirst"] = len(ts)
+            o["techsFirst"] = techsFirst.get(t.id, 0)
 
         for t, o in overview.items():
             o["stat"] = o["stat"][:3] + o["stat"][7:9] + o["stat"][17:]
 
         plotSummary(overview, outputDir)
 
-        for t, overview in overview.items():
-            if "stat" not in overview:
-                continue
-            plotTeamGraph(t, overview, outputDir)
+        pages = [
+            (TeamInfo(t.id, t.name), o, outputDir)
+            for t, o in overview.items()
+            if o["stat"]
+        ]
+        if workers <= 1:
+            for page in pages:
+                plotTeamGraph(*page)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            ) as executor:
+                for future in [executor.submit(plotTeamGraph, *p) for p in pages]:
+                    future.result()
 
         print("Počet interakcí systémem: ", DbAction.objects.all().count())
@@ -1,10 +1,11 @@
-from django.core.management import BaseCommand
-from core.models.team import Team
-from game.models import DbEntities, StickerType
+import os
 from pathlib import Path
 
+from django.core.management import BaseCommand
 
-from game.stickers import makeSticker
+from core.models.team import Team
+from game.models import StickerType
+from game.stickers import StickerFile, renderStickerFiles
 
 
 class Command(BaseCommand):
@@ -13,12 +14,15 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("outputdir", type=str)
-
-    def handle(self, outputdir, *args, **kwargs):
-        outputdir = Path(outputdir)
-        outputdir.mkdir(exist_ok=True, parents=True)
-        _, entities = DbEntities.objects.get_revision()
-
+        parser.add_argument(
+            "-j",
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Number of rendering processes",
+        )
+
+    def handle(self, outputdir, workers, *args, **kwargs):
         stickers = [
             "vyr-drevoInit",
             "bui-centrum",
@@ -28,9 +32,18 @@ class Command(BaseCommand):
             "tec-hory",
         ]
 
-        for team in Team.objects.all():
-            for s in stickers:
-                img = makeSticker(
-                    entities[s], team, StickerType.regular, entities=entities
-                )
-                img.save(str(outputdir / f"{team.id}_{s}.png"))
+        report = renderStickerFiles(
+            [
+                StickerFile(s, team, StickerType.regular, f"{team.id}_{s}.png")
+                for team in Team.objects.all()
+                for s in stickers
+            ],
+            Path(outputdir),
+            workers=workers,
+            progress=self.progress,
+        )
+        self.stdout.write(report.summary())
+
+    def progress(self, done: int, total: int) -> None:
+        self.stdout.write(f"\r{done}/{total}", ending="\n" if done == total else "")
+        self.stdout.flush()
@@ -0,0 +1,51 @@
+from argparse import ArgumentParser
+from typing import Optional
+
+from django.core.management import BaseCommand
+
+from game.models import DbEntities, DbSticker
+from game.stickers import stickerCacheKey
+
+
+class Command(BaseCommand):
+    help = "List stickers that have to be rendered again after updating them to an entity revision"
+
+    def __init__(self, *args, **kwargs):
+        super(Command, self).__init__(*args, **kwargs)
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument(
+            "-r",
+            "--revision",
+            type=int,
+            default=None,
+            help="Target entity revision (latest by default)",
+        )
+
+    def handle(self, revision: Optional[int], *args, **kwargs) -> None:
+        revision, entities = DbEntities.objects.get_revision(revision)
+
+        stickers = (
+            DbSticker.objects.select_related("team")
+            .exclude(entityRevision=revision)
+            .order_by("team", "entityId", "type")
+        )
+        total = 0
+        invalidated = 0
+        for sticker in stickers:
+            total += 1
+            if sticker.entityId not in entities:
+                invalidated += 1
+                print(
+                    f"{sticker.team.id} - {sticker.entityId} ({sticker.type}): removed"
+                )
+                continue
+            if stickerCacheKey(sticker) != stickerCacheKey(sticker, revision):
+                invalidated += 1
+                print(
+                    f"{sticker.team.id} - {sticker.entityId} ({sticker.type}): changed"
+                )
+
+        print(
+            f"Revision {revision} invalidates {invalidated} of {total} outdated stickers"
+        )
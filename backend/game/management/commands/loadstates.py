@@ -0,0 +1,28 @@
+from argparse import ArgumentParser
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+
+from game.stateArchive import loadStates, openArchive
+
+
+class Command(BaseCommand):
+    help = "Restore game states from an archive written by dumpstates"
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        parser.add_argument("input", type=str)
+        parser.add_argument(
+            "-b",
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Records inserted at once",
+        )
+
+    def handle(self, input: str, batch_size: int, *args, **kwargs) -> None:
+        try:
+            with openArchive(Path(input), "r") as f:
+                count = loadStates(f, batchSize=batch_size)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Loaded {count} states from {input}")
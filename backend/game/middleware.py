@@ -12,6 +12,7 @@ from game.models import (
     GameTime,
     InteractionType,
 )
+from game.stats import storeRoundMetrics
 from django.utils import timezone
 from django.db import transaction
 
@@ -76,9 +77,10 @@ def makeNextTurnAction():
     )
 
     action.commit()
-    ActionViewHelper.dbStoreInteraction(
+    newDbState = ActionViewHelper.dbStoreInteraction(
         dbAction, dbState, InteractionType.commit, user=None, new_state=state, action=action
     )
+    storeRoundMetrics(newDbState, state, entities)
 
     ActionViewHelper._markMapDiff(prevState, state)
 
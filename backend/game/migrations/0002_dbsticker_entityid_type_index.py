@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('game', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dbsticker',
+            index=models.Index(fields=['entityId', 'type'], name='game_dbstic_entityI_5c2d5c_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:23
+
+import core.models.fields
+import django.db.models.deletion
+import django.utils.timezone
+import django_enumfield.db.fields
+import game.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0002_dbsticker_entityid_type_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PrintJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("createdAt", models.DateTimeField(auto_now_add=True)),
+                ("printerName", models.CharField(max_length=200)),
+                ("stickers", core.models.fields.JSONField()),
+                (
+                    "status",
+                    django_enumfield.db.fields.EnumField(
+                        default=0, enum=game.models.PrintJobStatus
+                    ),
+                ),
+                ("attempts", models.IntegerField(default=0)),
+                (
+                    "nextAttemptAt",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("finishedAt", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True, default="")),
+                (
+                    "author",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["status", "nextAttemptAt"],
+                        name="game_printj_status_1469ae_idx",
+                    )
+                ],
+            },
+        ),
+    ]
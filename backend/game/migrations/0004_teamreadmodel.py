@@ -0,0 +1,60 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:30
+
+import core.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+        ("game", "0003_printjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DbTeamReadModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("data", core.models.fields.JSONField(null=True)),
+                (
+                    "source",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="game.dbteamreadmodel",
+                    ),
+                ),
+                (
+                    "state",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="readModels",
+                        to="game.dbstate",
+                    ),
+                ),
+                (
+                    "team",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="core.team"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="dbteamreadmodel",
+            constraint=models.UniqueConstraint(
+                fields=("state", "team"), name="unique_team_read_model"
+            ),
+        ),
+    ]
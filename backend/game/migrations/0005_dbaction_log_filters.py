@@ -0,0 +1,66 @@
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def fillLogFilters(apps, schema_editor):
+    DbAction = apps.get_model("game", "DbAction")
+    Team = apps.get_model("core", "Team")
+    teams = set(Team.objects.values_list("id", flat=True))
+    actions = DbAction.objects.annotate(firstInteraction=Min("interactions__created"))
+    for action in actions.select_related("scheduled"):
+        team = action.args.get("team") if isinstance(action.args, dict) else None
+        action.team_id = team if team in teams else None
+        if action.firstInteraction is not None:
+            action.createdAt = action.firstInteraction
+        elif hasattr(action, "scheduled"):
+            action.createdAt = action.scheduled.created
+        action.save(update_fields=["team", "createdAt"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0001_initial"),
+        ("game", "0004_teamreadmodel"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dbaction",
+            name="createdAt",
+            field=models.DateTimeField(
+                auto_now_add=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name="dbaction",
+            name="team",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to="core.team",
+            ),
+        ),
+        migrations.RunPython(fillLogFilters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="dbaction",
+            index=models.Index(
+                fields=["team", "id"], name="game_dbacti_team_id_67a8d7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dbaction",
+            index=models.Index(
+                fields=["actionType", "id"], name="game_dbacti_actionT_2797ba_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dbaction",
+            index=models.Index(
+                fields=["createdAt"], name="game_dbacti_created_c71616_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:39
+
+import django.db.models.deletion
+import django_enumfield.db.fields
+import game.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fillStatus(apps, schema_editor):
+    DbAction = apps.get_model("game", "DbAction")
+    DbInteraction = apps.get_model("game", "DbInteraction")
+    actions = {}
+    interactions = DbInteraction.objects.order_by("action", "phase").values_list(
+        "action", "phase", "author"
+    )
+    for actionId, phase, authorId in interactions:
+        action = actions.setdefault(actionId, DbAction(id=actionId, author_id=authorId))
+        # Phases follow each other in the order of their values
+        action.status = game.models.ActionStatus(int(phase))
+    DbAction.objects.bulk_update(actions.values(), ["status", "author"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+        ("game", "0005_dbaction_log_filters"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dbaction",
+            name="author",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name="dbaction",
+            name="status",
+            field=django_enumfield.db.fields.EnumField(
+                blank=True, enum=game.models.ActionStatus, null=True
+            ),
+        ),
+        migrations.RunPython(fillStatus, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="dbaction",
+            index=models.Index(
+                fields=["author", "status"], name="game_dbacti_author__8ff206_idx"
+            ),
+        ),
+    ]
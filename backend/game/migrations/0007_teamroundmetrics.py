@@ -0,0 +1,63 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+        ("game", "0006_dbaction_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DbTeamRoundMetrics",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("turn", models.PositiveIntegerField()),
+                ("createdAt", models.DateTimeField(auto_now_add=True)),
+                ("population", models.DecimalField(decimal_places=4, max_digits=20)),
+                ("obyvatele", models.DecimalField(decimal_places=4, max_digits=20)),
+                ("techs", models.PositiveIntegerField()),
+                ("productions", models.DecimalField(decimal_places=4, max_digits=20)),
+                (
+                    "weightedProductions",
+                    models.DecimalField(decimal_places=4, max_digits=20),
+                ),
+                ("armies", models.PositiveIntegerField()),
+                ("buildings", models.PositiveIntegerField()),
+                (
+                    "state",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="game.dbstate",
+                    ),
+                ),
+                (
+                    "team",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="roundMetrics",
+                        to="core.team",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="dbteamroundmetrics",
+            constraint=models.UniqueConstraint(
+                fields=("team", "turn"), name="unique_team_round_metrics"
+            ),
+        ),
+    ]
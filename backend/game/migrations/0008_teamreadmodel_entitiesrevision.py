@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0007_teamroundmetrics"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dbteamreadmodel",
+            name="entitiesRevision",
+            field=models.IntegerField(null=True),
+        ),
+    ]
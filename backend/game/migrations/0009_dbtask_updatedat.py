@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 14:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0008_teamreadmodel_entitiesrevision"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dbtask",
+            name="updatedAt",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
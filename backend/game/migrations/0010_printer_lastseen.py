@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0009_dbtask_updatedat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="printer",
+            name="lastSeen",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
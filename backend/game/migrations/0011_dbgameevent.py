@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-19 15:17
+
+import core.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("game", "0010_printer_lastseen"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DbGameEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("createdAt", models.DateTimeField(auto_now_add=True)),
+                ("type", models.CharField(max_length=32)),
+                ("data", core.models.fields.JSONField()),
+                ("teams", core.models.fields.JSONField(null=True)),
+            ],
+        ),
+    ]
@@ -148,6 +148,12 @@ class DbEntities(models.Model):
     objects = DbEntitiesManager()
 
 
+class ActionStatus(enum.Enum):
+    initiated = 0
+    committed = 1
+    reverted = 2
+
+
 class DbAction(models.Model):
     """
     Represent an action that was input into the system. It stores which action
@@ -155,14 +161,32 @@ class DbAction(models.Model):
     DbInteractionModel.
     """
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["team", "id"]),
+            models.Index(fields=["actionType", "id"]),
+            models.Index(fields=["createdAt"]),
+            models.Index(fields=["author", "status"]),
+        ]
+
     id = models.BigAutoField(primary_key=True)
     actionType = models.CharField(max_length=64)
     entitiesRevision = models.IntegerField()
     description = models.TextField(null=True, blank=True)
     args = JSONField(blank=True)
+    # Copied from args for filtering the action log
+    team = models.ForeignKey(Team, on_delete=models.SET_NULL, null=True, blank=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    # Kept by ActionViewHelper.dbStoreInteraction: the phase of the last
+    # interaction and who initiated the action
+    status: Optional[ActionStatus] = enum.EnumField(ActionStatus, null=True, blank=True)  # type: ignore
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
 
-    def lastInteraction(self) -> DbInteraction:
-        return DbInteraction.objects.filter(action=self).latest("phase")
+    def save(self, *args, **kwargs):
+        if self.team_id is None and isinstance(self.args, dict):
+            if isinstance(team := self.args.get("team"), str):
+                self.team_id = team
+        super().save(*args, **kwargs)
 
     def getArgumentsIr(self, entities: Entities) -> ActionArgs:
         ActionTypeInfo = GAME_ACTIONS[self.actionType]
@@ -212,6 +236,13 @@ class InteractionType(enum.Enum):
     revert = 2  # Reverted initiate
 
 
+ACTION_STATUS_AFTER = {
+    InteractionType.initiate: ActionStatus.initiated,
+    InteractionType.commit: ActionStatus.committed,
+    InteractionType.revert: ActionStatus.reverted,
+}
+
+
 class DbInteraction(models.Model):
     class Meta:
         unique_together = ("action", "phase")
@@ -279,6 +310,7 @@ class DbStateManager(models.Manager):
             worldState = DbWorldState.objects.create(data=sWorld)
 
         dbTeamStates = []
+        changedTeams = []
         if len(ir.teamStates) != Team.objects.count():
             raise ValueError(
                 f"GameState has missing teamStates (missing: {Team.objects.exclude(id__in=ir.teamStates.keys())})"
@@ -296,12 +328,24 @@ class DbStateManager(models.Manager):
                 dbTeamStates.append(
                     DbTeamState.objects.create(team=dbTeam, data=sTeamState)
                 )
+                changedTeams.append(team.id)
 
         state: DbState = self.create(
             mapState=mapState,
             worldState=worldState,
         )
         state.teamStates.set(dbTeamStates)
+
+        # Players learn only about changes of their own team, map and world
+        # changes concern everybody
+        mapChanged = source is None or mapState != source.mapState
+        worldChanged = source is None or worldState != source.worldState
+        if changedTeams:
+            DbGameEvent.objects.publish("state", stateId=state.id, teams=changedTeams)
+        if mapChanged or worldChanged:
+            DbGameEvent.objects.publish(
+                "world", stateId=state.id, map=mapChanged, world=worldChanged
+            )
         return state
 
 
@@ -337,16 +381,101 @@ class DbState(models.Model):
             return None
 
     @property
-    def entities(self) -> Entities:
+    def entitiesRevision(self) -> Optional[int]:
+        """
+        Entities revision of the action creating the state, None (the latest
+        revision) for states not created by an action
+        """
         if (interaction := self.get_interaction()) is None:
-            return DbEntities.objects.get_revision()[1]
-        return DbEntities.objects.get_revision(interaction.action.entitiesRevision)[1]
+            return None
+        return interaction.action.entitiesRevision
+
+    @property
+    def entities(self) -> Entities:
+        return DbEntities.objects.get_revision(self.entitiesRevision)[1]
+
+
+class DbTeamReadModel(models.Model):
+    """
+    What the team views show for a team in a given state, stored as the JSON
+    they return (see game.readModel). When the team's view didn't change,
+    the row only points to the row holding the data.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["state", "team"], name="unique_team_read_model"
+            )
+        ]
+
+    state = models.ForeignKey(
+        DbState, related_name="readModels", on_delete=models.CASCADE
+    )
+    team = models.ForeignKey(Team, on_delete=models.CASCADE)
+    entitiesRevision = models.IntegerField(null=True)
+    data = JSONField(null=True)
+    source = models.ForeignKey("self", null=True, blank=True, on_delete=models.CASCADE)
+
+
+class DbTeamRoundMetrics(models.Model):
+    """
+    Metrics of a team at the start of a round, appended at each turn change
+    (see game.stats), so round-based statistics don't have to deserialize
+    the game history
+    """
+
+    METRICS = [
+        "population",
+        "obyvatele",
+        "techs",
+        "productions",
+        "weightedProductions",
+        "armies",
+        "buildings",
+    ]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["team", "turn"], name="unique_team_round_metrics"
+            )
+        ]
+
+    team = models.ForeignKey(
+        Team, related_name="roundMetrics", on_delete=models.CASCADE
+    )
+    turn = models.PositiveIntegerField()
+    state = models.ForeignKey(DbState, related_name="+", on_delete=models.CASCADE)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    population = models.DecimalField(max_digits=20, decimal_places=4)
+    obyvatele = models.DecimalField(max_digits=20, decimal_places=4)
+    techs = models.PositiveIntegerField()
+    productions = models.DecimalField(max_digits=20, decimal_places=4)
+    weightedProductions = models.DecimalField(max_digits=20, decimal_places=4)
+    armies = models.PositiveIntegerField()
+    buildings = models.PositiveIntegerField()
 
 
 class DbTaskManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().prefetch_related("techs")
 
+    def withAssignments(self) -> QuerySet[DbTask]:
+        """
+        Tasks ready to be serialized: assignments are prefetched and the
+        occupied count is computed by the database
+        """
+        return (
+            self.get_queryset()
+            .prefetch_related("assignments")
+            .annotate(
+                openAssignments=models.Count(
+                    "assignments", filter=models.Q(assignments__finishedAt=None)
+                )
+            )
+        )
+
 
 class DbTask(models.Model):
     id = models.CharField(primary_key=True, max_length=32)
@@ -354,6 +483,7 @@ class DbTask(models.Model):
     capacity = models.IntegerField()
     orgDescription = models.TextField()
     teamDescription = models.TextField()
+    updatedAt = models.DateTimeField(auto_now=True)
 
     objects = DbTaskManager()
 
@@ -364,6 +494,8 @@ class DbTask(models.Model):
 
     @property
     def occupiedCount(self) -> int:
+        if (count := getattr(self, "openAssignments", None)) is not None:
+            return count
         return self.assignments.filter(finishedAt=None).count()  # type: ignore - related_name from DbTaskAssignment
 
 
@@ -409,6 +541,9 @@ class StickerType(enum.Enum):
 
 
 class DbSticker(models.Model):
+    class Meta:
+        indexes = [models.Index(fields=["entityId", "type"])]
+
     team = models.ForeignKey(Team, related_name="stickers", on_delete=models.CASCADE)
     entityId = models.CharField(max_length=32)
     entityRevision = models.IntegerField()
@@ -429,24 +564,49 @@ class DbSticker(models.Model):
         return DbEntities.objects.get_revision(self.entityRevision)[1][self.entityId]
 
 
-class PrinterManager(models.Manager):
-    def prune(self):
-        """
-        Remove dead printers from database. Printer is considered dead after 1
-        minute of inactivity.
-        """
-        criticalPoint = timezone.now() - timezone.timedelta(minutes=1)
-        self.filter(registeredAt__lte=criticalPoint).delete()
-
-
 class Printer(models.Model):
+    """
+    Printers registered by print clients; the heartbeats are handled by
+    game.printing.PRINTER_REGISTRY
+    """
+
     name = models.CharField(max_length=200)
     address = models.CharField(max_length=200)
     port = models.IntegerField()
     registeredAt = models.DateTimeField(auto_now_add=True)
+    # Last heartbeat, written at most once per half of the TTL
+    lastSeen = models.DateTimeField(default=timezone.now)
     printsStickers = models.BooleanField()
 
-    objects = PrinterManager()
+
+class PrintJobStatus(enum.Enum):
+    pending = 0
+    printing = 1
+    done = 2
+    failed = 3
+
+
+class PrintJob(models.Model):
+    """
+    A request to print stickers, dispatched to the printer in the background
+    by game.printing.PRINT_DISPATCHER. The printer is referenced by name, so
+    the job survives the printer re-registering.
+    """
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "nextAttemptAt"])]
+
+    createdAt = models.DateTimeField(auto_now_add=True)
+    author = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    printerName = models.CharField(max_length=200)
+    stickers = JSONField()  # ids of DbSticker in print order
+    status: PrintJobStatus = enum.EnumField(PrintJobStatus, default=PrintJobStatus.pending)  # type: ignore
+    attempts = models.IntegerField(default=0)
+    # Pending jobs wait until then; for jobs being printed it's the deadline
+    # after which the job is considered abandoned and is dispatched again
+    nextAttemptAt = models.DateTimeField(default=timezone.now)
+    finishedAt = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True, default="")
 
 
 class DiffType(enum.Enum):
@@ -464,3 +624,34 @@ class DbMapDiff(models.Model):
     newLevel = models.IntegerField(null=True, blank=True)
     team = models.CharField(max_length=32, null=True, blank=True)
     armyName = models.CharField(max_length=32, null=True, blank=True)
+
+
+class DbGameEventManager(models.Manager):
+    # Events kept in the table; clients further behind refetch everything
+    RETAINED = 10000
+
+    def publish(
+        self, type: str, *, teams: Optional[list[str]] = None, **data
+    ) -> DbGameEvent:
+        event = self.create(
+            type=type, data=data, teams=sorted(teams) if teams is not None else None
+        )
+        if event.id % 1000 == 0:
+            self.filter(id__lte=event.id - self.RETAINED).delete()
+        return event
+
+
+class DbGameEvent(models.Model):
+    """
+    A compact "something changed" event served by game.events. Events are
+    written in the transaction of the change, so they become visible together
+    with it, and their id numbers them across all server processes.
+    """
+
+    createdAt = models.DateTimeField(auto_now_add=True)
+    type = models.CharField(max_length=32)
+    data = JSONField()
+    # Teams the event concerns; null for events concerning everybody
+    teams = JSONField(null=True)
+
+    objects = DbGameEventManager()
@@ -0,0 +1,292 @@
+import contextlib
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Min, Subquery
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from core.models.user import User
+from game.models import DbSticker, Printer, PrintJob, PrintJobStatus
+from game.stickers import StickerFormat, getStickerFile
+
+
+class PrintFailed(Exception):
+    pass
+
+
+class PrinterRegistry:
+    """
+    Keeps track of live printers. Print clients send a heartbeat every 30 s;
+    a printer is alive if its lastSeen is younger than the TTL. Liveness is
+    stored in the Printer table, so all server processes share it. To keep
+    heartbeats cheap, lastSeen is written only when it is older than half the
+    TTL or the printer changed its address or type; dead printers are pruned
+    by the same write.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Printers as this process last wrote or read them
+        self._known: dict[str, Printer] = {}
+
+    def heartbeat(
+        self, name: str, address: str, port: int, printsStickers: bool
+    ) -> Printer:
+        now = timezone.now()
+        current = (address, port, printsStickers)
+        with self._lock:
+            printer = self._known.get(name)
+            if printer is None or not self._isFresh(printer, current, now):
+                # Another process might have written the printer meanwhile
+                printer = Printer.objects.filter(name=name).first()
+            if printer is not None and self._isFresh(printer, current, now):
+                self._known[name] = printer
+                return printer
+
+            reregistered = (
+                printer is None
+                or current != (printer.address, printer.port, printer.printsStickers)
+                or now - printer.lastSeen >= self._ttl()
+            )
+            with transaction.atomic():
+                self._prune(now)
+                printer, _ = Printer.objects.update_or_create(
+                    name=name,
+                    defaults={
+                        "address": address,
+                        "port": port,
+                        "printsStickers": printsStickers,
+                        "lastSeen": now,
+                        "registeredAt": now if reregistered else printer.registeredAt,
+                    },
+                )
+            self._known[name] = printer
+            return printer
+
+    def alive(self) -> list[Printer]:
+        return list(self._alive().order_by("id"))
+
+    def get(self, id: int) -> Optional[Printer]:
+        return self._alive().filter(id=id).first()
+
+    def byName(self, name: str) -> Optional[Printer]:
+        return self._alive().filter(name=name).first()
+
+    def _isFresh(self, printer: Printer, current: tuple, now) -> bool:
+        """
+        The printer is unchanged and its lastSeen is recent enough
+        """
+        return (
+            current == (printer.address, printer.port, printer.printsStickers)
+            and now - printer.lastSeen < self._ttl() / 2
+        )
+
+    def _ttl(self) -> timezone.timedelta:
+        return timezone.timedelta(seconds=self.ttl)
+
+    def _alive(self):
+        return Printer.objects.filter(lastSeen__gt=timezone.now() - self._ttl())
+
+    def _prune(self, now) -> None:
+        """
+        Remove printers dead for longer than the TTL
+        """
+        Printer.objects.filter(lastSeen__lte=now - self._ttl()).delete()
+
+
+class PrintDispatcher:
+    """
+    Sends print jobs to printers from a background thread, so API requests
+    don't wait for the printers. Jobs are stored in the database and survive
+    restarts. Only the oldest unfinished job of each printer is sent, one at a
+    time, so the stickers come out in order even when a job fails. Failed jobs
+    are retried with exponential backoff; a job is given up after maxAttempts
+    and retryWindow seconds since it was created, so a restarting printer has
+    time to register again. Each printer keeps a persistent HTTP connection.
+    """
+
+    def __init__(
+        self, workers: int, maxAttempts: int, retryWindow: float, timeout: float
+    ):
+        self.workers = workers
+        self.maxAttempts = maxAttempts
+        self.retryWindow = retryWindow
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._busyPrinters: set[str] = set()
+        self._sessions: dict[tuple[str, int], requests.Session] = {}
+
+    def enqueue(
+        self, printer: Printer, stickers: list[DbSticker], author: Optional[User]
+    ) -> PrintJob:
+        job = PrintJob.objects.create(
+            author=author,
+            printerName=printer.name,
+            stickers=[s.id for s in stickers],
+        )
+        self.ensureRunning()
+        transaction.on_commit(self._wakeup.set)
+        return job
+
+    def ensureRunning(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._loop, name="print-dispatcher", daemon=True
+            )
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            # Wake up periodically to retry the jobs with backoff
+            self._wakeup.wait(timeout=1)
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                self.dispatchDue()
+            except Exception as e:
+                sys.stderr.write(f"*** PRINT DISPATCHER FAILED: {e}\n")
+
+    def dispatchDue(self) -> None:
+        """
+        Claim the oldest unfinished job of each printer if it is due for
+        (re)sending and hand them over to the workers
+        """
+        now = timezone.now()
+        unfinished = PrintJob.objects.filter(
+            status__in=[PrintJobStatus.pending, PrintJobStatus.printing]
+        )
+        oldest = (
+            unfinished.order_by()
+            .values("printerName")
+            .annotate(first=Min("id"))
+            .values("first")
+        )
+        due = PrintJob.objects.filter(
+            id__in=Subquery(oldest), nextAttemptAt__lte=now
+        ).order_by("id")
+        for job in list(due):
+            with self._lock:
+                if job.printerName in self._busyPrinters:
+                    continue
+                # The update fails if another dispatcher has claimed the job
+                claimed = PrintJob.objects.filter(
+                    pk=job.pk, status=job.status, nextAttemptAt=job.nextAttemptAt
+                ).update(
+                    status=PrintJobStatus.printing,
+                    attempts=F("attempts") + 1,
+                    nextAttemptAt=now + self._lease(),
+                )
+                if not claimed:
+                    continue
+                self._busyPrinters.add(job.printerName)
+            self._getExecutor().submit(self._run, job.pk, job.printerName)
+
+    def _getExecutor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="printer"
+            )
+        return self._executor
+
+    def _session(self, printer: Printer) -> requests.Session:
+        key = (printer.address, printer.port)
+        with self._lock:
+            if key not in self._sessions:
+                session = requests.Session()
+                session.mount("http://", HTTPAdapter(pool_maxsize=1))
+                self._sessions[key] = session
+            return self._sessions[key]
+
+    def _run(self, jobId: int, printerName: str) -> None:
+        try:
+            self._attempt(PrintJob.objects.get(pk=jobId))
+        except Exception as e:
+            sys.stderr.write(f"*** PRINT JOB {jobId} FAILED: {e}\n")
+        finally:
+            with self._lock:
+                self._busyPrinters.discard(printerName)
+            self._wakeup.set()
+            close_old_connections()
+
+    def _attempt(self, job: PrintJob) -> None:
+        try:
+            paths = self._stickerFiles(job)
+            if not self._renewLease(job):
+                # The render outlasted the lease and the job was claimed again
+                return
+            self._send(job, paths)
+            job.status = PrintJobStatus.done
+            job.finishedAt = timezone.now()
+            job.error = ""
+        except Exception as e:
+            job.error = str(e)
+            retrying = timezone.now() - job.createdAt
+            if job.attempts >= self.maxAttempts and retrying >= timezone.timedelta(
+                seconds=self.retryWindow
+            ):
+                job.status = PrintJobStatus.failed
+                job.finishedAt = timezone.now()
+            else:
+                job.status = PrintJobStatus.pending
+                delay = min(60, 2 ** (job.attempts - 1))
+                job.nextAttemptAt = timezone.now() + timezone.timedelta(seconds=delay)
+        job.save(update_fields=["status", "finishedAt", "error", "nextAttemptAt"])
+
+    def _lease(self) -> timezone.timedelta:
+        return timezone.timedelta(seconds=2 * self.timeout)
+
+    def _renewLease(self, job: PrintJob) -> bool:
+        """
+        Extend the claim of the job for the transfer; fails if the job has been
+        claimed again in the meantime
+        """
+        return bool(
+            PrintJob.objects.filter(
+                pk=job.pk, status=PrintJobStatus.printing, attempts=job.attempts
+            ).update(nextAttemptAt=timezone.now() + self._lease())
+        )
+
+    @staticmethod
+    def _stickerFiles(job: PrintJob) -> list[Path]:
+        # Printers get stickers already fitted to their head as 1-bit images.
+        # Rendering them on a cold cache may take longer than the lease.
+        stickers = DbSticker.objects.select_related("team").in_bulk(job.stickers)
+        return [
+            getStickerFile(stickers[id], StickerFormat.printer) for id in job.stickers
+        ]
+
+    def _send(self, job: PrintJob, paths: list[Path]) -> None:
+        printer = PRINTER_REGISTRY.byName(job.printerName)
+        if printer is None:
+            raise PrintFailed(f"Tiskárna {job.printerName} není připojena")
+        session = self._session(printer)
+        printerUrl = f"http://{printer.address}:{printer.port}/print"
+        # All stickers of the job go in one request and the printer prints them
+        # from a single queue entry
+        with contextlib.ExitStack() as stack:
+            files = [("image", stack.enter_context(open(p, "rb"))) for p in paths]
+            r = session.post(printerUrl, files=files, timeout=self.timeout)
+        if r.status_code != 200:
+            raise PrintFailed(r.text)
+
+
+PRINTER_REGISTRY = PrinterRegistry(ttl=settings.PRINTER_TTL_S)
+PRINT_DISPATCHER = PrintDispatcher(
+    workers=settings.PRINT_WORKERS,
+    maxAttempts=settings.PRINT_MAX_ATTEMPTS,
+    retryWindow=settings.PRINT_RETRY_WINDOW_S,
+    timeout=settings.PRINT_TIMEOUT_S,
+)
@@ -0,0 +1,215 @@
+from decimal import Decimal
+from typing import Any, Iterable, Optional
+
+import orjson
+from django.db import IntegrityError, transaction
+
+from game.entities import Entities, EntityId, TeamEntity, Vyroba
+from game.gameGlue import serializeEntity
+from game.models import DbState, DbTeamReadModel
+from game.renderers import encodeJson
+from game.state import Army, GameState, MapTile, TeamState
+
+
+def serializeArmy(
+    a: Army, reachableTiles: Optional[Iterable[MapTile]]
+) -> dict[str, Any]:
+    return {
+        "index": a.index,
+        "team": a.team.id,
+        "name": a.name,
+        "level": a.level,
+        "equipment": a.equipment,
+        "boost": a.boost,
+        "tile": a.tile.id if a.tile is not None else None,
+        "mode": a.mode.name,
+        "goal": a.goal.name if a.goal is not None else None,
+        "reachableTiles": (
+            [t.id for t in reachableTiles] if reachableTiles is not None else None
+        ),
+    }
+
+
+def teamSpecialResources(
+    teamState: TeamState, entities: Entities
+) -> dict[str, Decimal]:
+    resources = teamState.resources
+    return {
+        "work": resources.get(entities.work, Decimal(0)),
+        "obyvatels": resources.get(entities.obyvatel, Decimal(0)),
+        "population": teamState.population,
+        "culture": resources.get(entities.culture, Decimal(0)),
+        "withdraw_capacity": resources.get(entities.withdraw_capacity, Decimal(0)),
+    }
+
+
+def buildTeamReadModel(
+    state: GameState, team: TeamEntity, entities: Entities
+) -> dict[str, Any]:
+    """
+    Everything the team views derive from the game state, in the form the
+    views return it
+    """
+    teamState = state.teamStates[team]
+    reachableTiles = state.map.getReachableTiles(team)
+
+    def allowedTiles(vyroba: Vyroba) -> list[EntityId]:
+        return [
+            t.id
+            for t in reachableTiles
+            if set(vyroba.requiredTileFeatures).issubset(t.features)
+        ]
+
+    teamTechs = set(teamState.techs)
+    teamTechs.update(teamState.researching)
+    for t in teamState.techs:
+        teamTechs.update(t.unlocksTechs)
+
+    def techStatus(tech) -> str:
+        if tech in teamState.techs:
+            return "owned"
+        if tech in teamState.researching:
+            return "researching"
+        return "available"
+
+    resources = teamState.resources
+    assert all(amount >= 0 for amount in resources.values())
+    model = {
+        "resources": {
+            res.id: serializeEntity(res, {"available": resources[res]})
+            for res in resources.keys()
+            if resources[res] > 0
+        },
+        "vyrobas": {
+            v.id: serializeEntity(v, {"allowedTiles": allowedTiles(v)})
+            for v in teamState.unlocked_vyrobas()
+        },
+        "buildings": {b.id: serializeEntity(b) for b in teamState.unlocked_buildings()},
+        "building_upgrades": {
+            u.id: serializeEntity(u) for u in teamState.unlocked_building_upgrades()
+        },
+        "attributes": {
+            a.id: serializeEntity(a, {"owned": a in teamState.attributes})
+            for a in teamState.unlocked_attributes()
+        },
+        "techs": {
+            tech.id: serializeEntity(tech, {"status": techStatus(tech)})
+            for tech in teamTechs
+        },
+        "special_resources": teamSpecialResources(teamState, entities),
+        "productions": {res.id: a for res, a in teamState.productions.items()},
+        "storage": {res.id: a for res, a in teamState.storage.items()},
+        "employees": {res.id: a for res, a in teamState.employees.items()},
+        "armies": {a.index: serializeArmy(a, reachableTiles) for a in teamState.armies},
+        "tiles": {
+            tile.entity.id: serializeEntity(
+                tile.entity,
+                {
+                    "is_home": tile.entity == team.homeTile,
+                    "buildings": [x.id for x in tile.buildings],
+                    "building_upgrades": [x.id for x in tile.building_upgrades],
+                },
+            )
+            for tile in reachableTiles
+        },
+        "dashboard": {
+            "specialres": teamSpecialResources(teamState, entities),
+            "worldTurn": state.world.turn,
+            "teamTurn": teamState.turn,
+            "researching": [serializeEntity(x) for x in teamState.researching],
+            "productions": [(r.id, a) for r, a in teamState.productions.items()],
+            "storage": [(r.id, a) for r, a in teamState.storage.items()],
+            "employees": [(e.id, a) for e, a in teamState.employees.items()],
+            "armies": [serializeArmy(army, None) for army in teamState.armies],
+        },
+        "orginfo": {
+            "groups": list(x.id for x in team.groups),
+            "techs": list(x.id for x in teamState.techs),
+            "attributes": list(x.id for x in teamState.attributes),
+        },
+    }
+    # Store exactly what the JSON renderer would send
+    return orjson.loads(encodeJson(model))
+
+
+def storeTeamReadModels(
+    dbState: DbState,
+    state: GameState,
+    entities: Entities,
+    *,
+    entitiesRevision: int,
+    source: Optional[DbState],
+) -> None:
+    """
+    Compute read models of a new state. Teams whose view of the game didn't
+    change since the source state (same team, map and world state and the
+    same entities revision) only get a row pointing to the previous read
+    model.
+    """
+    previous: dict[str, DbTeamReadModel] = {}
+    if (
+        source is not None
+        and dbState.mapState_id == source.mapState_id
+        and dbState.worldState_id == source.worldState_id
+    ):
+        sourceTeamStates = dict(source.teamStates.values_list("team", "id"))
+        newTeamStates = dict(dbState.teamStates.values_list("team", "id"))
+        previous = {
+            m.team_id: m
+            for m in DbTeamReadModel.objects.filter(
+                state=source, entitiesRevision=entitiesRevision
+            )
+            if sourceTeamStates.get(m.team_id) == newTeamStates.get(m.team_id)
+        }
+
+    readModels = []
+    for team in state.teamStates:
+        if (prev := previous.get(team.id)) is not None:
+            readModels.append(
+                DbTeamReadModel(
+                    state=dbState,
+                    team_id=team.id,
+                    entitiesRevision=entitiesRevision,
+                    source_id=prev.source_id or prev.id,
+                )
+            )
+        else:
+            readModels.append(
+                DbTeamReadModel(
+                    state=dbState,
+                    team_id=team.id,
+                    entitiesRevision=entitiesRevision,
+                    data=buildTeamReadModel(state, team, entities),
+                )
+            )
+    DbTeamReadModel.objects.bulk_create(readModels)
+
+
+def getTeamReadModel(teamId: str) -> dict[str, Any]:
+    """
+    Read model of the team in the latest state; computed and stored if it is
+    missing (e.g., for a state created before the read models existed)
+    """
+    stateId = DbState.objects.order_by("-id").values_list("id", flat=True).first()
+    readModel = (
+        DbTeamReadModel.objects.select_related("source")
+        .filter(state=stateId, team=teamId)
+        .first()
+    )
+    if readModel is not None:
+        return readModel.data if readModel.source is None else readModel.source.data
+
+    dbState = DbState.objects.get(id=stateId)
+    entities = dbState.entities
+    data = buildTeamReadModel(dbState.toIr(), entities.teams[teamId], entities)
+    try:
+        with transaction.atomic():
+            DbTeamReadModel.objects.create(
+                state=dbState,
+                team_id=teamId,
+                entitiesRevision=dbState.entitiesRevision,
+                data=data,
+            )
+    except IntegrityError:
+        pass  # Stored by a concurrent request
+    return data
@@ -0,0 +1,84 @@
+import datetime
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+from game.entities import EntityBase
+
+JSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+
+def jsonDefault(obj: Any) -> Any:
+    """
+    Encodes what orjson doesn't handle itself (it does enums, datetimes and
+    UUIDs); the output matches DRF's JSONEncoder, except that entities are
+    encoded as their ids
+    """
+    if isinstance(obj, EntityBase):
+        return obj.id
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        try:
+            return sorted(obj)
+        except TypeError:
+            return list(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if hasattr(obj, "__iter__"):
+        return list(obj)
+    raise TypeError(f"Type {type(obj).__name__} is not JSON serializable")
+
+
+def encodeJson(data: Any, *, indent: bool = False) -> bytes:
+    options = JSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+    return orjson.dumps(data, default=jsonDefault, option=options)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Drop-in replacement of DRF's JSONRenderer. Encodes several times faster
+    and handles Decimals, enums, sets and entities without converting the
+    payload first.
+    """
+
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        params = dict(
+            param.strip().split("=", 1)
+            for param in (accepted_media_type or "").split(";")[1:]
+            if "=" in param
+        )
+        return encodeJson(data, indent="indent" in params)
+
+
+class ORJSONParser(BaseParser):
+    media_type = "application/json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f"JSON parse error - {e}")
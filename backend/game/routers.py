@@ -5,10 +5,12 @@ from game.viewsets.action_team import TeamActionViewSet
 from game.viewsets.action_view_helper import ActionLogViewSet
 from game.viewsets.armies import ArmiesViewSet
 from game.viewsets.entity import EntityViewSet
+from game.viewsets.events import EventsViewSet
 from game.viewsets.map import MapViewSet
 from game.viewsets.mapdiff import MapDiffViewSet
-from game.viewsets.printers import PrinterViewSet
+from game.viewsets.printers import PrinterViewSet, PrintJobViewSet
 from game.viewsets.state import StateViewSet
+from game.viewsets.stats import RoundMetricsViewSet
 from game.viewsets.stickers import StickerViewSet
 from game.viewsets.tasks import TaskViewSet
 from game.viewsets.team import TeamViewSet
@@ -24,12 +26,15 @@ routes.register(r"actions/team", TeamActionViewSet, basename="actionsteam")
 routes.register(r"actions/noinit", NoInitActionViewSet, basename="actionsnoinit")
 routes.register(r"turns", TurnsViewSet, basename="turns")
 routes.register(r"printers", PrinterViewSet, basename="printers")
+routes.register(r"printjobs", PrintJobViewSet, basename="printjobs")
 routes.register(r"stickers", StickerViewSet, basename="stickers")
 routes.register(r"state", StateViewSet, basename="states")
 routes.register(r"mapupdates", MapDiffViewSet, basename="mapdiff")
 routes.register(r"map", MapViewSet, basename="map")
 routes.register(r"armies", ArmiesViewSet, basename="armies")
 routes.register(r"tick", TickViewSet, basename="tick")
+routes.register(r"events", EventsViewSet, basename="events")
+routes.register(r"stats/rounds", RoundMetricsViewSet, basename="roundmetrics")
 
 
 urlpatterns = [*routes.urls]
@@ -78,3 +78,16 @@ class DbActionSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     interactions = DbInteractionSerializer(many=True, read_only=True)
+
+
+class DbInteractionSummarySerializer(DbInteractionSerializer):
+    class Meta(DbInteractionSerializer.Meta):
+        fields = ["id", "phase", "author", "created", "action", "new_state"]
+
+
+class DbActionSummarySerializer(DbActionSerializer):
+    """
+    Action log entry without the interactions' action objects and traces
+    """
+
+    interactions = DbInteractionSummarySerializer(many=True, read_only=True)
@@ -0,0 +1,50 @@
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save
+from django.dispatch import receiver
+
+from core.models.announcement import Announcement
+from game.events import GAME_EVENTS
+from game.models import DbGameEvent, DbMapDiff, DbTurn
+from game.printing import PRINT_DISPATCHER
+
+
+@receiver(post_save, sender=DbGameEvent)
+def gameEventSaved(sender, instance: DbGameEvent, **kwargs):
+    # Other processes pick the event up with their next poll
+    transaction.on_commit(GAME_EVENTS.poke)
+
+
+@receiver(post_save, sender=Announcement)
+def announcementSaved(sender, instance: Announcement, created: bool, **kwargs):
+    # New announcements are published once they get their teams
+    if not created:
+        teams = list(instance.teams.values_list("id", flat=True))
+        DbGameEvent.objects.publish(
+            "announcement", announcementId=instance.id, teams=teams
+        )
+
+
+@receiver(m2m_changed, sender=Announcement.teams.through)
+def announcementTeamsChanged(sender, instance, action: str, pk_set, **kwargs):
+    if action == "post_add" and isinstance(instance, Announcement):
+        teams = sorted(pk_set)
+        DbGameEvent.objects.publish(
+            "announcement", announcementId=instance.id, teams=teams
+        )
+
+
+@receiver(post_save, sender=DbMapDiff)
+def mapDiffSaved(sender, instance: DbMapDiff, **kwargs):
+    DbGameEvent.objects.publish("mapdiff", mapDiffId=instance.id)
+
+
+@receiver(post_save, sender=DbTurn)
+def turnSaved(sender, instance: DbTurn, **kwargs):
+    DbGameEvent.objects.publish("turn", turnId=instance.id)
+
+
+@receiver(request_started)
+def startPrintDispatcher(**kwargs):
+    # Jobs left pending before a restart are sent without waiting for a new one
+    PRINT_DISPATCHER.ensureRunning()
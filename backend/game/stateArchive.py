@@ -0,0 +1,219 @@
+"""
+Archive of the game states as a compressed JSON Lines stream.
+
+Every record is a JSON object on its own line. Map, world and team state
+blobs are written once, before the first state using them:
+
+    {"kind": "map" | "world", "id": 1, "data": {...}}
+    {"kind": "team", "id": 1, "team": "tym-cerveni", "data": {...}}
+    {"kind": "state", "id": 1, "map": 1, "world": 1, "teams": [1, 2],
+     "action": {"type": ..., "description": ..., "phase": ..., "created": ...}}
+
+With deduplication, a blob with the same content as an already written blob
+of the same kind is written as {"kind": ..., "id": 2, "same": 1} (plus
+"team" for team states). The action of a state is informative only.
+"""
+
+import gzip
+import hashlib
+import io
+from pathlib import Path
+from typing import IO, Any, Iterable, Iterator
+
+import orjson
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from game.history import batched
+from game.models import DbMapState, DbState, DbTeamState, DbWorldState
+
+try:
+    import zstandard
+except ImportError:  # Archives are gzip compressed
+    zstandard = None  # type: ignore
+
+BLOB_MODELS = {"map": DbMapState, "world": DbWorldState, "team": DbTeamState}
+StateThrough = DbState.teamStates.through
+
+
+def openArchive(path: Path, mode: str) -> IO[bytes]:
+    """
+    Opens an archive for binary reading ("r") or writing ("w"), zstd
+    compressed when the name ends with .zst, gzip compressed otherwise
+    """
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError("zstd archives require the zstandard package")
+        if mode == "r":
+            return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"))
+        return zstandard.ZstdCompressor().stream_writer(open(path, "wb"))
+    return gzip.open(path, mode + "b")
+
+
+class ArchiveWriter:
+    def __init__(self, output: IO[bytes], *, dedup: bool):
+        self.output = output
+        self.dedup = dedup
+        self.written: dict[str, set[int]] = {kind: set() for kind in BLOB_MODELS}
+        self.digests: dict[tuple, int] = {}
+
+    def writeRecord(self, record: dict[str, Any]) -> None:
+        self.output.write(orjson.dumps(record) + b"\n")
+
+    def writeBlobs(self, kind: str, ids: Iterable[int]) -> None:
+        missing = set(ids) - self.written[kind]
+        if not missing:
+            return
+        fields = ["id", "team", "data"] if kind == "team" else ["id", "data"]
+        blobs = BLOB_MODELS[kind].objects.filter(id__in=missing).order_by("id")
+        for values in blobs.values_list(*fields):
+            record = {"kind": kind, **dict(zip(fields, values))}
+            if self.dedup:
+                content = orjson.dumps(record["data"], option=orjson.OPT_SORT_KEYS)
+                digest = (kind, record.get("team"), hashlib.sha256(content).digest())
+                same = self.digests.setdefault(digest, record["id"])
+                if same != record["id"]:
+                    del record["data"]
+                    record["same"] = same
+            self.writeRecord(record)
+        self.written[kind].update(missing)
+
+    def writeStates(self, batchSize: int) -> int:
+        """
+        Streams all the states in batches, returns the number of states
+        """
+        rows = (
+            DbState.objects.order_by("id")
+            .values_list(
+                "id",
+                "mapState",
+                "worldState",
+                "interaction__action__actionType",
+                "interaction__action__description",
+                "interaction__phase",
+                "interaction__created",
+            )
+            .iterator(chunk_size=batchSize)
+        )
+        count = 0
+        for batch in batched(rows, batchSize):
+            teams: dict[int, list[int]] = {state[0]: [] for state in batch}
+            for stateId, teamStateId in (
+                StateThrough.objects.filter(dbstate__in=teams)
+                .order_by("dbstate", "dbteamstate")
+                .values_list("dbstate", "dbteamstate")
+            ):
+                teams[stateId].append(teamStateId)
+
+            self.writeBlobs("map", (state[1] for state in batch))
+            self.writeBlobs("world", (state[2] for state in batch))
+            self.writeBlobs("team", (t for ids in teams.values() for t in ids))
+            for stateId, mapId, worldId, type, description, phase, created in batch:
+                action = None
+                if type is not None:
+                    action = {
+                        "type": type,
+                        "description": description,
+                        "phase": phase.name,
+                        "created": created.isoformat(),
+                    }
+                self.writeRecord(
+                    {
+                        "kind": "state",
+                        "id": stateId,
+                        "map": mapId,
+                        "world": worldId,
+                        "teams": teams[stateId],
+                        "action": action,
+                    }
+                )
+            count += len(batch)
+        return count
+
+
+def dumpStates(output: IO[bytes], *, batchSize: int = 1000, dedup: bool = True) -> int:
+    """
+    Writes all the states into the archive, returns the number of states
+    """
+    return ArchiveWriter(output, dedup=dedup).writeStates(batchSize)
+
+
+def readRecords(input: IO[bytes]) -> Iterator[dict[str, Any]]:
+    for line in io.BufferedReader(input):  # type: ignore
+        if line.strip():
+            yield orjson.loads(line)
+
+
+class ArchiveLoader:
+    def __init__(self, batchSize: int):
+        self.batchSize = batchSize
+        self.blobs: dict[str, list[dict[str, Any]]] = {k: [] for k in BLOB_MODELS}
+        self.states: list[dict[str, Any]] = []
+
+    def add(self, record: dict[str, Any]) -> None:
+        if record["kind"] == "state":
+            self.states.append(record)
+        else:
+            self.blobs[record["kind"]].append(record)
+        if len(self.states) + sum(map(len, self.blobs.values())) >= self.batchSize:
+            self.flush()
+
+    def flush(self) -> None:
+        for kind, records in self.blobs.items():
+            model = BLOB_MODELS[kind]
+            model.objects.bulk_create(
+                model(**self.blobFields(r)) for r in records if "same" not in r
+            )
+            copies = [r for r in records if "same" in r]
+            if copies:
+                data = dict(
+                    model.objects.filter(
+                        id__in={r["same"] for r in copies}
+                    ).values_list("id", "data")
+                )
+                model.objects.bulk_create(
+                    model(**self.blobFields(r), data=data[r["same"]]) for r in copies
+                )
+            records.clear()
+
+        DbState.objects.bulk_create(
+            DbState(id=s["id"], mapState_id=s["map"], worldState_id=s["world"])
+            for s in self.states
+        )
+        StateThrough.objects.bulk_create(
+            StateThrough(dbstate_id=s["id"], dbteamstate_id=t)
+            for s in self.states
+            for t in s["teams"]
+        )
+        self.states.clear()
+
+    @staticmethod
+    def blobFields(record: dict[str, Any]) -> dict[str, Any]:
+        fields = {"id": record["id"]}
+        if "team" in record:
+            fields["team_id"] = record["team"]
+        if "data" in record:
+            fields["data"] = record["data"]
+        return fields
+
+
+@transaction.atomic
+def loadStates(input: IO[bytes], *, batchSize: int = 1000) -> int:
+    """
+    Restores states from the archive into empty state tables, keeping their
+    ids. Returns the number of states.
+    """
+    models = [*BLOB_MODELS.values(), DbState]
+    if any(model.objects.exists() for model in models):
+        raise ValueError("State tables are not empty")
+    loader = ArchiveLoader(batchSize)
+    count = 0
+    for record in readRecords(input):
+        loader.add(record)
+        count += record["kind"] == "state"
+    loader.flush()
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+    return count
@@ -0,0 +1,160 @@
+import itertools
+from decimal import Decimal
+from typing import Iterator, Mapping, NamedTuple, Optional
+
+from game.entities import Entities, Resource
+from game.gameGlue import stateDeserialize
+from game.models import DbState, DbTeamRoundMetrics, DbTeamState, DbWorldState
+from game.state import GameState, TeamState
+
+TeamId = str
+
+# Keys of teamRoundMetrics stored in DbTeamRoundMetrics fields
+METRIC_FIELDS = {
+    "populace": "population",
+    "obyvatele": "obyvatele",
+    "techy": "techs",
+    "productions": "productions",
+    "weightedProductions": "weightedProductions",
+}
+
+
+class RoundStart(NamedTuple):
+    stateId: int
+    turn: int
+    teamStates: dict[TeamId, TeamState]
+
+
+def productionWeights(entities: Entities) -> dict[Resource, Decimal]:
+    """
+    Weight of each production in the weighted production total: the points
+    of the cheapest vyroba making the produced material (or the production
+    itself), so advanced productions count more than basic ones. Productions
+    no vyroba makes weigh 1.
+    """
+    points: dict[Resource, int] = {}
+    for vyroba in entities.vyrobas.values():
+        resource = vyroba.reward[0]
+        points[resource] = min(points.get(resource, vyroba.points), vyroba.points)
+    weights = {}
+    for resource in entities.resources.values():
+        if not resource.isTradableProduction:
+            continue
+        assert resource.produces is not None
+        weight = points.get(resource.produces, points.get(resource, 1))
+        weights[resource] = Decimal(max(weight, 1))
+    return weights
+
+
+def teamRoundMetrics(
+    teamState: TeamState, entities: Entities, weights: Mapping[Resource, Decimal]
+) -> dict[str, Decimal | int]:
+    """
+    Metrics of a team summarized after each round, weights come from
+    productionWeights
+    """
+    productions = Decimal(0)
+    weightedProductions = Decimal(0)
+    for resource, amount in teamState.resources.items():
+        if resource.isTradableProduction:
+            productions += amount
+            weightedProductions += weights.get(resource, Decimal(1)) * amount
+    return {
+        "obyvatele": teamState.resources.get(entities.obyvatel, Decimal(0)),
+        "populace": teamState.population,
+        "techy": len(teamState.techs),
+        "productions": productions,
+        "weightedProductions": weightedProductions,
+    }
+
+
+def storeRoundMetrics(dbState: DbState, state: GameState, entities: Entities) -> None:
+    """
+    Stores the metrics of all teams at the start of the state's round. A
+    round started again (e.g., a repeated NextTurnAction) replaces its rows.
+    """
+    weights = productionWeights(entities)
+    rows = []
+    for team, teamState in state.teamStates.items():
+        metrics = teamRoundMetrics(teamState, entities, weights)
+        rows.append(
+            DbTeamRoundMetrics(
+                team_id=team.id,
+                turn=state.world.turn,
+                state=dbState,
+                armies=len(teamState.armies),
+                buildings=len(teamState.owned_buildings(state.map)),
+                **{METRIC_FIELDS[key]: value for key, value in metrics.items()},
+            )
+        )
+    DbTeamRoundMetrics.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["team", "turn"],
+        update_fields=[*DbTeamRoundMetrics.METRICS, "state"],
+    )
+
+
+def iterRoundStarts(entities: Entities, chunkSize: int = 2000) -> Iterator[RoundStart]:
+    """
+    Streams the game history in state order and yields the first state of
+    each round after the first one. Only the turn of each world state and
+    the team states of the yielded states get deserialized, so memory stays
+    bounded by a single state.
+    """
+    states = (
+        DbState.objects.order_by("id")
+        .values_list("id", "worldState")
+        .iterator(chunk_size=chunkSize)
+    )
+    worldStateId: Optional[int] = None
+    turn: Optional[int] = None
+    for stateId, stateWorldId in states:
+        if stateWorldId == worldStateId:
+            continue
+        worldStateId = stateWorldId
+        worldData = DbWorldState.objects.values_list("data", flat=True).get(
+            id=stateWorldId
+        )
+        previousTurn, turn = turn, worldData.get("turn", 0)
+        if previousTurn is None or turn == previousTurn:
+            continue
+
+        teamStates = DbTeamState.objects.filter(states=stateId).values_list(
+            "team", "data"
+        )
+        yield RoundStart(
+            stateId,
+            turn,
+            {
+                teamId: stateDeserialize(TeamState, data, entities)
+                for teamId, data in teamStates
+            },
+        )
+
+
+def iterRoundMetrics(
+    entities: Entities,
+) -> Iterator[tuple[int, dict[TeamId, dict[str, Decimal | int]]]]:
+    """
+    Yields the turn and the teamRoundMetrics of each team for every round
+    after the first one. Reads the metrics table when it covers the game
+    from its first round, otherwise computes them from the streamed history.
+    """
+    if DbTeamRoundMetrics.objects.filter(turn=1).exists():
+        rows = DbTeamRoundMetrics.objects.order_by("turn", "team").values_list(
+            "turn", "team", *METRIC_FIELDS.values()
+        )
+        for turn, turnRows in itertools.groupby(rows, key=lambda row: row[0]):
+            yield turn, {
+                teamId: dict(zip(METRIC_FIELDS.keys(), values))
+                for _, teamId, *values in turnRows
+            }
+        return
+
+    weights = productionWeights(entities)
+    for roundStart in iterRoundStarts(entities):
+        yield roundStart.turn, {
+            teamId: teamRoundMetrics(teamState, entities, weights)
+            for teamId, teamState in roundStart.teamStates.items()
+        }
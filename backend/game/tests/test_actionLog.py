@@ -0,0 +1,133 @@
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Team, User
+from game.models import (
+    ActionStatus,
+    DbAction,
+    DbInteraction,
+    DbMapState,
+    DbState,
+    DbWorldState,
+    InteractionType,
+)
+from game.viewsets.action_team import TeamActionViewSet
+from game.viewsets.action_view_helper import ActionLogViewSet
+
+
+@pytest.fixture
+def org(db) -> User:
+    return User.objects.create(username="org")
+
+
+def makeActions(count: int, org: User) -> None:
+    Team.objects.create(id="tym-cerveni", name="Červení", color="red")
+    for i in range(count):
+        action = DbAction.objects.create(
+            actionType="VyrobaAction" if i % 2 else "NextTurnAction",
+            entitiesRevision=1,
+            args={"team": "tym-cerveni"} if i % 2 else {},
+        )
+        state = DbState.objects.create(
+            mapState=DbMapState.objects.create(data={}),
+            worldState=DbWorldState.objects.create(data={}),
+        )
+        DbInteraction.objects.create(
+            phase=InteractionType.commit,
+            action=action,
+            author=org,
+            actionObject={"args": "x" * 1000},
+            trace="Stopa",
+            new_state=state,
+        )
+
+
+def getLog(user: User, pk=None, **params):
+    request = APIRequestFactory().get("/", params)
+    force_authenticate(request, user=user)
+    if pk is not None:
+        return ActionLogViewSet.as_view({"get": "retrieve"})(request, pk=pk)
+    return ActionLogViewSet.as_view({"get": "list"})(request)
+
+
+def test_list_is_slim_and_keyset_paginated(org, django_assert_num_queries):
+    makeActions(5, org)
+
+    ids = []
+    response = getLog(org, page_size=2)
+    while True:
+        assert "count" not in response.data
+        for action in response.data["results"]:
+            ids.append(action["id"])
+            assert "actionObject" not in action["interactions"][0]
+            assert action["interactions"][0]["author"] == "org"
+        if response.data["next"] is None:
+            break
+        cursor = parse_qs(urlparse(response.data["next"]).query)["cursor"][0]
+        # Actions, their interactions with authors
+        with django_assert_num_queries(2):
+            response = getLog(org, page_size=2, cursor=cursor)
+    assert ids == sorted(DbAction.objects.values_list("id", flat=True), reverse=True)
+
+    full = getLog(org, full="true")
+    assert full.data["results"][0]["interactions"][0]["trace"] == "Stopa"
+    detail = getLog(org, pk=ids[0])
+    assert detail.data["interactions"][0]["trace"] == "Stopa"
+
+
+def test_page_numbers_are_ignored(org):
+    makeActions(5, org)
+    response = getLog(org, page=2, page_size=2)
+    assert "count" not in response.data
+    assert len(response.data["results"]) == 2
+    assert response.data["results"][0]["id"] == DbAction.objects.latest("id").id
+
+
+def test_filters(org):
+    makeActions(5, org)
+    response = getLog(org, team="tym-cerveni")
+    assert len(response.data["results"]) == 2
+    assert all(a["team"] == "tym-cerveni" for a in response.data["results"])
+
+    response = getLog(org, actionType="NextTurnAction,Other")
+    assert len(response.data["results"]) == 3
+
+    first = DbAction.objects.order_by("id").first()
+    response = getLog(org, until=first.createdAt.isoformat())
+    assert response.data["results"] == []
+    response = getLog(org, since=first.createdAt.isoformat())
+    assert len(response.data["results"]) == 5
+
+
+def test_unfinished_actions(org, django_assert_num_queries):
+    other = User.objects.create(username="org2")
+    statuses = [
+        (org, ActionStatus.initiated),
+        (org, ActionStatus.committed),
+        (other, ActionStatus.initiated),
+        (org, ActionStatus.reverted),
+        (org, ActionStatus.initiated),
+    ]
+    actions = [
+        DbAction.objects.create(
+            actionType="VyrobaAction",
+            entitiesRevision=1,
+            args={},
+            description=f"Akce {i}",
+            author=author,
+            status=status,
+        )
+        for i, (author, status) in enumerate(statuses)
+    ]
+
+    request = APIRequestFactory().get("/")
+    force_authenticate(request, user=org)
+    # Savepoint, unfinished actions, savepoint release
+    with django_assert_num_queries(3):
+        response = TeamActionViewSet.as_view({"get": "unfinished"})(request)
+    assert response.data == [
+        {"id": actions[0].id, "description": "Akce 0"},
+        {"id": actions[4].id, "description": "Akce 4"},
+    ]
@@ -0,0 +1,91 @@
+import pytest
+
+from core.models import Team
+from game.entities import MapTileEntity, Resource, TeamEntity, Tech, Vyroba
+from game.models import DbEntities, DbSticker, StickerType
+from game.viewsets.action_view_helper import ActionViewHelper
+from game.viewsets.stickers import Sticker
+
+HOME_TILE = MapTileEntity(
+    id="map-tile00", name="Domov", index=0, naturalResources=[], richness=0
+)
+
+
+def makeTeams(count: int) -> list[TeamEntity]:
+    teams = []
+    for i in range(count):
+        team = TeamEntity(
+            id=f"tym-{i}",
+            name=f"Tým {i}",
+            color="black",
+            visible=True,
+            homeTile=HOME_TILE,
+            username=None,
+            password=None,
+        )
+        Team.objects.create(id=team.id, name=team.name, color=team.color)
+        teams.append(team)
+    return teams
+
+
+def makeTechs(count: int) -> list[Tech]:
+    return [
+        Tech(id=f"tec-{i}", name=f"Tech {i}", points=1, requiresTask=False)
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def entitiesRevision(db) -> int:
+    return DbEntities.objects.create(data={}).id
+
+
+def test_award_empty(entitiesRevision, django_assert_num_queries):
+    # savepoint + release
+    with django_assert_num_queries(2):
+        assert ActionViewHelper._awardStickers(set()) == []
+
+
+@pytest.mark.parametrize("teamCount, techCount", [(1, 1), (3, 5), (8, 20)])
+def test_award_query_count(
+    entitiesRevision, django_assert_num_queries, teamCount, techCount
+):
+    teams = makeTeams(teamCount)
+    techs = makeTechs(techCount)
+    stickers = {Sticker(t, e) for t in teams for e in techs}
+
+    # savepoint + revision + teams + awarded techs + bulk insert + release
+    with django_assert_num_queries(6):
+        awarded = ActionViewHelper._awardStickers(stickers)
+
+    assert len(awarded) == teamCount * techCount
+    assert all(s.pk is not None for s in awarded)
+    assert all(s.entityRevision == entitiesRevision for s in awarded)
+    assert DbSticker.objects.count() == teamCount * techCount
+
+
+def test_award_first_tech(entitiesRevision):
+    teams = makeTeams(3)
+    tech, otherTech = makeTechs(2)
+
+    ActionViewHelper._awardStickers({Sticker(teams[0], tech)})
+    awarded = ActionViewHelper._awardStickers(
+        {Sticker(t, e) for t in teams[1:] for e in [tech, otherTech]}
+    )
+
+    types = {(s.team.id, s.entityId): s.type for s in awarded}
+    assert types[(teams[1].id, tech.id)] == StickerType.techSmall
+    assert types[(teams[2].id, tech.id)] == StickerType.techSmall
+    assert sorted(types[(t.id, otherTech.id)] for t in teams[1:]) == sorted(
+        [StickerType.techFirst, StickerType.techSmall]
+    )
+
+
+def test_award_regular(entitiesRevision):
+    (team,) = makeTeams(1)
+    resource = Resource(id="mat-a", name="Materiál")
+    vyroba = Vyroba(id="vyr-a", name="Výroba", points=1, reward=(resource, 1))
+
+    (sticker,) = ActionViewHelper._awardStickers({Sticker(team, vyroba)})
+    assert sticker.type == StickerType.regular
+    assert sticker.team.id == team.id
@@ -0,0 +1,94 @@
+import datetime
+
+import pytest
+from django.utils import timezone
+from rest_framework import viewsets
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Team, User
+from game.models import DbEntities, DbTurn
+from game.viewsets.conditional import conditional
+from game.viewsets.turns import TurnsViewSet
+
+
+class CountingViewSet(viewsets.ViewSet):
+    calls = 0
+
+    @conditional()
+    def list(self, request):
+        CountingViewSet.calls += 1
+        return Response({"calls": CountingViewSet.calls})
+
+
+@pytest.fixture
+def org(db) -> User:
+    return User.objects.create(username="org")
+
+
+def get(view, user: User, etag=None):
+    headers = {"HTTP_IF_NONE_MATCH": etag} if etag is not None else {}
+    request = APIRequestFactory().get("/", **headers)
+    force_authenticate(request, user=user)
+    return view(request)
+
+
+def test_not_modified_skips_view(org):
+    view = CountingViewSet.as_view({"get": "list"})
+    CountingViewSet.calls = 0
+
+    first = get(view, org)
+    assert first.status_code == 200
+    etag = first["ETag"]
+
+    second = get(view, org, etag)
+    assert second.status_code == 304
+    assert second["ETag"] == etag
+    assert CountingViewSet.calls == 1
+
+    assert get(view, org, f'"other", W/{etag}').status_code == 304
+
+    DbEntities.objects.create(data={})
+    third = get(view, org, etag)
+    assert third.status_code == 200
+    assert third["ETag"] != etag
+    assert CountingViewSet.calls == 2
+
+
+def test_etag_depends_on_role(org):
+    team = Team.objects.create(id="tym-zeleni", name="Zelení", color="green")
+    player = User.objects.create(username="zeleni", team=team)
+    view = CountingViewSet.as_view({"get": "list"})
+
+    etag = get(view, org)["ETag"]
+    assert get(view, player, etag).status_code == 200
+
+
+def test_turns_etag_follows_turn_edits(org):
+    turn = DbTurn.objects.create(enabled=False, duration=900)
+    view = TurnsViewSet.as_view({"get": "list"})
+
+    etag = get(view, org)["ETag"]
+    assert get(view, org, etag).status_code == 304
+
+    turn.enabled = True
+    turn.save()
+    assert get(view, org, etag).status_code == 200
+
+
+def test_active_turn_etag_follows_turn_end(org, monkeypatch):
+    started = timezone.now()
+    DbTurn.objects.create(enabled=True, duration=900, startedAt=started)
+    DbTurn.objects.create(enabled=False, duration=900)
+    view = TurnsViewSet.as_view({"get": "active"})
+
+    first = get(view, org)
+    assert first.data["id"] != -1
+    assert get(view, org, first["ETag"]).status_code == 304
+
+    # The turn ends without any change in the database
+    later = started + datetime.timedelta(seconds=901)
+    monkeypatch.setattr(timezone, "now", lambda: later)
+    response = get(view, org, first["ETag"])
+    assert response.status_code == 200
+    assert response.data == {"id": -1}
@@ -0,0 +1,65 @@
+import gzip
+import json
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import User
+from game.entities import Entities, Resource
+from game.models import DbEntities
+from game.viewsets import entity
+from game.viewsets.entity import (
+    IMMUTABLE_CACHE_CONTROL,
+    EntityViewSet,
+    negotiateEncoding,
+)
+
+
+def get(user: User, headers={}, **params):
+    request = APIRequestFactory().get("/", params, **headers)
+    force_authenticate(request, user=user)
+    return EntityViewSet.as_view({"get": "resources"})(request)
+
+
+def test_entity_payload_is_built_once_per_revision(db, monkeypatch):
+    org = User.objects.create(username="org")
+    wood = Resource(id="mat-drevo", name="Dřevo", produces=None)
+    revision = DbEntities.objects.create(data={}).id
+    monkeypatch.setitem(DbEntities.objects.cache, revision, Entities([wood]))
+    entity.entityPayload.cache_clear()
+
+    plain = get(org)
+    assert plain.status_code == 200
+    assert plain["Cache-Control"] == "private, no-cache"
+    assert plain["X-Entities-Revision"] == str(revision)
+    assert json.loads(plain.content)["mat-drevo"]["name"] == "Dřevo"
+
+    compressed = get(org, {"HTTP_ACCEPT_ENCODING": "gzip, deflate"})
+    assert compressed["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.content) == plain.content
+    assert entity.entityPayload.cache_info().misses == 1
+
+    assert get(org, {"HTTP_IF_NONE_MATCH": plain["ETag"]}).status_code == 304
+    # Each content coding has its own strong ETag
+    assert compressed["ETag"] != plain["ETag"]
+    gzipped = {"HTTP_ACCEPT_ENCODING": "gzip"}
+    assert get(org, {**gzipped, "HTTP_IF_NONE_MATCH": plain["ETag"]}).status_code == 200
+    assert (
+        get(org, {**gzipped, "HTTP_IF_NONE_MATCH": compressed["ETag"]}).status_code
+        == 304
+    )
+
+    pinned = get(org, revision=revision)
+    assert pinned["Cache-Control"] == IMMUTABLE_CACHE_CONTROL
+    assert pinned.content == plain.content
+    assert get(org, revision=revision + 1).status_code == 404
+    assert get(org, revision="latest").status_code == 400
+
+
+def test_refused_encodings_are_not_used(monkeypatch):
+    monkeypatch.setattr(entity, "brotli", object())
+    assert negotiateEncoding("gzip, deflate, br") == "br"
+    assert negotiateEncoding("br;q=0, gzip") == "gzip"
+    assert negotiateEncoding("br;q=0.5, gzip;q=1") == "br"
+    assert negotiateEncoding("gzip;q=0") is None
+    assert negotiateEncoding("gzip; q=0.000, identity") is None
+    assert negotiateEncoding("") is None
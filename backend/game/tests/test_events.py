@@ -0,0 +1,194 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+import game.models
+from core.models import Team, User
+from core.models.announcement import Announcement
+from game.events import GAME_EVENTS, EventBus
+from game.models import DbGameEvent, DbState, DbTurn
+from game.viewsets import events
+from game.viewsets.events import EventsViewSet
+
+
+def publish(bus: EventBus, type: str, **kwargs):
+    event = DbGameEvent.objects.publish(type, **kwargs)
+    bus.refresh()
+    return bus.since(event.id - 1, timeout=0).events[0]
+
+
+def test_bus_returns_events_after_seq(db):
+    bus = EventBus(bufferSize=3, pollInterval=None)
+    assert bus.since(0, timeout=0).events == []
+
+    first = publish(bus, "turn", turnId=1)
+    second = publish(bus, "state", stateId=5, teams=["tym-a"])
+    page = bus.since(first.seq, timeout=0)
+    assert page.events == [second]
+    assert not page.reset
+
+    for i in range(3):
+        publish(bus, "mapdiff", mapDiffId=i)
+    # The client missed events that fell out of the buffer
+    assert bus.since(first.seq, timeout=0).reset
+    # The database was reset
+    assert bus.since(100, timeout=0).reset
+
+
+def test_bus_is_shared_by_processes(db):
+    # Buses of two server processes
+    bus, other = EventBus(pollInterval=None), EventBus(pollInterval=None)
+    assert bus.last == other.last == 0
+    publish(bus, "turn", turnId=1)
+    publish(bus, "turn", turnId=2)
+
+    # A process started later knows the recent events too
+    assert [e.data for e in EventBus(pollInterval=None).since(0).events] == [
+        {"turnId": 1},
+        {"turnId": 2},
+    ]
+    other.refresh()
+    assert other.since(1, timeout=0).events == bus.since(1, timeout=0).events
+
+
+def test_bus_wakes_up_waiting_clients(db):
+    bus = EventBus(pollInterval=None)
+    bus.refresh()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(bus.since(0, timeout=5)))
+    waiter.start()
+    publish(bus, "turn", turnId=1)
+    waiter.join(timeout=5)
+    assert [e.type for e in result[0].events] == ["turn"]
+
+
+def test_announcement_events_are_private(db):
+    bus = EventBus(pollInterval=None)
+    event = publish(bus, "announcement", announcementId=1, teams=["tym-a", "tym-b"])
+    assert event.visibleTo(None)
+    assert event.visibleTo("tym-a")
+    assert not event.visibleTo("tym-c")
+    assert event.serialize("tym-a")["teams"] == ["tym-a"]
+    assert event.serialize(None)["teams"] == ["tym-a", "tym-b"]
+
+
+@pytest.fixture
+def bus(db, monkeypatch) -> EventBus:
+    bus = EventBus(pollInterval=None)
+    monkeypatch.setattr(EventsViewSet, "bus", bus)
+    monkeypatch.setattr(events, "LONG_POLL_TIMEOUT_S", 0)
+    return bus
+
+
+def poll(user: User, **params):
+    request = APIRequestFactory().get("/", params)
+    force_authenticate(request, user=user)
+    return EventsViewSet.as_view({"get": "list"})(request).data
+
+
+def test_long_poll(db, bus):
+    team = Team.objects.create(id="tym-a", name="A", color="red")
+    player = User.objects.create(username="a", team=team)
+    org = User.objects.create(username="org")
+
+    start = poll(player)
+    assert start["reset"]
+
+    publish(bus, "announcement", announcementId=1, teams=["tym-b"])
+    publish(bus, "state", stateId=2, teams=["tym-b"])
+    publish(bus, "world", stateId=2, map=True, world=False)
+    publish(bus, "state", stateId=3, teams=["tym-a", "tym-b"])
+    page = poll(player, since=start["last"])
+    assert [e["type"] for e in page["events"]] == ["world", "state"]
+    assert page["events"][1]["teams"] == ["tym-a"]
+    assert page["last"] == start["last"] + 4
+
+    page = poll(org, since=start["last"])
+    assert [e["type"] for e in page["events"]] == [
+        "announcement",
+        "state",
+        "world",
+        "state",
+    ]
+
+    assert poll(org, since=page["last"] + 1)["reset"]
+
+
+def test_models_publish_events(bus, django_capture_on_commit_callbacks):
+    last = bus.last
+    team = Team.objects.create(id="tym-a", name="A", color="red")
+    with django_capture_on_commit_callbacks() as callbacks:
+        DbTurn.objects.create(enabled=True, duration=60)
+        a = Announcement.objects.create(
+            content="Ahoj", appearDatetime="2024-01-01T10:00Z"
+        )
+        a.teams.add(team)
+    # Local clients learn about the events as soon as they are committed
+    assert GAME_EVENTS.poke in callbacks
+
+    bus.refresh()
+    page = bus.since(last, timeout=0)
+    assert [(e.type, e.teams) for e in page.events] == [
+        ("turn", None),
+        ("announcement", frozenset({"tym-a"})),
+    ]
+
+
+def test_event_stream(db, bus):
+    org = User.objects.create(username="org")
+    request = APIRequestFactory().get("/", HTTP_ACCEPT="text/event-stream")
+    force_authenticate(request, user=org)
+    response = EventsViewSet.as_view({"get": "list"})(request)
+    assert response["Content-Type"] == "text/event-stream"
+
+    stream = iter(response.streaming_content)
+    assert next(stream) == b"id: 0\nevent: reset\ndata: {}\n\n"
+    event = publish(bus, "turn", turnId=3)
+    assert (
+        next(stream)
+        == (
+            f"id: {event.seq}\nevent: turn\n"
+            f'data: {{"seq":{event.seq},"type":"turn","turnId":3}}\n\n'
+        ).encode()
+    )
+
+
+def test_event_stream_ends(db, bus, monkeypatch):
+    monkeypatch.setattr(events, "STREAM_LIFETIME_S", 0)
+    org = User.objects.create(username="org")
+    request = APIRequestFactory().get(
+        "/", HTTP_ACCEPT="text/event-stream", HTTP_LAST_EVENT_ID=str(bus.last)
+    )
+    force_authenticate(request, user=org)
+    response = EventsViewSet.as_view({"get": "list"})(request)
+    # The client reconnects from the last event it has seen
+    assert list(response.streaming_content) == []
+
+
+def test_new_states_publish_team_and_world_events(bus, monkeypatch):
+    monkeypatch.setattr(game.models, "stateSerialize", lambda model: model)
+    teams = [Team.objects.create(id=t, name=t, color="red") for t in ["tym-a", "tym-b"]]
+
+    def makeIr(world, **teamData):
+        return SimpleNamespace(
+            normalize=lambda: None,
+            map={},
+            world=world,
+            teamStates={t: teamData.get(t.id.replace("-", "_"), {}) for t in teams},
+        )
+
+    source = DbState.objects.create_from(makeIr({"turn": 0}), source=None)
+    last = bus.last
+    DbState.objects.create_from(makeIr({"turn": 0}, tym_a={"a": 1}), source=source)
+    DbState.objects.create_from(makeIr({"turn": 1}), source=source)
+
+    bus.refresh()
+    page = bus.since(last, timeout=0)
+    assert [(e.type, e.teams) for e in page.events] == [
+        ("state", frozenset({"tym-a"})),
+        ("world", None),
+    ]
+    assert page.events[1].data["map"] is False
+    assert page.events[1].data["world"] is True
@@ -0,0 +1,119 @@
+import multiprocessing
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from game.util import FileCache
+
+
+def writer(content: bytes):
+    def render(path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(content)
+
+    return render
+
+
+def test_content_reads_file(tmp_path):
+    cache = FileCache(tmp_path, ".txt")
+    assert cache.content("a", writer(b"hello")) == b"hello"
+    assert cache.content("a", writer(b"other")) == b"hello"
+    assert (tmp_path / "a.txt").read_bytes() == b"hello"
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_failed_render_leaves_nothing(tmp_path):
+    cache = FileCache(tmp_path, ".txt")
+
+    def render(path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(b"trunc")
+        raise RuntimeError("crash")
+
+    with pytest.raises(RuntimeError):
+        cache.path("a", render)
+    assert not cache.contains("a")
+    assert list(tmp_path.glob("*.txt")) == []
+    assert cache.content("a", writer(b"ok")) == b"ok"
+
+
+def test_renders_once_across_threads(tmp_path):
+    cache = FileCache(tmp_path, ".txt")
+    calls = []
+
+    def render(path: str) -> None:
+        calls.append(path)
+        time.sleep(0.05)
+        writer(b"x")(path)
+
+    threads = [
+        threading.Thread(target=cache.path, args=("a", render)) for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 7
+
+
+def renderInProcess(directory: str, counterFile: str) -> None:
+    def render(path: str) -> None:
+        with open(counterFile, "a") as f:
+            f.write("x")
+        time.sleep(0.1)
+        writer(b"x")(path)
+
+    FileCache(directory, ".txt").path("a", render)
+
+
+def test_renders_once_across_processes(tmp_path):
+    counterFile = str(tmp_path / "counter")
+    ctx = multiprocessing.get_context("spawn")
+    processes = [
+        ctx.Process(target=renderInProcess, args=(str(tmp_path / "c"), counterFile))
+        for _ in range(4)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+
+    assert Path(counterFile).read_text() == "x"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = FileCache(tmp_path, ".txt", maxBytes=350)
+    for i, ident in enumerate(["a", "b", "c"]):
+        cache.path(ident, writer(b"x" * 100))
+        os.utime(tmp_path / f"{ident}.txt", (i, i))
+    # Using "a" makes "b" the least recently used one
+    cache.path("a", writer(b"x" * 100))
+
+    cache.path("d", writer(b"x" * 100))
+
+    assert not cache.contains("b")
+    assert all(cache.contains(ident) for ident in ["a", "c", "d"])
+    assert cache.stats()["evictions"] == 1
+
+
+def test_eviction_skips_files_being_rendered(tmp_path):
+    cache = FileCache(tmp_path, ".txt", maxBytes=150)
+    cache.path("a", writer(b"x" * 100))
+    os.utime(tmp_path / "a.txt", (0, 0))
+
+    def render(path: str) -> None:
+        writer(b"x" * 100)(path)
+        # Another process finishes a render while this one is in progress
+        cache.path("b", writer(b"x" * 100))
+
+    cache.path("c", render)
+
+    assert cache.content("c", writer(b"other")) == b"x" * 100
+    assert not cache.contains("a")
+    assert list(tmp_path.glob(".tmp-*")) == []
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core.models import Team, User
+from game.history import historyTables
+from game.models import (
+    DbAction,
+    DbInteraction,
+    DbMapState,
+    DbState,
+    DbTeamState,
+    DbWorldState,
+    InteractionType,
+)
+
+
+@pytest.fixture
+def history(db) -> list[DbState]:
+    org = User.objects.create(username="org")
+    for teamId in ["tym-cerveni", "tym-modri"]:
+        Team.objects.create(id=teamId, name=teamId, color="red")
+    mapState = DbMapState.objects.create(data={})
+    teamStates = {
+        team: DbTeamState.objects.create(
+            team_id=team,
+            data={
+                "population": "100",
+                "techs": ["tec-start"],
+                "resources": {"res-obyvatel": "10"},
+            },
+        )
+        for team in ["tym-cerveni", "tym-modri"]
+    }
+    states = []
+    for turn in [0, 0, 1]:
+        if not states or turn != states[-1].worldState.data["turn"]:
+            worldState = DbWorldState.objects.create(data={"turn": turn})
+        if states:
+            teamStates["tym-modri"] = DbTeamState.objects.create(
+                team_id="tym-modri",
+                data={
+                    "population": "90",
+                    "techs": [],
+                    "resources": {"res-obyvatel": "8", "mat-drevo": "2.5"},
+                },
+            )
+        state = DbState.objects.create(mapState=mapState, worldState=worldState)
+        state.teamStates.set(teamStates.values())
+        states.append(state)
+        action = DbAction.objects.create(
+            actionType="VyrobaAction",
+            entitiesRevision=1,
+            args={"team": "tym-modri"},
+            description="Výroba",
+        )
+        DbInteraction.objects.create(
+            phase=InteractionType.commit,
+            action=action,
+            author=org,
+            actionObject={},
+            new_state=state,
+        )
+    return states
+
+
+def readTables(batchSize: int) -> dict[str, dict[str, list]]:
+    entities = SimpleNamespace(resources={"res-obyvatel": None, "mat-drevo": None})
+    tables = {}
+    for table in historyTables(entities, batchSize):
+        columns: dict[str, list] = {name: [] for name in table.schema}
+        for batch in table.batches:
+            assert list(batch) == list(table.schema)
+            assert all(len(values) <= batchSize for values in batch.values())
+            for name, values in batch.items():
+                columns[name] += values
+        tables[table.name] = columns
+    return tables
+
+
+def test_history_tables(history):
+    tables = readTables(batchSize=2)
+
+    actions = tables["actions"]
+    assert actions["state"] == [s.id for s in history]
+    assert actions["team"] == ["tym-modri"] * 3
+    assert actions["phase"] == ["commit"] * 3
+    assert actions["author"] == ["org"] * 3
+
+    teamStates = tables["teamStates"]
+    assert teamStates["team"] == ["tym-cerveni", "tym-modri", "tym-modri", "tym-modri"]
+    assert teamStates["population"] == [100.0, 100.0, 90.0, 90.0]
+    assert teamStates["techs"] == [1, 1, 0, 0]
+    assert teamStates["res-obyvatel"] == [10.0, 10.0, 8.0, 8.0]
+    assert teamStates["mat-drevo"] == [0.0, 0.0, 2.5, 2.5]
+
+    states = tables["states"]
+    assert states["state"] == [s.id for s in history for _ in range(2)]
+    assert states["turn"] == [0, 0, 0, 0, 1, 1]
+    assert states["team"] == ["tym-cerveni", "tym-modri"] * 3
+    assert states["teamState"][1::2] == teamStates["teamState"][1:]
+
+
+def test_batch_size_does_not_change_tables(history):
+    assert readTables(batchSize=1) == readTables(batchSize=1000)
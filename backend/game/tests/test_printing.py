@@ -0,0 +1,245 @@
+from concurrent.futures import Future
+from pathlib import Path
+
+import pytest
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import Team
+from game import printing, signals
+from game.models import DbSticker, Printer, PrintJob, PrintJobStatus, StickerType
+from game.printing import PrintDispatcher, PrinterRegistry
+
+
+class SyncExecutor:
+    def submit(self, fn, *args) -> Future:
+        future: Future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.text = "chyba" if status_code != 200 else ""
+
+
+class FakeSession:
+    def __init__(self, statuses: list[int]):
+        self.statuses = statuses
+        self.posts: list[str] = []
+
+    def post(self, url, files, timeout):
+        self.posts.append(url)
+        self.files = [(name, f.name) for name, f in files]
+        return FakeResponse(self.statuses.pop(0))
+
+
+@pytest.fixture
+def dispatcher(monkeypatch, tmp_path):
+    def getStickerFile(s, format):
+        path = tmp_path / f"{s.id}.png"
+        path.write_bytes(b"png")
+        return path
+
+    monkeypatch.setattr(printing, "getStickerFile", getStickerFile)
+    monkeypatch.setattr(printing, "PRINTER_REGISTRY", PrinterRegistry(ttl=60))
+    dispatcher = PrintDispatcher(workers=1, maxAttempts=3, retryWindow=60, timeout=1)
+    dispatcher._executor = SyncExecutor()  # type: ignore
+    return dispatcher
+
+
+@pytest.fixture
+def sticker(db) -> DbSticker:
+    team = Team.objects.create(id="tym-zeleni", name="Zelení", color="green")
+    return DbSticker.objects.create(
+        team=team, entityId="tec-a", entityRevision=1, type=StickerType.regular
+    )
+
+
+def makePrinter(dispatcher: PrintDispatcher, statuses: list[int]) -> FakeSession:
+    printer = printing.PRINTER_REGISTRY.heartbeat("tiskarna", "10.0.0.1", 5000, True)
+    session = FakeSession(statuses)
+    dispatcher._sessions[(printer.address, printer.port)] = session  # type: ignore
+    return session
+
+
+def makeDue(job: PrintJob) -> None:
+    PrintJob.objects.filter(pk=job.pk).update(nextAttemptAt=timezone.now())
+
+
+def test_print_job_succeeds(dispatcher, sticker):
+    session = makePrinter(dispatcher, [200])
+    job = PrintJob.objects.create(printerName="tiskarna", stickers=[sticker.id])
+
+    dispatcher.dispatchDue()
+
+    job.refresh_from_db()
+    assert job.status == PrintJobStatus.done
+    assert job.attempts == 1
+    assert session.posts == ["http://10.0.0.1:5000/print"]
+    assert dispatcher._busyPrinters == set()
+
+
+def test_print_job_retries_with_backoff(dispatcher, sticker):
+    session = makePrinter(dispatcher, [500, 500, 500, 500])
+    job = PrintJob.objects.create(printerName="tiskarna", stickers=[sticker.id])
+
+    dispatcher.dispatchDue()
+    job.refresh_from_db()
+    assert job.status == PrintJobStatus.pending
+    assert job.error == "chyba"
+    assert job.nextAttemptAt > timezone.now()
+
+    # Not due yet
+    dispatcher.dispatchDue()
+    assert len(session.posts) == 1
+
+    for _ in range(2):
+        makeDue(job)
+        dispatcher.dispatchDue()
+    job.refresh_from_db()
+    # Out of attempts, but still within the retry window
+    assert job.status == PrintJobStatus.pending
+    assert job.attempts == 3
+
+    PrintJob.objects.filter(pk=job.pk).update(
+        createdAt=timezone.now() - timezone.timedelta(seconds=61)
+    )
+    makeDue(job)
+    dispatcher.dispatchDue()
+    job.refresh_from_db()
+    assert job.status == PrintJobStatus.failed
+    assert job.attempts == 4
+    assert len(session.posts) == 4
+
+
+def test_print_job_waits_for_printer(dispatcher, sticker):
+    job = PrintJob.objects.create(printerName="tiskarna", stickers=[sticker.id])
+    dispatcher.dispatchDue()
+    job.refresh_from_db()
+    assert job.status == PrintJobStatus.pending
+
+    session = makePrinter(dispatcher, [200])
+    makeDue(job)
+    dispatcher.dispatchDue()
+    job.refresh_from_db()
+    assert job.status == PrintJobStatus.done
+    assert len(session.posts) == 1
+
+
+def test_busy_printer_keeps_order(dispatcher, sticker):
+    makePrinter(dispatcher, [200, 200])
+    first = PrintJob.objects.create(printerName="tiskarna", stickers=[sticker.id])
+    second = PrintJob.objects.create(printerName="tiskarna", stickers=[sticker.id])
+    dispatcher._busyPrinters.add("tiskarna")
+
+    dispatcher.dispatchDue()
+    assert PrintJob.objects.get(pk=first.pk).status == PrintJobStatus.pending
+    assert PrintJob.objects.get(pk=second.pk).status == PrintJobStatus.pending
+
+
+def test_failed_job_keeps_order(dispatcher, sticker):
+    session = makePrinter(dispatcher, [500, 200, 200])
+    first = PrintJob.objects.create(printerName="tiskarna", stickers=[sticker.id])
+    second = PrintJob.objects.create(printerName="tiskarna", stickers=[sticker.id])
+
+    dispatcher.dispatchDue()
+    assert PrintJob.objects.get(pk=first.pk).status == PrintJobStatus.pending
+    # The second job waits for the first one to be retried
+    dispatcher.dispatchDue()
+    assert PrintJob.objects.get(pk=second.pk).status == PrintJobStatus.pending
+    assert len(session.posts) == 1
+
+    makeDue(first)
+    dispatcher.dispatchDue()
+    dispatcher.dispatchDue()
+    assert PrintJob.objects.get(pk=first.pk).status == PrintJobStatus.done
+    assert PrintJob.objects.get(pk=second.pk).status == PrintJobStatus.done
+    assert len(session.posts) == 3
+
+
+def test_job_claimed_again_during_render_is_not_sent(dispatcher, sticker, monkeypatch):
+    session = makePrinter(dispatcher, [200])
+    job = PrintJob.objects.create(printerName="tiskarna", stickers=[sticker.id])
+    render = printing.getStickerFile
+
+    def slowRender(s, format):
+        # The lease expires during the render and another dispatcher claims it
+        PrintJob.objects.filter(pk=job.pk).update(attempts=F("attempts") + 1)
+        return render(s, format)
+
+    monkeypatch.setattr(printing, "getStickerFile", slowRender)
+    dispatcher.dispatchDue()
+
+    job.refresh_from_db()
+    assert session.posts == []
+    assert job.status == PrintJobStatus.printing
+    assert job.attempts == 2
+
+
+def test_dispatcher_starts_with_first_request(monkeypatch):
+    started = []
+    monkeypatch.setattr(
+        printing.PRINT_DISPATCHER, "ensureRunning", lambda: started.append(True)
+    )
+    signals.startPrintDispatcher(sender=None)
+    assert started == [True]
+
+
+def test_batch_is_one_transfer(dispatcher, sticker):
+    session = makePrinter(dispatcher, [200])
+    other = DbSticker.objects.create(
+        team=sticker.team, entityId="vyr-a", entityRevision=1, type=StickerType.regular
+    )
+    job = PrintJob.objects.create(
+        printerName="tiskarna", stickers=[other.id, sticker.id]
+    )
+
+    dispatcher.dispatchDue()
+
+    assert PrintJob.objects.get(pk=job.pk).status == PrintJobStatus.done
+    assert len(session.posts) == 1
+    assert [(name, Path(f).stem) for name, f in session.files] == [
+        ("image", str(other.id)),
+        ("image", str(sticker.id)),
+    ]
+
+
+def test_heartbeat_writes_only_changes(db, django_assert_num_queries, monkeypatch):
+    start = timezone.now()
+    monkeypatch.setattr(timezone, "now", lambda: start)
+    registry = PrinterRegistry(ttl=60)
+    printer = registry.heartbeat("tiskarna", "10.0.0.1", 5000, True)
+    assert Printer.objects.get(name="tiskarna").address == "10.0.0.1"
+
+    with django_assert_num_queries(0):
+        assert registry.heartbeat("tiskarna", "10.0.0.1", 5000, True) == printer
+    # Another server process sees the printer and doesn't write either
+    other = PrinterRegistry(ttl=60)
+    with django_assert_num_queries(1):
+        assert other.heartbeat("tiskarna", "10.0.0.1", 5000, True) == printer
+    assert other.alive() == [printer]
+    assert other.get(printer.id) == printer
+
+    registry.heartbeat("tiskarna", "10.0.0.2", 5000, True)
+    assert other.byName("tiskarna").address == "10.0.0.2"
+    assert Printer.objects.count() == 1
+
+    # Half of the TTL later the heartbeat is written
+    monkeypatch.setattr(timezone, "now", lambda: start + timezone.timedelta(seconds=30))
+    other.heartbeat("tiskarna", "10.0.0.2", 5000, True)
+    assert Printer.objects.get(name="tiskarna").lastSeen == timezone.now()
+    assert Printer.objects.get(name="tiskarna").registeredAt == start
+
+    monkeypatch.setattr(timezone, "now", lambda: start + timezone.timedelta(seconds=91))
+    assert registry.alive() == []
+    assert registry.byName("tiskarna") is None
+    # Dead printers are pruned by the next written heartbeat
+    registry.heartbeat("tiskarna-2", "10.0.0.3", 5000, False)
+    assert list(Printer.objects.values_list("name", flat=True)) == ["tiskarna-2"]
+
+    # A printer coming back is registered again
+    printer = other.heartbeat("tiskarna", "10.0.0.2", 5000, True)
+    assert printer.registeredAt == timezone.now()
+    assert [p.name for p in registry.alive()] == ["tiskarna-2", "tiskarna"]
@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+from typing import NamedTuple
+
+import pytest
+from django.core.management import call_command
+
+from core.management.commands import updateentities
+from core.models import Team
+from game import readModel
+from game.models import (
+    DbEntities,
+    DbMapState,
+    DbState,
+    DbTeamReadModel,
+    DbTeamState,
+    DbWorldState,
+)
+from game.readModel import getTeamReadModel, storeTeamReadModels
+
+TEAMS = ["tym-cerveni", "tym-zeleni"]
+
+
+class FakeTeam(NamedTuple):
+    id: str
+
+
+@pytest.fixture
+def built(monkeypatch) -> list[str]:
+    built = []
+
+    def buildTeamReadModel(state, team, entities):
+        built.append(team.id)
+        return {"resources": {"team": team.id, "version": len(built)}}
+
+    monkeypatch.setattr(readModel, "buildTeamReadModel", buildTeamReadModel)
+    return built
+
+
+def makeState(
+    source: DbState = None, *, changed=(), mapChanged=False, entitiesRevision=1
+) -> DbState:
+    mapState = (
+        source.mapState
+        if source is not None and not mapChanged
+        else DbMapState.objects.create(data={})
+    )
+    worldState = (
+        source.worldState
+        if source is not None
+        else DbWorldState.objects.create(data={})
+    )
+    teamStates = []
+    for teamId in TEAMS:
+        if source is not None and teamId not in changed:
+            teamStates.append(source.teamStates.get(team=teamId))
+        else:
+            teamStates.append(DbTeamState.objects.create(team_id=teamId, data={}))
+    state = DbState.objects.create(mapState=mapState, worldState=worldState)
+    state.teamStates.set(teamStates)
+
+    ir = SimpleNamespace(teamStates={FakeTeam(t): None for t in TEAMS})
+    storeTeamReadModels(
+        state, ir, None, entitiesRevision=entitiesRevision, source=source
+    )
+    return state
+
+
+def test_unchanged_teams_share_read_model(db, built):
+    for teamId in TEAMS:
+        Team.objects.create(id=teamId, name=teamId, color="red")
+
+    first = makeState()
+    assert sorted(built) == TEAMS
+
+    built.clear()
+    makeState(first, changed=["tym-zeleni"])
+    assert built == ["tym-zeleni"]
+    assert getTeamReadModel("tym-cerveni") == {
+        "resources": {"team": "tym-cerveni", "version": 1}
+    }
+    assert getTeamReadModel("tym-zeleni")["resources"]["team"] == "tym-zeleni"
+
+    # Pointers always lead directly to the row holding the data
+    third = makeState(DbState.objects.latest())
+    assert built == ["tym-zeleni"]
+    row = DbTeamReadModel.objects.get(state=third, team="tym-cerveni")
+    assert row.data is None and row.source.state == first
+
+    built.clear()
+    makeState(third, mapChanged=True)
+    assert sorted(built) == TEAMS
+
+
+def test_read_model_of_a_state_without_one_is_stored(db, built, monkeypatch):
+    Team.objects.create(id="tym-cerveni", name="Červení", color="red")
+    state = DbState.objects.create(
+        mapState=DbMapState.objects.create(data={}),
+        worldState=DbWorldState.objects.create(data={}),
+    )
+    entities = SimpleNamespace(teams={"tym-cerveni": FakeTeam("tym-cerveni")})
+    monkeypatch.setattr(DbState, "entities", entities)
+    monkeypatch.setattr(DbState, "toIr", lambda self: None)
+
+    assert getTeamReadModel("tym-cerveni")["resources"]["team"] == "tym-cerveni"
+    assert getTeamReadModel("tym-cerveni")["resources"]["team"] == "tym-cerveni"
+    assert built == ["tym-cerveni"]
+    assert DbTeamReadModel.objects.filter(state=state).count() == 1
+
+
+def test_new_entities_revision_rebuilds_read_models(
+    db, built, monkeypatch, settings, tmp_path
+):
+    for teamId in TEAMS:
+        Team.objects.create(id=teamId, name=teamId, color="red")
+    first = makeState(entitiesRevision=DbEntities.objects.create(data={}).id)
+
+    settings.ENTITY_PATH = tmp_path
+    (tmp_path / "TEST.json").write_text("{}")
+    monkeypatch.setattr(updateentities.EntityParser, "load", lambda path: None)
+    call_command("updateentities", "TEST")
+    revision = DbEntities.objects.latest().id
+
+    built.clear()
+    second = makeState(first, changed=["tym-zeleni"], entitiesRevision=revision)
+    assert sorted(built) == TEAMS
+    row = DbTeamReadModel.objects.get(state=second, team="tym-cerveni")
+    assert row.source is None
+    assert getTeamReadModel("tym-cerveni") == row.data
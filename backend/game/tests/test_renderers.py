@@ -0,0 +1,41 @@
+import datetime
+import io
+from decimal import Decimal
+
+import orjson
+import pytest
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+
+from game.entities import Resource
+from game.models import StickerType
+from game.renderers import ORJSONParser, ORJSONRenderer
+
+
+def test_renders_like_the_stock_renderer():
+    payload = {
+        "amount": Decimal("2.5"),
+        "armies": {1: {"tile": None, "boost": -1}},
+        "productions": [("mat-drevo", Decimal(3))],
+        "at": datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone.utc),
+        "name": "Dřevo",
+        "duration": datetime.timedelta(minutes=15),
+    }
+    assert ORJSONRenderer().render(payload) == JSONRenderer().render(payload)
+
+
+def test_renders_entities_sets_and_enums():
+    wood = Resource(id="mat-drevo", name="Dřevo", produces=None)
+    payload = {"resource": wood, "ids": {"b", "a"}, "type": StickerType.techSmall}
+    assert orjson.loads(ORJSONRenderer().render(payload)) == {
+        "resource": "mat-drevo",
+        "ids": ["a", "b"],
+        "type": 1,
+    }
+
+
+def test_parser():
+    parser = ORJSONParser()
+    assert parser.parse(io.BytesIO('{"a": [1, 2.5]}'.encode())) == {"a": [1, 2.5]}
+    with pytest.raises(ParseError):
+        parser.parse(io.BytesIO(b"{"))
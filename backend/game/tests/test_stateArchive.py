@@ -0,0 +1,84 @@
+import gzip
+import io
+
+import orjson
+import pytest
+
+from core.models import Team
+from game.models import DbMapState, DbState, DbTeamState, DbWorldState
+from game.stateArchive import dumpStates, loadStates
+
+
+def snapshot() -> list[tuple]:
+    return [
+        (
+            s.id,
+            s.mapState_id,
+            s.mapState.data,
+            s.worldState_id,
+            s.worldState.data,
+            sorted((t.id, t.team_id, orjson.dumps(t.data)) for t in s.teamStates.all()),
+        )
+        for s in DbState.objects.order_by("id")
+    ]
+
+
+@pytest.fixture
+def states(db) -> list[tuple]:
+    for teamId in ["tym-cerveni", "tym-modri"]:
+        Team.objects.create(id=teamId, name=teamId, color="red")
+    mapState = DbMapState.objects.create(data={"tiles": {"map-tile01": {}}})
+    teamStates = {
+        t: DbTeamState.objects.create(team_id=t, data={"turn": 0})
+        for t in ["tym-cerveni", "tym-modri"]
+    }
+    for turn in [0, 1, 1, 0]:
+        worldState = DbWorldState.objects.create(data={"turn": turn})
+        # A repeated team state, as after a reverted action
+        teamStates["tym-modri"] = DbTeamState.objects.create(
+            team_id="tym-modri", data={"turn": turn}
+        )
+        state = DbState.objects.create(mapState=mapState, worldState=worldState)
+        state.teamStates.set(teamStates.values())
+    return snapshot()
+
+
+def dump(**kwargs) -> bytes:
+    output = io.BytesIO()
+    with gzip.open(output, "wb") as f:
+        dumpStates(f, **kwargs)
+    return output.getvalue()
+
+
+def clearStates() -> None:
+    DbState.objects.all().delete()
+    for model in [DbMapState, DbWorldState, DbTeamState]:
+        model.objects.all().delete()
+
+
+@pytest.mark.parametrize("dedup", [True, False])
+def test_roundtrip(states, dedup, django_assert_max_num_queries):
+    # States and their team states, then blobs of each kind per batch
+    with django_assert_max_num_queries(1 + 2 * 5):
+        archive = dump(batchSize=2, dedup=dedup)
+    records = [orjson.loads(l) for l in gzip.decompress(archive).splitlines()]
+    kinds = [r["kind"] for r in records]
+    assert kinds.count("map") == 1
+    assert kinds.count("state") == 4
+    assert kinds.count("team") == 5
+    assert sum("same" in r for r in records) == (4 if dedup else 0)
+
+    clearStates()
+    with gzip.open(io.BytesIO(archive), "rb") as f:
+        assert loadStates(f, batchSize=3) == 4
+    assert snapshot() == states
+    assert DbState.objects.create(
+        mapState_id=states[0][1], worldState_id=states[0][3]
+    ).id > max(s[0] for s in states)
+
+
+def test_load_refuses_existing_states(states):
+    archive = dump()
+    with pytest.raises(ValueError):
+        with gzip.open(io.BytesIO(archive), "rb") as f:
+            loadStates(f)
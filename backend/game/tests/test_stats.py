@@ -0,0 +1,152 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+import game.stats
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Team, User
+from game.entities import Resource
+from game.models import (
+    DbMapState,
+    DbState,
+    DbTeamRoundMetrics,
+    DbTeamState,
+    DbWorldState,
+)
+from game.stats import (
+    iterRoundMetrics,
+    iterRoundStarts,
+    storeRoundMetrics,
+    teamRoundMetrics,
+)
+from game.viewsets.stats import RoundMetricsViewSet
+
+
+@pytest.fixture
+def history(db, monkeypatch) -> list[DbState]:
+    monkeypatch.setattr(
+        game.stats, "stateDeserialize", lambda cls, data, entities: data
+    )
+    Team.objects.create(id="tym-cerveni", name="Červení", color="red")
+    mapState = DbMapState.objects.create(data={})
+    states = []
+    for i, turn in enumerate([0, 0, 1, 1, 1, 2, 3]):
+        if not states or turn != states[-1].worldState.data["turn"]:
+            worldState = DbWorldState.objects.create(data={"turn": turn})
+        state = DbState.objects.create(mapState=mapState, worldState=worldState)
+        state.teamStates.add(
+            DbTeamState.objects.create(team_id="tym-cerveni", data={"step": i})
+        )
+        states.append(state)
+    return states
+
+
+def test_round_starts(history, django_assert_max_num_queries):
+    # States, then a world state and team states per round
+    with django_assert_max_num_queries(1 + 4 + 2 * 3):
+        rounds = list(iterRoundStarts(entities=None, chunkSize=2))
+    assert [(r.stateId, r.turn) for r in rounds] == [
+        (history[2].id, 1),
+        (history[5].id, 2),
+        (history[6].id, 3),
+    ]
+    assert [r.teamStates for r in rounds] == [
+        {"tym-cerveni": {"step": 2}},
+        {"tym-cerveni": {"step": 5}},
+        {"tym-cerveni": {"step": 6}},
+    ]
+
+
+def makeTeamState(resources: dict[Resource, Decimal]) -> SimpleNamespace:
+    return SimpleNamespace(
+        resources=resources,
+        population=Decimal(100),
+        techs={"tec-start"},
+        armies=["Alfa", "Bravo"],
+        owned_buildings=lambda mapState: {"bui-pila"},
+    )
+
+
+@pytest.fixture
+def resources() -> dict[str, Resource]:
+    material = Resource(id="mat-drevo", name="Dřevo", produces=None)
+    return {
+        "obyvatel": Resource(id="res-obyvatel", name="Obyvatel", produces=None),
+        "material": material,
+        "wood": Resource(id="pro-drevo", name="Dřevo", produces=material),
+        "coal": Resource(id="pro-uhli", name="Uhlí", produces=material),
+    }
+
+
+def test_round_metrics(resources):
+    teamState = makeTeamState(
+        {
+            resources["obyvatel"]: Decimal(10),
+            resources["material"]: Decimal(7),
+            resources["wood"]: Decimal(2),
+            resources["coal"]: Decimal(3),
+        }
+    )
+    entities = SimpleNamespace(obyvatel=resources["obyvatel"])
+    weights = {resources["coal"]: Decimal(4)}
+    assert teamRoundMetrics(teamState, entities, weights) == {
+        "obyvatele": Decimal(10),
+        "populace": Decimal(100),
+        "techy": 1,
+        "productions": Decimal(5),
+        "weightedProductions": Decimal(14),
+    }
+
+
+def test_stored_round_metrics(db, monkeypatch, resources):
+    monkeypatch.setattr(game.stats, "productionWeights", lambda entities: {})
+    team = Team.objects.create(id="tym-cerveni", name="Červení", color="red")
+    dbState = DbState.objects.create(
+        mapState=DbMapState.objects.create(data={}),
+        worldState=DbWorldState.objects.create(data={}),
+    )
+    entities = SimpleNamespace(obyvatel=resources["obyvatel"])
+    for turn, wood in [(1, 2), (2, 5), (2, 6)]:
+        state = SimpleNamespace(
+            world=SimpleNamespace(turn=turn),
+            map=None,
+            teamStates={team: makeTeamState({resources["wood"]: Decimal(wood)})},
+        )
+        storeRoundMetrics(dbState, state, entities)
+
+    # A repeated round replaces its row
+    assert list(
+        DbTeamRoundMetrics.objects.order_by("turn").values_list(
+            "turn", "productions", "armies", "buildings"
+        )
+    ) == [(1, Decimal(2), 2, 1), (2, Decimal(6), 2, 1)]
+    assert [turn for turn, _ in iterRoundMetrics(entities)] == [1, 2]
+
+    org = User.objects.create(username="org")
+    player = User.objects.create(username="cerveni", team=team)
+    Team.objects.create(id="tym-modri", name="Modří", color="blue")
+    DbTeamRoundMetrics.objects.create(
+        team_id="tym-modri",
+        turn=1,
+        state=dbState,
+        population=0,
+        obyvatele=0,
+        techs=0,
+        productions=0,
+        weightedProductions=0,
+        armies=0,
+        buildings=0,
+    )
+
+    def getSeries(user: User, **params):
+        request = APIRequestFactory().get("/", params)
+        force_authenticate(request, user=user)
+        return RoundMetricsViewSet.as_view({"get": "list"})(request).data
+
+    assert getSeries(org, metrics="productions,armies", since=2) == {
+        "tym-cerveni": {"turn": [2], "productions": [Decimal(6)], "armies": [2]}
+    }
+    assert set(getSeries(org)) == {"tym-cerveni", "tym-modri"}
+    assert set(getSeries(player)) == {"tym-cerveni"}
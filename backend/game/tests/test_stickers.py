@@ -0,0 +1,390 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+from PIL import Image, ImageDraw
+
+from backend.settings import ICON_PATH
+from core.models import Team
+from game import stickers
+from game.entities import (
+    Building,
+    BuildingUpgrade,
+    Entities,
+    Resource,
+    TeamAttribute,
+    Tech,
+    Vyroba,
+)
+from game.models import DbEntities, DbSticker, StickerType
+from game.stickers import (
+    FONT_BOLD,
+    FONT_HEADER,
+    FONT_NORMAL,
+    PRINTER_WIDTH,
+    StickerBuilder,
+    StickerFile,
+    StickerFormat,
+    StickerPrerenderer,
+    getDefaultStickerBuilder,
+    getStickerFile,
+    makeSticker,
+    mm2Pt,
+    renderStickerFiles,
+    stickerContentHash,
+    toEscPosRaster,
+    toPrinterImage,
+)
+from game.util import FileCache
+
+
+def makeDbSticker(id: int, entityId: str) -> DbSticker:
+    return DbSticker(
+        id=id,
+        team=Team(id="tym-test", name="Test", color="black"),
+        entityId=entityId,
+        entityRevision=-1,
+        type=StickerType.regular,
+    )
+
+
+def test_prerender_deduplicates(monkeypatch):
+    release = threading.Event()
+    rendered: list[int] = []
+
+    def render(stickerId: int) -> None:
+        release.wait(timeout=5)
+        rendered.append(stickerId)
+
+    monkeypatch.setattr(stickers, "_prerenderSticker", render)
+    monkeypatch.setattr(stickers, "stickerCacheKey", lambda s: s.ident)
+    prerenderer = StickerPrerenderer(workers=1)
+    prerenderer._executor = ThreadPoolExecutor(max_workers=1)  # type: ignore
+
+    a, b = makeDbSticker(1, "tec-a"), makeDbSticker(2, "tec-b")
+    prerenderer.submit([a, b])
+    prerenderer.submit([a, makeDbSticker(3, "tec-a")])
+    assert prerenderer.queueDepth == 2
+
+    release.set()
+    prerenderer.wait(a, timeout=5)
+    prerenderer.wait(b, timeout=5)
+    prerenderer._executor.shutdown()  # type: ignore
+
+    assert prerenderer.queueDepth == 0
+    assert sorted(rendered) == [1, 2]
+
+
+def test_prerender_wait_times_out(monkeypatch):
+    release = threading.Event()
+    rendered: list[int] = []
+
+    def render(stickerId: int) -> None:
+        release.wait(timeout=5)
+        rendered.append(stickerId)
+
+    monkeypatch.setattr(stickers, "_prerenderSticker", render)
+    monkeypatch.setattr(stickers, "stickerCacheKey", lambda s: s.ident)
+    prerenderer = StickerPrerenderer(workers=1)
+    prerenderer._executor = ThreadPoolExecutor(max_workers=1)  # type: ignore
+
+    a, b = makeDbSticker(1, "tec-a"), makeDbSticker(2, "tec-b")
+    prerenderer.submit([a, b])
+    # The render of b waits in the queue behind a; the caller renders it itself
+    assert not prerenderer.wait(b, timeout=0.05)
+    assert prerenderer.queueDepth == 1
+
+    release.set()
+    assert prerenderer.wait(a, timeout=5)
+    prerenderer._executor.shutdown()  # type: ignore
+    assert rendered == [1]
+
+
+def test_prerender_disabled():
+    prerenderer = StickerPrerenderer(workers=0)
+    prerenderer.submit([makeDbSticker(1, "tec-a")])
+    assert prerenderer.queueDepth == 0
+    assert prerenderer._executor is None
+
+
+class ReferenceStickerBuilder(StickerBuilder):
+    """
+    The original builder, which measures every candidate line from scratch and
+    draws onto an over-allocated canvas
+    """
+
+    def __init__(self, width, xMargin: int = 5, yMargin: int = 20):
+        super().__init__(width, xMargin, yMargin)
+        self.img = Image.new("RGB", (width, 10 * width), color=(255, 255, 255))
+        self.drawInt = ImageDraw.Draw(self.img)
+
+    def _ensureHeight(self, height):
+        assert height <= self.img.height
+
+    def addIcon(self, iconfile):
+        with Image.open(ICON_PATH / iconfile) as icon:
+            newImg = icon.convert("1")
+            xOffset = (self.img.width - icon.width) // 2
+            self.img.paste(newImg, (xOffset, self.yPosition))
+            self.yPosition += icon.height
+
+    def _textBox(self, xy, text, font):
+        return self.drawInt.textbbox(xy=xy, text=text, font=font)
+
+    def _breakIntoLines(self, text, font):
+        words = text.split(" ")
+        lines = []
+        last = 0
+        for i in range(1, len(words) + 1):
+            l = " ".join(words[last:i])
+            box = self.drawInt.textbbox(
+                xy=(self.xMargin + self.offset, 0), text=l, font=font
+            )
+            if box[2] > self.img.width - self.xMargin:
+                if last == i - 1:
+                    i += 1
+                lines.append(" ".join(words[last : i - 1]))
+                last = i - 1
+        lines.append(" ".join(words[last:]))
+        return lines
+
+
+WORDS = (
+    "Těžba dřeva vyžaduje pilu a zručné dřevorubce, kteří znají les. "
+    "Nejdelšíslovokteréseurčitěnevejdenařádekanijednoudokonce "
+    "× • (Kostka: 3) Vyžaduje: tec-a & (tec-b | tec-c) ffi fj WAV Ťuk"
+).split(" ")
+
+
+def randomParagraphs(count: int) -> list[str]:
+    rng = random.Random(42)
+    paragraphs = ["", " ", "  dvojité  mezery ", WORDS[1], f"{WORDS[1]} {WORDS[1]}"]
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(1, 40))
+        paragraphs.append(" ".join(words))
+    return paragraphs
+
+
+@pytest.mark.parametrize("font", [FONT_NORMAL, FONT_BOLD, FONT_HEADER])
+def test_break_into_lines_matches_reference(font):
+    for offset in [0, 10, 37, 150]:
+        builder = getDefaultStickerBuilder()
+        reference = ReferenceStickerBuilder(builder.img.width, builder.xMargin)
+        builder.offset = reference.offset = offset
+        for text in randomParagraphs(50):
+            assert builder._breakIntoLines(text, font) == reference._breakIntoLines(
+                text, font
+            )
+
+
+def test_break_into_lines_with_kerning_matches_reference():
+    # Kerning pairs make the real lines narrower than the sum of word advances
+    words = ["AV", "Ty.", "WAVA", "To", "Yo,", "LT", "P.", "VAV", "ffi", "Ťuk"]
+    rng = random.Random(7)
+    texts = [" ".join(rng.choices(words, k=rng.randint(5, 60))) for _ in range(25)]
+    for font in [FONT_NORMAL, FONT_BOLD, FONT_HEADER]:
+        for offset in range(0, 200, 19):
+            builder = getDefaultStickerBuilder()
+            reference = ReferenceStickerBuilder(builder.img.width, builder.xMargin)
+            builder.offset = reference.offset = offset
+            for text in texts:
+                assert builder._breakIntoLines(text, font) == reference._breakIntoLines(
+                    text, font
+                )
+
+
+def test_entity_texts_break_like_reference(monkeypatch):
+    from game.tests.actions.common import TEST_ENTITIES
+
+    calls = []
+    breakIntoLines = StickerBuilder._breakIntoLines
+
+    def recordingBreak(self, text, font):
+        calls.append((self.img.width, self.xMargin, self.offset, text, font))
+        return breakIntoLines(self, text, font)
+
+    monkeypatch.setattr(StickerBuilder, "_breakIntoLines", recordingBreak)
+    team = Team(id="tym-zeleni", name="Zelení", color="green")
+    for e in TEST_ENTITIES.values():
+        if isinstance(e, Tech):
+            for stype in StickerType:
+                makeSticker(e, team, stype, entities=TEST_ENTITIES)
+        elif isinstance(e, (Vyroba, Building, BuildingUpgrade, TeamAttribute)):
+            makeSticker(e, team, StickerType.regular, entities=TEST_ENTITIES)
+    monkeypatch.undo()
+
+    assert calls
+    for width, xMargin, offset, text, font in calls:
+        builder = StickerBuilder(width, xMargin)
+        reference = ReferenceStickerBuilder(width, xMargin)
+        builder.offset = reference.offset = offset
+        assert builder._breakIntoLines(text, font) == reference._breakIntoLines(
+            text, font
+        )
+
+
+def makeTestTech(woodName: str = "Dřevo") -> Tech:
+    wood = Resource(id="mat-drevo", name=woodName, produces=None)
+    work = Resource(id="res-prace", name="Práce", nontradable=True)
+    vyroba = Vyroba(
+        id="vyr-drevo", name="Těžba dřeva", points=2, reward=(wood, Decimal(2))
+    )
+    techs = [
+        Tech(
+            id=f"tec-{i}",
+            name=f"Směr bádání číslo {i}",
+            points=i,
+            requiresTask=False,
+            cost={wood: Decimal(i), work: Decimal(10 * i)},
+        )
+        for i in range(1, 4)
+    ]
+    return Tech(
+        id="tec-start",
+        name="Počátek civilizace a dlouhý název technologie",
+        points=1,
+        requiresTask=False,
+        flavor=" ".join(randomParagraphs(3)[-3:]),
+        icon="centrum.svg",
+        unlocks=[vyroba, *techs],
+    )
+
+
+@pytest.mark.parametrize(
+    "stype", [StickerType.regular, StickerType.techSmall, StickerType.techFirst]
+)
+def test_sticker_matches_reference(monkeypatch, stype):
+    team = Team(id="tym-zeleni", name="Zelení", color="green")
+    tech = makeTestTech()
+    entities = Entities([tech, *tech.unlocks])
+
+    image = makeSticker(tech, team, stype, entities=entities)
+    monkeypatch.setattr(
+        stickers,
+        "getDefaultStickerBuilder",
+        lambda: ReferenceStickerBuilder(mm2Pt(80), int((mm2Pt(80) - mm2Pt(53)) // 2)),
+    )
+    reference = makeSticker(tech, team, stype, entities=entities)
+
+    assert image.size == reference.size
+    assert image.tobytes() == reference.tobytes()
+
+
+def test_content_hash_ignores_unrelated_changes():
+    team = Team(id="tym-zeleni", name="Zelení", color="green")
+    tech = makeTestTech()
+    entities = Entities([tech, *tech.unlocks])
+    unrelated = Resource(id="mat-kamen", name="Kámen")
+    other = Entities([tech, *tech.unlocks, unrelated])
+
+    for stype in StickerType:
+        assert stickerContentHash(
+            tech, team, stype, entities=entities
+        ) == stickerContentHash(tech, team, stype, entities=other)
+    assert stickerContentHash(
+        tech, team, StickerType.regular, entities=entities
+    ) != stickerContentHash(tech, team, StickerType.techFirst, entities=entities)
+
+
+def test_content_hash_follows_references():
+    team = Team(id="tym-zeleni", name="Zelení", color="green")
+    tech = makeTestTech()
+    entities = Entities([tech, *tech.unlocks])
+    original = stickerContentHash(tech, team, StickerType.regular, entities=entities)
+
+    # Resource in the cost of the unlocked techs is renamed
+    changed = makeTestTech(woodName="Prkna")
+    changedEntities = Entities([changed, *changed.unlocks])
+
+    assert original != stickerContentHash(
+        changed, team, StickerType.regular, entities=changedEntities
+    )
+    renamedTeam = Team(id=team.id, name="Modří", color="blue")
+    assert original != stickerContentHash(
+        tech, renamedTeam, StickerType.regular, entities=entities
+    )
+
+
+def test_render_sticker_files_skips_up_to_date(db, tmp_path, monkeypatch):
+    tech = makeTestTech()
+    entities = Entities([tech, *tech.unlocks])
+    revision = DbEntities.objects.create(data={}).id
+    monkeypatch.setitem(DbEntities.objects.cache, revision, entities)
+    team = Team(id="tym-zeleni", name="Zelení", color="green")
+    files = [
+        StickerFile(e.id, team, StickerType.regular, f"{e.id}.png")
+        for e in [tech, *tech.unlocks]
+    ]
+
+    report = renderStickerFiles(files, tmp_path, revision=revision)
+    assert (report.rendered, report.skipped) == (len(files), 0)
+    assert all((tmp_path / f.filename).exists() for f in files)
+
+    report = renderStickerFiles(files, tmp_path, revision=revision)
+    assert (report.rendered, report.skipped) == (0, len(files))
+
+    (tmp_path / files[0].filename).unlink()
+    renamed = Team(id="tym-zeleni", name="Modří", color="blue")
+    report = renderStickerFiles(
+        [files[0], files[1]._replace(team=renamed), *files[2:]],
+        tmp_path,
+        revision=revision,
+    )
+    assert (report.rendered, report.skipped) == (2, len(files) - 2)
+
+
+def test_printer_image():
+    tech = makeTestTech()
+    team = Team(id="tym-zeleni", name="Zelení", color="green")
+    image = makeSticker(
+        tech, team, StickerType.regular, entities=Entities([tech, *tech.unlocks])
+    )
+
+    printerImage = toPrinterImage(image)
+    assert printerImage.mode == "1"
+    assert printerImage.width == PRINTER_WIDTH
+    assert printerImage.height == round(image.height * PRINTER_WIDTH / image.width)
+
+    raster = toEscPosRaster(printerImage)
+    header, data = raster[:8], raster[8:]
+    assert header[:4] == bytes([0x1D, 0x76, 0x30, 0x00])
+    assert header[4] + 256 * header[5] == PRINTER_WIDTH // 8
+    assert header[6] + 256 * header[7] == printerImage.height
+    assert len(data) == PRINTER_WIDTH // 8 * printerImage.height
+    # Set bits are black dots
+    x, y = next(
+        (x, y)
+        for y in range(printerImage.height)
+        for x in range(PRINTER_WIDTH)
+        if printerImage.getpixel((x, y)) == 0
+    )
+    assert data[y * PRINTER_WIDTH // 8 + x // 8] & (0x80 >> (x % 8))
+    assert data[0] == 0 and printerImage.getpixel((0, 0)) == 255
+
+
+def test_sticker_formats(db, tmp_path, monkeypatch):
+    tech = makeTestTech()
+    revision = DbEntities.objects.create(data={}).id
+    monkeypatch.setitem(
+        DbEntities.objects.cache, revision, Entities([tech, *tech.unlocks])
+    )
+    for format in StickerFormat:
+        monkeypatch.setitem(
+            stickers.STICKER_FORMAT_CACHES,
+            format,
+            FileCache(tmp_path / format.value, ".out"),
+        )
+    team = Team.objects.create(id="tym-zeleni", name="Zelení", color="green")
+    sticker = DbSticker.objects.create(
+        team=team, entityId=tech.id, entityRevision=revision, type=StickerType.regular
+    )
+
+    escpos = getStickerFile(sticker, StickerFormat.escpos).read_bytes()
+    with Image.open(getStickerFile(sticker, StickerFormat.printer)) as printerImage:
+        assert escpos == toEscPosRaster(printerImage)
+    with Image.open(getStickerFile(sticker)) as image:
+        assert image.width == mm2Pt(80)
+    # The full image was rendered only once, for the printer image
+    assert stickers.STICKER_FORMAT_CACHES[StickerFormat.png].stats()["misses"] == 1
@@ -0,0 +1,161 @@
+from datetime import timedelta
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.models import Team, User
+from core.models.announcement import Announcement, AnnouncementType
+from game.models import (
+    DbMapState,
+    DbState,
+    DbTask,
+    DbTaskAssignment,
+    DbTaskPreference,
+    DbTeamReadModel,
+    DbWorldState,
+)
+from game.viewsets.team import TeamViewSet
+
+
+def setupResearch(researching: int) -> Team:
+    team = Team.objects.create(id="tym-cerveni", name="Červení", color="red")
+    other = Team.objects.create(id="tym-zeleni", name="Zelení", color="green")
+    state = DbState.objects.create(
+        mapState=DbMapState.objects.create(data={}),
+        worldState=DbWorldState.objects.create(data={}),
+    )
+    techs = {"tech-owned": {"id": "tech-owned", "status": "owned"}}
+    for i in range(researching):
+        techId = f"tech-{i}"
+        techs[techId] = {"id": techId, "status": "researching"}
+        task = DbTask.objects.create(
+            id=f"ukol-{i}",
+            name=f"Úkol {i}",
+            capacity=2,
+            orgDescription="",
+            teamDescription="",
+        )
+        DbTaskPreference.objects.create(task=task, techId=techId)
+        DbTaskAssignment.objects.create(team=team, task=task, techId=techId)
+        DbTaskAssignment.objects.create(team=other, task=task, techId=techId)
+    DbTeamReadModel.objects.create(state=state, team=team, data={"techs": techs})
+    return team
+
+
+def getTechs(user: User, team: Team):
+    request = APIRequestFactory().get("/")
+    force_authenticate(request, user=user)
+    return TeamViewSet.as_view({"get": "techs"})(request, pk=team.id)
+
+
+@pytest.mark.parametrize("researching", [1, 5])
+def test_techs_query_count_is_constant(db, django_assert_num_queries, researching):
+    team = setupResearch(researching)
+    org = User.objects.create(username="org")
+
+    # ETag (4), read model (2), open assignments, their tasks with occupied
+    # counts, task preferences and task assignments (4)
+    with django_assert_num_queries(10):
+        response = getTechs(org, team)
+    assert response.status_code == 200
+
+    tasks = [
+        tech["assignedTask"]
+        for tech in response.data.values()
+        if tech["status"] == "researching"
+    ]
+    assert len(tasks) == researching
+    assert all(task["occupiedCount"] == 2 for task in tasks)
+    assert all(len(task["assignments"]) == 2 for task in tasks)
+    assert "assignedTask" not in response.data["tech-owned"]
+
+
+def setupAnnouncements(count: int) -> tuple[Team, User]:
+    team = Team.objects.create(id="tym-cerveni", name="Červení", color="red")
+    player = User.objects.create(username="cerveni", team=team)
+    for i in range(count):
+        announcement = Announcement.objects.create(
+            type=AnnouncementType.game,
+            content=f"Oznámení {i}",
+            appearDatetime=timezone.now() - timedelta(minutes=i),
+        )
+        announcement.teams.add(team)
+        if i % 2 == 0:
+            announcement.read.add(player)
+    return team, player
+
+
+def getAnnouncements(user: User, team: Team, **params):
+    request = APIRequestFactory().get("/", params)
+    force_authenticate(request, user=user)
+    return TeamViewSet.as_view({"get": "announcements"})(request, pk=team.id)
+
+
+@pytest.mark.parametrize("count", [2, 20])
+def test_announcements_query_count_is_constant(db, django_assert_num_queries, count):
+    team, player = setupAnnouncements(count)
+    org = User.objects.create(username="org")
+
+    # ETag (4), team, announcements, read events
+    with django_assert_num_queries(7):
+        response = getAnnouncements(org, team)
+    assert len(response.data) == count
+    assert response.data[0]["readBy"] == ["Červení"]
+    assert response.data[1]["readBy"] == []
+
+    with django_assert_num_queries(7):
+        response = getAnnouncements(player, team)
+    assert [a["read"] for a in response.data[:2]] == [True, False]
+    assert "readBy" not in response.data[0]
+
+
+def test_announcements_cursor_pagination(db):
+    team, player = setupAnnouncements(5)
+
+    contents = []
+    response = getAnnouncements(player, team, page_size=2)
+    while True:
+        contents.extend(a["content"] for a in response.data["results"])
+        if response.data["next"] is None:
+            break
+        cursor = parse_qs(urlparse(response.data["next"]).query)["cursor"][0]
+        response = getAnnouncements(player, team, page_size=2, cursor=cursor)
+    assert contents == [f"Oznámení {i}" for i in range(5)]
+
+
+def test_announcements_etag_follows_edits_and_reads(db):
+    team, player = setupAnnouncements(3)
+
+    def etag(**headers):
+        request = APIRequestFactory().get("/", **headers)
+        force_authenticate(request, user=player)
+        response = TeamViewSet.as_view({"get": "announcements"})(request, pk=team.id)
+        return response.status_code, response["ETag"]
+
+    _, first = etag()
+    assert etag(HTTP_IF_NONE_MATCH=first) == (304, first)
+
+    announcement = Announcement.objects.get(content="Oznámení 1")
+    announcement.content = "Opravené oznámení"
+    announcement.save()
+    status, edited = etag(HTTP_IF_NONE_MATCH=first)
+    assert status == 200 and edited != first
+
+    announcement.read.add(player)
+    status, read = etag(HTTP_IF_NONE_MATCH=edited)
+    assert status == 200 and read != edited
+
+
+def test_tasks_etag_follows_assignments(db):
+    team = setupResearch(1)
+    org = User.objects.create(username="org")
+    first = getTechs(org, team)["ETag"]
+
+    request = APIRequestFactory().get("/", HTTP_IF_NONE_MATCH=first)
+    force_authenticate(request, user=org)
+    assert TeamViewSet.as_view({"get": "techs"})(request, pk=team.id).status_code == 304
+
+    DbTaskAssignment.objects.filter(team=team).update(finishedAt=timezone.now())
+    assert getTechs(org, team)["ETag"] != first
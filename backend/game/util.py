@@ -1,3 +1,8 @@
+import contextlib
+import os
+import tempfile
+import threading
+import zlib
 from collections import Counter
 from decimal import Decimal
 from pathlib import Path
@@ -5,6 +10,7 @@ from typing import (
     Any,
     Callable,
     Iterable,
+    Iterator,
     Mapping,
     Optional,
     Tuple,
@@ -16,6 +22,11 @@ from typing import (
 import boolean
 from pydantic import BaseModel
 
+try:
+    import fcntl
+except ImportError:  # Windows; rendering is serialized only within the process
+    fcntl = None  # type: ignore
+
 from game.entities import Entity, EntityBase, EntityId
 
 T = TypeVar("T")
@@ -26,10 +37,32 @@ TNumber = TypeVar("TNumber", int, Decimal)
 
 
 class FileCache:
-    def __init__(self, cacheDirectory, suffix):
+    """
+    Directory of rendered files keyed by an identifier. Files are rendered into
+    a temporary file and renamed into place, so readers never see a partially
+    written file. Rendering of a key is serialized across threads and processes
+    via lock files, so a file is rendered only once. When maxBytes is given,
+    least recently used files are evicted once the directory grows over it.
+    """
+
+    LOCK_STRIPES = 64
+    TMP_PREFIX = ".tmp-"
+
+    def __init__(self, cacheDirectory, suffix, maxBytes: Optional[int] = None):
         self.cacheDirectory = Path(cacheDirectory).resolve()
         self.cacheDirectory.mkdir(exist_ok=True, parents=True)
-        self.suffix = suffix
+        self.lockDirectory = self.cacheDirectory / ".locks"
+        self.lockDirectory.mkdir(exist_ok=True)
+        self.suffix = suffix if suffix.startswith(".") else f".{suffix}"
+        self.maxBytes = maxBytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Estimate of the directory size; None until the first scan
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+        self._keyLocks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
 
     def path(self, ident: str, renderer: Callable[[str], None]) -> Path:
         """
@@ -37,17 +70,118 @@ class FileCache:
         give file) return path to a file populated with the content.
         """
         cFile = self._cacheFile(ident)
-        if not cFile.exists():
-            renderer(str(cFile))
+        if self._touch(cFile):
+            self._count("hits")
+            return cFile
+
+        with self._keyLock(ident):
+            # Somebody else might have rendered the file while we waited
+            if self._touch(cFile):
+                self._count("hits")
+                return cFile
+            self._count("misses")
+            self._render(cFile, renderer)
+        self._evict(keep=cFile)
         return cFile
 
-    def content(self, ident, renderer: Callable[[str], None]) -> bytes:
-        cFile = self.path(ident, renderer)
-        with open(cFile, "wb") as f:
-            return f.read()
+    def contains(self, ident: str) -> bool:
+        return self._cacheFile(ident).exists()
 
-    def _cacheFile(self, ident):
-        return self.cacheDirectory / f"{ident}.{self.suffix}"
+    def content(self, ident, renderer: Callable[[str], None]) -> bytes:
+        for _ in range(3):
+            cFile = self.path(ident, renderer)
+            try:
+                with open(cFile, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                # Evicted by another process right after the lookup
+                continue
+        raise FileNotFoundError(f"Cannot keep {ident} in cache {self.cacheDirectory}")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _cacheFile(self, ident) -> Path:
+        return self.cacheDirectory / f"{ident}{self.suffix}"
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    @staticmethod
+    def _touch(cFile: Path) -> bool:
+        """
+        Mark the file as recently used; return False if it doesn't exist
+        """
+        try:
+            os.utime(cFile)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @contextlib.contextmanager
+    def _keyLock(self, ident: str) -> Iterator[None]:
+        stripe = zlib.crc32(ident.encode()) % self.LOCK_STRIPES
+        with self._keyLocks[stripe]:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lockDirectory / f"{stripe}.lock", "a") as lockFile:
+                fcntl.flock(lockFile, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+    def _render(self, cFile: Path, renderer: Callable[[str], None]) -> None:
+        # Keep the suffix, renderers might deduce the file format from it
+        fd, tmpName = tempfile.mkstemp(
+            dir=self.cacheDirectory, prefix=self.TMP_PREFIX, suffix=self.suffix
+        )
+        os.close(fd)
+        try:
+            renderer(tmpName)
+            os.replace(tmpName, cFile)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(tmpName)
+            raise
+        with self._lock:
+            if self._size is not None:
+                self._size += cFile.stat().st_size
+
+    def _evict(self, keep: Path) -> None:
+        if self.maxBytes is None:
+            return
+        with self._lock:
+            if self._size is not None and self._size <= self.maxBytes:
+                return
+
+            entries = []
+            for f in self.cacheDirectory.glob(f"*{self.suffix}"):
+                # Files being rendered are not in the cache yet
+                if f.name.startswith(self.TMP_PREFIX):
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    st = f.stat()
+                    entries.append((st.st_mtime, st.st_size, f))
+            self._size = sum(size for _, size, _ in entries)
+            # Evict a bit more than necessary so we don't rescan on every miss
+            target = self.maxBytes * 9 // 10
+            for _, size, f in sorted(entries, key=lambda x: x[0]):
+                if self._size <= target:
+                    break
+                if f == keep:
+                    continue
+                with contextlib.suppress(FileNotFoundError):
+                    f.unlink()
+                    self.evictions += 1
+                self._size -= size
 
 
 def unique(values: Iterable[Any]) -> bool:
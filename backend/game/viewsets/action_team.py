@@ -1,7 +1,7 @@
 import traceback
 from typing import Iterable, Optional
 
-from django.db import models, transaction
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from rest_framework import serializers, viewsets
@@ -19,9 +19,9 @@ from game.actions.researchStart import ResearchStartAction
 from game.entities import Entities, TeamEntity
 from game.gameGlue import stateSerialize
 from game.models import (
+    ActionStatus,
     DbAction,
     DbEntities,
-    DbInteraction,
     DbState,
     DbTask,
     DbTaskAssignment,
@@ -38,15 +38,15 @@ from game.viewsets.permissions import IsOrg
 from game.viewsets.stickers import DbStickerSerializer, Sticker
 
 
-def checkInitiatePhase(interaction: InteractionType) -> None:
-    if interaction == InteractionType.initiate:
+def checkInitiated(status: Optional[ActionStatus]) -> None:
+    if status == ActionStatus.initiated:
         return
-    elif interaction == InteractionType.revert:
+    elif status == ActionStatus.reverted:
         raise UnexpectedStateError("Akce již byla zrušena.")
-    elif interaction == InteractionType.commit:
+    elif status == ActionStatus.committed:
         raise UnexpectedStateError("Akce již byla uzavřena.")
     else:
-        raise UnexpectedStateError(f"Neočekávaný stav akce ({interaction})")
+        raise UnexpectedStateError(f"Neočekávaný stav akce ({status})")
 
 
 class InitiateSerializer(serializers.Serializer):
@@ -311,8 +311,8 @@ class TeamActionViewSet(viewsets.ViewSet):
         state = dbState.toIr()
         sourceState = dbState.toIr()
 
-        dbInteraction = dbAction.lastInteraction()
-        checkInitiatePhase(dbInteraction.phase)
+        checkInitiated(dbAction.status)
+        dbInteraction = dbAction.interactions.get(phase=InteractionType.initiate)
 
         action = dbInteraction.getActionIr(entities, state)
         if not isinstance(action, TeamInteractionActionBase):
@@ -393,8 +393,8 @@ class TeamActionViewSet(viewsets.ViewSet):
         dbState = DbState.get_latest()
         state = dbState.toIr()
 
-        dbInteraction = dbAction.lastInteraction()
-        checkInitiatePhase(dbInteraction.phase)
+        checkInitiated(dbAction.status)
+        dbInteraction = dbAction.interactions.get(phase=InteractionType.initiate)
 
         action = dbInteraction.getActionIr(entities, state)
         if not isinstance(action, TeamInteractionActionBase):
@@ -420,15 +420,9 @@ class TeamActionViewSet(viewsets.ViewSet):
     @action(methods=["GET"], detail=False)
     @transaction.atomic()
     def unfinished(self, request: Request) -> Response:
-        unfinishedActions = DbAction.objects.annotate(
-            interaction_count=models.Count("interactions")
-        ).filter(
-            interaction_count=1,
-            interactions__in=DbInteraction.objects.filter(
-                phase=InteractionType.initiate,
-                author=request.user,
-            ),
-        )
+        unfinishedActions = DbAction.objects.filter(
+            author=request.user, status=ActionStatus.initiated
+        ).order_by("id")
         return Response(
             [{"id": x.id, "description": x.description} for x in unfinishedActions]
         )
@@ -1,12 +1,14 @@
 from collections import defaultdict
+from functools import cached_property
 from itertools import zip_longest
 from typing import Any, Optional, Type
 
 from django.db import transaction
+from django.db.models import Prefetch
 from django.utils import timezone
-from rest_framework import status, viewsets
+from rest_framework import serializers, status, viewsets
 from rest_framework.exceptions import APIException
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
@@ -25,6 +27,7 @@ from game.actions.common import ActionFailed, MessageBuilder
 from game.entities import Entities, Entity, TeamEntity, Tech
 from game.gameGlue import stateDeserialize, stateSerialize
 from game.models import (
+    ACTION_STATUS_AFTER,
     DbAction,
     DbEntities,
     DbInteraction,
@@ -38,8 +41,10 @@ from game.models import (
     InteractionType,
     StickerType,
 )
-from game.serializers import DbActionSerializer
+from game.readModel import storeTeamReadModels
+from game.serializers import DbActionSerializer, DbActionSummarySerializer
 from game.state import GameState
+from game.stickers import STICKER_PRERENDERER
 from game.viewsets.permissions import IsOrg
 from game.viewsets.stickers import Sticker
 
@@ -96,7 +101,7 @@ class ActionViewHelper:
         user: Optional[User],
         new_state: GameState,
         action: ActionCommonBase,
-    ):
+    ) -> DbState:
         new_dbstate = DbState.objects.create_from(new_state, source=source_db_state)
         interaction = DbInteraction.objects.create(
             phase=interaction_type,
@@ -106,10 +111,21 @@ class ActionViewHelper:
             trace=action._trace.message,
             new_state=new_dbstate,
         )
+        storeTeamReadModels(
+            new_dbstate,
+            new_state,
+            action.entities,
+            entitiesRevision=db_action.entitiesRevision,
+            source=source_db_state,
+        )
 
+        db_action.status = ACTION_STATUS_AFTER[interaction_type]
+        if db_action.author is None:
+            db_action.author = user
         if newDescription := action.description:
             db_action.description = newDescription
-            db_action.save()
+        db_action.save()
+        return new_dbstate
 
     @staticmethod
     def addResultNotifications(result: ActionResult) -> None:
@@ -186,24 +202,41 @@ class ActionViewHelper:
             return []
 
         entRevision = DbEntities.objects.latest().id
-        awardedStickers: list[DbSticker] = []
-        for sticker in stickers:
-            dbTeam = Team.objects.get(pk=sticker.team.id)
+        dbTeams = Team.objects.in_bulk({sticker.team.id for sticker in stickers})
+
+        techIds = {s.entity.id for s in stickers if isinstance(s.entity, Tech)}
+        awardedTechIds = (
+            set(
+                DbSticker.objects.filter(entityId__in=techIds)
+                .values_list("entityId", flat=True)
+                .distinct()
+            )
+            if len(techIds) > 0
+            else set()
+        )
+
+        newStickers: list[DbSticker] = []
+        # Sort to make the first-tech award deterministic within one batch
+        for sticker in sorted(stickers, key=lambda s: (s.team.id, s.entity.id)):
             if isinstance(sticker.entity, Tech):
-                if not DbSticker.objects.filter(entityId=sticker.entity.id).exists():
+                if sticker.entity.id not in awardedTechIds:
                     stickerType = StickerType.techFirst
+                    awardedTechIds.add(sticker.entity.id)
                 else:
                     stickerType = StickerType.techSmall
             else:
                 stickerType = StickerType.regular
 
-            dbSticker = DbSticker.objects.create(
-                team=dbTeam,
-                entityId=sticker.entity.id,
-                entityRevision=entRevision,
-                type=stickerType,
+            newStickers.append(
+                DbSticker(
+                    team=dbTeams[sticker.team.id],
+                    entityId=sticker.entity.id,
+                    entityRevision=entRevision,
+                    type=stickerType,
+                )
             )
-            awardedStickers.append(dbSticker)
+        awardedStickers = DbSticker.objects.bulk_create(newStickers)
+        transaction.on_commit(lambda: STICKER_PRERENDERER.submit(awardedStickers))
         return awardedStickers
 
     @staticmethod
@@ -349,14 +382,61 @@ class ActionViewHelper:
             raise ActionFailed("Hra neběží. Není možné zadávat akce.") from None
 
 
-class ActionResultsSetPagination(PageNumberPagination):
+class ActionLogCursorPagination(CursorPagination):
+    ordering = "-id"
     page_size = 100
     page_size_query_param = "page_size"
     max_page_size = 1000
 
 
+class ActionLogQuerySerializer(serializers.Serializer):
+    team = serializers.CharField(required=False)
+    actionType = serializers.CharField(required=False)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    full = serializers.BooleanField(default=False)
+
+
 class ActionLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Action log, newest first, paginated by keyset (?cursor=). Listed
+    interactions omit action objects and traces unless asked for by
+    ?full=true; a single action is always complete. Filters: ?team=,
+    ?actionType= (comma separated), ?since= and ?until= (creation time).
+    """
+
     permission_classes = (IsAuthenticated, IsOrg)
-    pagination_class = ActionResultsSetPagination
-    queryset = DbAction.objects.all().order_by("-id").prefetch_related("interactions")
-    serializer_class = DbActionSerializer
+    pagination_class = ActionLogCursorPagination
+
+    @cached_property
+    def queryParams(self) -> dict[str, Any]:
+        deserializer = ActionLogQuerySerializer(data=self.request.query_params)
+        deserializer.is_valid(raise_exception=True)
+        return deserializer.validated_data
+
+    def isFull(self) -> bool:
+        return self.action != "list" or self.queryParams["full"]
+
+    def get_serializer_class(self):
+        return DbActionSerializer if self.isFull() else DbActionSummarySerializer
+
+    def get_queryset(self):
+        interactions = DbInteraction.objects.select_related("author")
+        if not self.isFull():
+            interactions = interactions.defer("actionObject", "trace")
+        queryset = DbAction.objects.order_by("-id").prefetch_related(
+            Prefetch("interactions", interactions)
+        )
+        if self.action != "list":
+            return queryset
+
+        params = self.queryParams
+        if "team" in params:
+            queryset = queryset.filter(team=params["team"])
+        if "actionType" in params:
+            queryset = queryset.filter(actionType__in=params["actionType"].split(","))
+        if "since" in params:
+            queryset = queryset.filter(createdAt__gte=params["since"])
+        if "until" in params:
+            queryset = queryset.filter(createdAt__lt=params["until"])
+        return queryset
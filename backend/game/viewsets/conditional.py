@@ -0,0 +1,66 @@
+import functools
+import hashlib
+from typing import Any, Callable, Optional
+
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from game.models import DbEntities, DbState
+
+
+def latestStateId() -> Optional[int]:
+    return DbState.objects.order_by("-id").values_list("id", flat=True).first()
+
+
+def latestEntitiesRevision() -> Optional[int]:
+    return DbEntities.objects.order_by("-id").values_list("id", flat=True).first()
+
+
+def makeETag(request: Request, *parts: Any) -> str:
+    user = request.user
+    role = "org" if user.is_org else f"team:{user.team.id}"
+    digest = hashlib.sha256(repr((role, parts)).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def conditional(
+    version: Optional[Callable[..., Any]] = None, *, dependsOnState: bool = True
+):
+    """
+    Decorator for read-only views whose response is derived from the latest
+    game state. The response carries an ETag computed from the latest state
+    id, entity revision and user role (plus whatever the optional version
+    function returns for data outside of the game state, called with the
+    view arguments). Both ids only grow, so the response changes only when
+    they do. A request with a matching If-None-Match gets 304 before the view
+    runs, i.e., without deserializing the state.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(self, request: Request, *args, **kwargs) -> Response:
+            etag = makeETag(
+                request,
+                latestStateId() if dependsOnState else None,
+                latestEntitiesRevision(),
+                version(self, request, *args, **kwargs) if version else None,
+            )
+            if etag in parseIfNoneMatch(request):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = view(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response["ETag"] = etag
+                # Let the browser cache the response, but always revalidate
+                response["Cache-Control"] = "private, no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def parseIfNoneMatch(request: Request) -> list[str]:
+    header = request.headers.get("If-None-Match", "")
+    return [tag.strip().removeprefix("W/") for tag in header.split(",")]
@@ -1,62 +1,159 @@
-from typing import Callable, Mapping
+import functools
+import gzip
+from typing import NamedTuple, Optional
 
-from rest_framework import viewsets
+from django.http import HttpResponse
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
-from rest_framework.response import Response
 
-from game.entities import Entities, Entity, EntityId
 from game.gameGlue import serializeEntity
 from game.models import DbEntities
+from game.renderers import encodeJson
+from game.viewsets.conditional import latestEntitiesRevision, parseIfNoneMatch
+
+try:
+    import brotli
+except ImportError:  # Clients get gzip instead
+    brotli = None  # type: ignore
+
+# The entities of a revision never change, so a request naming the revision
+# can be cached for good
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+class EntityPayload(NamedTuple):
+    json: bytes
+    gzip: bytes
+    brotli: Optional[bytes]
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding == "br" and self.brotli is not None:
+            return self.brotli
+        if encoding == "gzip":
+            return self.gzip
+        return self.json
+
+
+# Suffixes of the ETag, each content coding is a different representation
+ENCODING_ETAG_SUFFIXES = {None: "", "gzip": "-gz", "br": "-br"}
+
+
+def negotiateEncoding(acceptEncoding: str) -> Optional[str]:
+    """
+    Picks br or gzip if the client accepts it; codings with q=0 are refused
+    """
+    accepted = set()
+    for item in acceptEncoding.lower().split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+@functools.lru_cache(maxsize=64)
+def entityPayload(revision: int, category: str) -> EntityPayload:
+    """
+    Serialized entities of a category (an attribute of Entities) in the
+    given revision, encoded like the JSON renderer would do it and compressed
+    """
+    entities = DbEntities.objects.get_revision(revision)[1]
+    payload = encodeJson(
+        {e.id: serializeEntity(e) for e in getattr(entities, category).values()}
+    )
+    return EntityPayload(
+        payload,
+        gzip.compress(payload, mtime=0),
+        brotli.compress(payload) if brotli is not None else None,
+    )
 
 
 class EntityViewSet(viewsets.ViewSet):
     permission_classes = (IsAuthenticated,)
 
     @action(detail=False)
-    def resources(self, request: Request) -> Response:
-        return self._list(lambda e: e.resources)
+    def resources(self, request: Request) -> HttpResponse:
+        return self._list(request, "resources")
 
     @action(detail=False)
-    def techs(self, request: Request) -> Response:
-        return self._list(lambda e: e.techs)
+    def techs(self, request: Request) -> HttpResponse:
+        return self._list(request, "techs")
 
     @action(detail=False)
-    def vyrobas(self, request: Request) -> Response:
-        return self._list(lambda e: e.vyrobas)
+    def vyrobas(self, request: Request) -> HttpResponse:
+        return self._list(request, "vyrobas")
 
     @action(detail=False)
-    def tiles(self, request: Request) -> Response:
-        return self._list(lambda e: e.tiles)
+    def tiles(self, request: Request) -> HttpResponse:
+        return self._list(request, "tiles")
 
     @action(detail=False)
-    def buildings(self, request: Request) -> Response:
-        return self._list(lambda e: e.buildings)
+    def buildings(self, request: Request) -> HttpResponse:
+        return self._list(request, "buildings")
 
     @action(detail=False)
-    def building_upgrades(self, request: Request) -> Response:
-        return self._list(lambda e: e.building_upgrades)
+    def building_upgrades(self, request: Request) -> HttpResponse:
+        return self._list(request, "building_upgrades")
 
     @action(detail=False)
-    def team_attributes(self, request: Request) -> Response:
-        return self._list(lambda e: e.team_attributes)
+    def team_attributes(self, request: Request) -> HttpResponse:
+        return self._list(request, "team_attributes")
 
     @action(detail=False)
-    def team_groups(self, request: Request) -> Response:
-        return self._list(lambda e: e.team_groups)
+    def team_groups(self, request: Request) -> HttpResponse:
+        return self._list(request, "team_groups")
 
     @action(detail=False)
-    def dice(self, request: Request) -> Response:
-        return self._list(lambda e: e.dice)
+    def dice(self, request: Request) -> HttpResponse:
+        return self._list(request, "dice")
+
+    def list(self, request: Request) -> HttpResponse:
+        return self._list(request, "all")
 
-    def list(self, request: Request) -> Response:
-        return self._list(lambda e: e.all)
+    def _list(self, request: Request, category: str) -> HttpResponse:
+        """
+        Serves the precomputed payload of the latest revision, or of the
+        revision given by ?revision=, which may be cached indefinitely
+        """
+        requested = request.query_params.get("revision", "")
+        if requested and not requested.isdigit():
+            return HttpResponse(status=status.HTTP_400_BAD_REQUEST)
+        if requested:
+            revision: Optional[int] = int(requested)
+            if not DbEntities.objects.filter(id=revision).exists():
+                return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+            cacheControl = IMMUTABLE_CACHE_CONTROL
+        else:
+            revision = latestEntitiesRevision()
+            cacheControl = "private, no-cache"
+        if revision is None:
+            return HttpResponse(status=status.HTTP_404_NOT_FOUND)
 
-    def _list(
-        self, entitySelector: Callable[[Entities], Mapping[EntityId, Entity]]
-    ) -> Response:
-        entities = DbEntities.objects.get_revision()[1]
-        return Response(
-            {e.id: serializeEntity(e) for e in entitySelector(entities).values()}
-        )
+        encoding = negotiateEncoding(request.headers.get("Accept-Encoding", ""))
+        suffix = ENCODING_ETAG_SUFFIXES[encoding]
+        etag = f'"entities-{revision}-{category}{suffix}"'
+        if etag in parseIfNoneMatch(request):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            content = entityPayload(revision, category).encoded(encoding)
+            response = HttpResponse(content, content_type="application/json")
+            if encoding is not None:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Cache-Control"] = cacheControl
+        response["Vary"] = "Accept-Encoding"
+        response["X-Entities-Revision"] = str(revision)
+        return response
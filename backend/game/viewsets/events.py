@@ -0,0 +1,111 @@
+import time
+from typing import Iterator, Optional
+
+from django.db import connection
+from django.http import StreamingHttpResponse
+from rest_framework import serializers, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BaseRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from game.events import GAME_EVENTS, EventBus, EventsPage
+from game.renderers import ORJSONRenderer, encodeJson
+
+LONG_POLL_TIMEOUT_S = 25
+HEARTBEAT_S = 15
+# Streams end after this long and EventSource reconnects with Last-Event-ID,
+# so a stream doesn't hold a server thread indefinitely
+STREAM_LIFETIME_S = 300
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class EventsQuerySerializer(serializers.Serializer):
+    since = serializers.IntegerField(required=False, min_value=0)
+
+
+class EventsViewSet(viewsets.ViewSet):
+    """
+    Stream of "something changed" events, so clients refetch only what
+    changed instead of polling on timers. Served as server-sent events to
+    clients accepting text/event-stream, otherwise as a long poll: the request
+    waits until there are events after `since` (or times out) and returns
+    them with the number to ask for next time. Event numbers are shared by
+    all server processes.
+
+    Under WSGI every connected event stream occupies a server thread for its
+    lifetime, so only a few clients (e.g. org dashboards) should stream;
+    players should long poll.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    renderer_classes = (ORJSONRenderer, EventStreamRenderer)
+    bus: EventBus = GAME_EVENTS
+
+    def list(self, request: Request):
+        deserializer = EventsQuerySerializer(data=request.query_params)
+        deserializer.is_valid(raise_exception=True)
+        params = deserializer.validated_data
+
+        since = params.get("since")
+        teamId = None if request.user.is_org else request.user.team.id
+
+        if request.accepted_renderer.format == "sse":
+            if (lastEventId := request.headers.get("Last-Event-ID")) is not None:
+                since = int(lastEventId) if lastEventId.isdigit() else None
+            reset = since is None
+            if reset:
+                since = self.bus.last
+            response = StreamingHttpResponse(
+                self.stream(since, reset, teamId), content_type="text/event-stream"
+            )
+            response["Cache-Control"] = "no-cache"
+            response["X-Accel-Buffering"] = "no"
+            return response
+
+        if since is None:
+            page = EventsPage([], self.bus.last, reset=True)
+        else:
+            page = self.bus.since(since, timeout=LONG_POLL_TIMEOUT_S)
+        return Response(
+            {
+                "last": page.last,
+                "reset": page.reset,
+                "events": [
+                    e.serialize(teamId) for e in page.events if e.visibleTo(teamId)
+                ],
+            }
+        )
+
+    def stream(self, since: int, reset: bool, teamId: Optional[str]) -> Iterator[str]:
+        # The stream doesn't query the database, don't keep the connection of
+        # the request open for its whole lifetime
+        connection.close()
+        if reset:
+            yield self.sseMessage("reset", since, {})
+        deadline = time.monotonic() + STREAM_LIFETIME_S
+        while time.monotonic() < deadline:
+            page = self.bus.since(since, timeout=HEARTBEAT_S)
+            if page.reset:
+                since = page.last
+                yield self.sseMessage("reset", since, {})
+                continue
+            if not page.events:
+                # Keeps proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+                continue
+            for e in page.events:
+                if e.visibleTo(teamId):
+                    yield self.sseMessage(e.type, e.seq, e.serialize(teamId))
+            since = page.last
+
+    @staticmethod
+    def sseMessage(type: str, seq: int, data: dict) -> str:
+        return f"id: {seq}\nevent: {type}\ndata: {encodeJson(data).decode()}\n\n"
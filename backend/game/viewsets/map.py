@@ -4,12 +4,14 @@ from rest_framework.response import Response
 from game.gameGlue import stateSerialize
 
 from game.models import DbState
+from game.viewsets.conditional import conditional
 from game.viewsets.permissions import IsOrg
 
 
 class MapViewSet(viewsets.ViewSet):
     permission_classes = (IsAuthenticated, IsOrg)
 
+    @conditional()
     def list(self, request):
         dbState: DbState = DbState.get_latest()
         entities = dbState.entities
@@ -1,11 +1,13 @@
-from game.models import Printer
+from core.serializers.fields import TextEnumSerializer
+from game.models import Printer, PrintJob, PrintJobStatus
+from game.printing import PRINT_DISPATCHER, PRINTER_REGISTRY
+from game.viewsets.permissions import IsOrg
 from rest_framework import serializers, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
 from rest_framework.request import Request
 from rest_framework import serializers
-from django.utils import timezone
 
 from ipware import get_client_ip
 
@@ -20,13 +22,21 @@ class PrinterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Printer
         fields = "__all__"
-        read_only_fields = ["id", "address", "registeredAt"]
+        read_only_fields = ["id", "address", "registeredAt", "lastSeen"]
+
+
+class PrintJobSerializer(serializers.ModelSerializer):
+    status = TextEnumSerializer(PrintJobStatus)
+
+    class Meta:
+        model = PrintJob
+        fields = "__all__"
+        editable = False
 
 
 class PrinterViewSet(viewsets.ViewSet):
     def list(self, request):
-        Printer.objects.prune()
-        return Response(PrinterSerializer(Printer.objects.all(), many=True).data)
+        return Response(PrinterSerializer(PRINTER_REGISTRY.alive(), many=True).data)
 
     @action(detail=False, methods=["POST"])
     def register(self, request: Request) -> Response:
@@ -37,13 +47,20 @@ class PrinterViewSet(viewsets.ViewSet):
         clientIp, _ = get_client_ip(request._request)
         if clientIp is None:
             raise NoIPError()
-        Printer.objects.update_or_create(
-            name=data["name"],
-            defaults={
-                "address": clientIp,
-                "port": data["port"],
-                "registeredAt": timezone.now(),
-                "printsStickers": data["printsStickers"],
-            },
+        PRINTER_REGISTRY.heartbeat(
+            data["name"], clientIp, data["port"], data["printsStickers"]
         )
         return Response()
+
+
+class PrintJobViewSet(viewsets.ReadOnlyModelViewSet):
+    permission_classes = [IsOrg]
+    serializer_class = PrintJobSerializer
+
+    def get_queryset(self):
+        queryset = PrintJob.objects.all().order_by("-id")
+        if (status := self.request.query_params.get("status")) is not None:
+            if (statusValue := PrintJobStatus.get(status)) is None:
+                raise ValidationError({"status": ["Neznámý stav"]})
+            queryset = queryset.filter(status=statusValue)
+        return queryset[:100] if self.action == "list" else queryset
@@ -1,6 +1,7 @@
 from rest_framework import viewsets
 from game.gameGlue import stateSerialize
 from game.models import DbState
+from game.viewsets.conditional import conditional
 from game.viewsets.permissions import IsOrg
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
@@ -12,6 +13,7 @@ class StateViewSet(viewsets.ViewSet):
     permission_classes = (IsAuthenticated, IsOrg)
 
     @action(detail=False)
+    @conditional()
     def latest(self, request: Request) -> Response:
         state = DbState.get_latest()
         ir = state.toIr()
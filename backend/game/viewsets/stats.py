@@ -0,0 +1,64 @@
+from rest_framework import serializers, viewsets
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from game.models import DbTeamRoundMetrics
+from game.viewsets.conditional import conditional
+
+
+class RoundMetricsQuerySerializer(serializers.Serializer):
+    team = serializers.CharField(required=False)
+    metrics = serializers.CharField(required=False)
+    since = serializers.IntegerField(required=False, min_value=0)
+    until = serializers.IntegerField(required=False, min_value=0)
+
+    def validate_metrics(self, value: str) -> list[str]:
+        metrics = value.split(",")
+        if unknown := set(metrics) - set(DbTeamRoundMetrics.METRICS):
+            raise serializers.ValidationError(
+                f"Neznámé metriky: {', '.join(sorted(unknown))}"
+            )
+        return metrics
+
+
+def roundMetricsVersion(self, request: Request) -> list:
+    return sorted(request.query_params.items())
+
+
+class RoundMetricsViewSet(viewsets.ViewSet):
+    """
+    Time series of team metrics at the start of each round, one column per
+    metric: {team: {"turn": [...], "population": [...], ...}}. Filters:
+    ?team= and ?metrics= (comma separated), ?since= and ?until= (turns).
+    Teams see only their own metrics.
+    """
+
+    permission_classes = (IsAuthenticated,)
+
+    @conditional(roundMetricsVersion)
+    def list(self, request: Request) -> Response:
+        deserializer = RoundMetricsQuerySerializer(data=request.query_params)
+        deserializer.is_valid(raise_exception=True)
+        params = deserializer.validated_data
+
+        metrics = params.get("metrics", DbTeamRoundMetrics.METRICS)
+        rows = DbTeamRoundMetrics.objects.order_by("team", "turn")
+        if not request.user.is_org:
+            rows = rows.filter(team=request.user.team)
+        if "team" in params:
+            rows = rows.filter(team__in=params["team"].split(","))
+        if "since" in params:
+            rows = rows.filter(turn__gte=params["since"])
+        if "until" in params:
+            rows = rows.filter(turn__lte=params["until"])
+
+        series: dict[str, dict[str, list]] = {}
+        for teamId, turn, *values in rows.values_list("team", "turn", *metrics):
+            if teamId not in series:
+                series[teamId] = {column: [] for column in ["turn", *metrics]}
+            teamSeries = series[teamId]
+            teamSeries["turn"].append(turn)
+            for metric, value in zip(metrics, values):
+                teamSeries[metric].append(value)
+        return Response(series)
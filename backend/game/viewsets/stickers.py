@@ -1,19 +1,27 @@
+from pathlib import Path
 from typing import NamedTuple
 
-import requests
+from django.conf import settings
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, NotFound, ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
 
 from core.serializers.announcement import TeamIdSerializer
 from core.serializers.fields import TextEnumSerializer
 from game.entities import Entity, TeamEntity
-from game.models import DbSticker, Printer, StickerType
-from game.stickers import getStickerFile
+from game.models import DbSticker, StickerType
+from game.printing import PRINT_DISPATCHER, PRINTER_REGISTRY
+from game.stickers import (
+    STICKER_CACHE,
+    STICKER_PRERENDERER,
+    StickerFormat,
+    getStickerFile,
+)
+from game.viewsets.permissions import IsOrg
 
 
 class Sticker(NamedTuple):
@@ -27,12 +35,6 @@ class NoSuchPrinter(APIException):
     default_code = "bad_request"
 
 
-class PrinterError(APIException):
-    status_code = 400
-    default_detail = "Tiskárna vrátila neočekávanou odpověď"
-    default_code = "unexpected_response"
-
-
 class DbStickerSerializer(serializers.ModelSerializer):
     team = TeamIdSerializer()
     type = TextEnumSerializer(StickerType)
@@ -47,6 +49,12 @@ class PrintSerializer(serializers.Serializer):
     printerId = serializers.IntegerField()
 
 
+class PrintBatchSerializer(PrintSerializer):
+    stickers = serializers.ListField(
+        child=serializers.IntegerField(), min_length=1, max_length=50
+    )
+
+
 class StickerViewSet(viewsets.ViewSet):
     def _getSticker(self, user, pk):
         sticker = get_object_or_404(DbSticker.objects.all(), pk=pk)
@@ -54,6 +62,14 @@ class StickerViewSet(viewsets.ViewSet):
         #     raise PermissionDenied("Nedovolený přístup")
         return sticker
 
+    @staticmethod
+    def _getStickerFile(
+        sticker: DbSticker, format: StickerFormat = StickerFormat.png
+    ) -> Path:
+        # Render inline rather than wait behind a long prerender queue
+        STICKER_PRERENDERER.wait(sticker, timeout=settings.STICKER_PRERENDER_WAIT_S)
+        return getStickerFile(sticker, format)
+
     def retrieve(self, request: Request, pk) -> Response:
         sticker = self._getSticker(request.user, pk)
         return Response(DbStickerSerializer(sticker).data)
@@ -63,34 +79,41 @@ class StickerViewSet(viewsets.ViewSet):
         sticker = self._getSticker(request.user, pk)
         sticker.update()
         sticker.save()
+        STICKER_PRERENDERER.submit([sticker])
         return Response({})
 
     @staticmethod
-    def printGeneral(request: Request, imageFileStream) -> Response:
+    def printGeneral(request: Request, stickers: list[DbSticker]) -> Response:
         deserializer = PrintSerializer(data=request.data)
         deserializer.is_valid(raise_exception=True)
         data = deserializer.validated_data
 
-        Printer.objects.prune()
-        try:
-            printer = Printer.objects.get(pk=data["printerId"])
-        except Printer.DoesNotExist:
-            raise NoSuchPrinter() from None
+        printer = PRINTER_REGISTRY.get(data["printerId"])
+        if printer is None:
+            raise NoSuchPrinter()
 
-        try:
-            printerUrl = f"http://{printer.address}:{printer.port}/print"
-            r = requests.post(printerUrl, files={"image": imageFileStream})
-            if r.status_code != 200:
-                raise PrinterError(r.text)
-        except Exception as e:
-            raise PrinterError(str(e))
-        return Response({})
+        job = PRINT_DISPATCHER.enqueue(printer, stickers, author=request.user)
+        return Response({"jobId": job.id})
 
     @action(detail=True, methods=["POST"])
     def print(self, request: Request, pk) -> Response:
         sticker = self._getSticker(request.user, pk)
+        return self.printGeneral(request, [sticker])
+
+    @action(detail=False, methods=["POST"], url_path="printbatch")
+    def printBatch(self, request: Request) -> Response:
+        """
+        Print several stickers in the given order as a single job, which is
+        sent to the printer in one transfer
+        """
+        deserializer = PrintBatchSerializer(data=request.data)
+        deserializer.is_valid(raise_exception=True)
+        stickerIds = deserializer.validated_data["stickers"]
 
-        return self.printGeneral(request, open(getStickerFile(sticker), "rb"))
+        stickers = DbSticker.objects.select_related("team").in_bulk(stickerIds)
+        if missing := [id for id in stickerIds if id not in stickers]:
+            raise NotFound(f"Samolepky {missing} neexistují")
+        return self.printGeneral(request, [stickers[id] for id in stickerIds])
 
     # @action(detail=True, methods=["POST"])
     # def printRelated(self, request: Request, pk) -> Response:
@@ -105,6 +128,27 @@ class StickerViewSet(viewsets.ViewSet):
     @action(detail=True, methods=["GET"])
     def image(self, request: Request, pk) -> FileResponse:
         sticker = self._getSticker(request.user, pk)
+        try:
+            format = StickerFormat(request.query_params.get("profile", "png"))
+        except ValueError:
+            raise ValidationError(
+                {
+                    "profile": [
+                        f"Neznámý profil, možnosti: {[f.value for f in StickerFormat]}"
+                    ]
+                }
+            ) from None
+        suffix = "bin" if format == StickerFormat.escpos else "png"
         return FileResponse(
-            open(getStickerFile(sticker), "rb"), filename=f"sticker_{sticker.id}.png"
+            open(self._getStickerFile(sticker, format), "rb"),
+            filename=f"sticker_{sticker.id}.{suffix}",
+        )
+
+    @action(detail=False, methods=["GET"], permission_classes=[IsOrg])
+    def prerender(self, request: Request) -> Response:
+        return Response(
+            {
+                "queueDepth": STICKER_PRERENDERER.queueDepth,
+                "cache": STICKER_CACHE.stats(),
+            }
         )
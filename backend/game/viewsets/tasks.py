@@ -16,7 +16,7 @@ class TaskUsedError(APIException):
 class TaskViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated, IsOrg)
 
-    queryset = DbTask.objects.all()
+    queryset = DbTask.objects.withAssignments()
     serializer_class = DbTaskSerializer
 
     def destroy(self, request, pk, *args, **kwargs):
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from decimal import Decimal
-from typing import Any, Iterable, NamedTuple, Optional, TypedDict, Union
+from typing import Any, Callable, Optional, Union
 
 from django.db import transaction
+from django.db.models import Count, Max, Prefetch, Sum
 from django.db.models.query import QuerySet
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -15,14 +15,14 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 
 from core.models import Team, User
-from core.models.announcement import Announcement
-from core.serializers.announcement import team_serialize_announcement
+from core.models.announcement import Announcement, ReadEvent
+from core.serializers.announcement import team_serialize_announcements
 from core.serializers.team import TeamSerializer
-from game.entities import Entities, EntityId, TeamEntity, Vyroba
-from game.gameGlue import serializeEntity, stateSerialize
-from game.models import DbState, DbSticker, DbTask, DbTaskAssignment, DbTaskManager
+from core.viewsets.announcement import team_announcements_response
+from game.models import DbSticker, DbTask, DbTaskAssignment, DbTaskManager
+from game.readModel import getTeamReadModel
 from game.serializers import DbTaskSerializer, PlayerDbTaskSerializer
-from game.state import Army, GameState, MapTile, TeamState
+from game.viewsets.conditional import conditional
 from game.viewsets.permissions import IsOrg
 from game.viewsets.stickers import DbStickerSerializer
 
@@ -34,41 +34,54 @@ class ChangeTaskSerializer(serializers.Serializer):
     newTask = serializers.CharField(allow_blank=True, allow_null=True)
 
 
-class SpecialResources(TypedDict):
-    work: Decimal
-    obyvatels: Decimal
-    population: Decimal
-    culture: Decimal
-    withdraw_capacity: Decimal
+def teamConditional(version: Optional[Callable[..., Any]] = None):
+    """
+    Conditional GET for team views; checks access before answering 304
+    """
 
+    def teamVersion(self: TeamViewSet, request: Request, pk: TeamId) -> Any:
+        self.validateAccess(request.user, pk)
+        return (pk, version(self, request, pk) if version else None)
 
-class TeamStateInfo(NamedTuple):
-    state: GameState
-    teamEntity: TeamEntity
-    entities: Entities
+    return conditional(teamVersion)
 
-    @property
-    def teamState(self) -> TeamState:
-        return self.state.teamStates[self.teamEntity]
 
-    def getTeamSpecialResources(self) -> SpecialResources:
-        resources = self.teamState.resources
-        return {
-            "work": resources.get(self.entities.work, Decimal(0)),
-            "obyvatels": resources.get(self.entities.obyvatel, Decimal(0)),
-            "population": self.teamState.population,
-            "culture": resources.get(self.entities.culture, Decimal(0)),
-            "withdraw_capacity": resources.get(
-                self.entities.withdraw_capacity, Decimal(0)
-            ),
-        }
+def tasksVersion(self: TeamViewSet, request: Request, pk: TeamId) -> Any:
+    # Occupancy of tasks depends on assignments of all the teams. Finishing
+    # or abandoning an assignment sets its finishedAt to the current time.
+    return (
+        DbTask.objects.aggregate(count=Count("id"), updated=Max("updatedAt")),
+        DbTaskAssignment.objects.aggregate(
+            count=Count("id"), last=Max("id"), finished=Max("finishedAt")
+        ),
+    )
+
+
+def announcementSetVersion(announcements: QuerySet[Announcement]) -> Any:
+    return announcements.aggregate(
+        count=Count("id"), ids=Sum("id"), updated=Max("updatedAt")
+    )
+
+
+def unreadAnnouncementsVersion(self: TeamViewSet, request: Request, pk: TeamId) -> Any:
+    return announcementSetVersion(self.unreadAnnouncements(request.user, Team(id=pk)))
+
+
+def announcementsVersion(self: TeamViewSet, request: Request, pk: TeamId) -> Any:
+    return (
+        announcementSetVersion(Announcement.objects.get_team(Team(id=pk))),
+        ReadEvent.objects.filter(announcement__teams=pk).aggregate(
+            count=Count("id"), read=Max("readAt")
+        ),
+    )
 
-    @staticmethod
-    def get_latest(teamId: TeamId) -> TeamStateInfo:
-        dbState = DbState.get_latest()
-        state = dbState.toIr()
-        entities = dbState.entities
-        return TeamStateInfo(state, entities.teams[teamId], entities)
+
+def stickersVersion(self: TeamViewSet, request: Request, pk: TeamId) -> Any:
+    return tuple(
+        DbSticker.objects.filter(team=pk)
+        .order_by("id")
+        .values_list("id", "entityRevision")
+    )
 
 
 class TeamViewSet(viewsets.ViewSet):
@@ -91,86 +104,35 @@ class TeamViewSet(viewsets.ViewSet):
         t = get_object_or_404(Team.objects.filter(visible=True), pk=pk)
         return Response(TeamSerializer(t).data)
 
-    @staticmethod
-    def serializeArmy(
-        a: Army, reachableTiles: Optional[Iterable[MapTile]]
-    ) -> dict[str, Any]:
-        return {
-            "index": a.index,
-            "team": a.team.id,
-            "name": a.name,
-            "level": a.level,
-            "equipment": a.equipment,
-            "boost": a.boost,
-            "tile": a.tile.id if a.tile is not None else None,
-            "mode": a.mode.name,
-            "goal": a.goal.name if a.goal is not None else None,
-            "reachableTiles": [t.id for t in reachableTiles]
-            if reachableTiles is not None
-            else None,
-        }
-
     @action(detail=True)
+    @teamConditional()
     def resources(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        resources = TeamStateInfo.get_latest(pk).teamState.resources
-
-        assert all(amount >= 0 for amount in resources.values())
-        return Response(
-            {
-                res.id: serializeEntity(res, {"available": resources[res]})
-                for res in resources.keys()
-                if resources[res] > 0
-            }
-        )
+        return Response(getTeamReadModel(pk)["resources"])
 
     @action(detail=True)
+    @teamConditional()
     def vyrobas(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        stateInfo = TeamStateInfo.get_latest(pk)
-
-        teamReachableTiles = stateInfo.state.map.getReachableTiles(stateInfo.teamEntity)
-
-        def isTileSuitableFor(vyroba: Vyroba, tile: MapTile) -> bool:
-            return set(vyroba.requiredTileFeatures).issubset(tile.features)
-
-        def allowed_tiles(vyroba: Vyroba) -> list[EntityId]:
-            return [t.id for t in teamReachableTiles if isTileSuitableFor(vyroba, t)]
-
-        return Response(
-            {
-                v.id: serializeEntity(v, {"allowedTiles": allowed_tiles(v)})
-                for v in stateInfo.teamState.unlocked_vyrobas()
-            }
-        )
+        return Response(getTeamReadModel(pk)["vyrobas"])
 
     @action(detail=True)
+    @teamConditional()
     def buildings(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        teamState = TeamStateInfo.get_latest(pk).teamState
-        return Response(
-            {b.id: serializeEntity(b) for b in teamState.unlocked_buildings()}
-        )
+        return Response(getTeamReadModel(pk)["buildings"])
 
     @action(detail=True)
+    @teamConditional()
     def building_upgrades(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        teamState = TeamStateInfo.get_latest(pk).teamState
-        return Response(
-            {u.id: serializeEntity(u) for u in teamState.unlocked_building_upgrades()}
-        )
+        return Response(getTeamReadModel(pk)["building_upgrades"])
 
     @action(detail=True)
+    @teamConditional()
     def attributes(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        teamState = TeamStateInfo.get_latest(pk).teamState
-
-        return Response(
-            {
-                a.id: serializeEntity(a, {"owned": a in teamState.attributes})
-                for a in teamState.unlocked_attributes()
-            }
-        )
+        return Response(getTeamReadModel(pk)["attributes"])
 
     @staticmethod
     def serialize_task(task: Union[DbTask, DbTaskManager], user: User):
@@ -180,59 +142,43 @@ class TeamViewSet(viewsets.ViewSet):
             return PlayerDbTaskSerializer(task).data
 
     @action(detail=True)
+    @teamConditional(tasksVersion)
     def techs(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        team = get_object_or_404(Team.objects.all(), pk=pk)
-
-        teamState = TeamStateInfo.get_latest(pk).teamState
-
-        teamTechs = set(teamState.techs)
-        teamTechs.update(teamState.researching)
-        for t in teamState.techs:
-            teamTechs.update(t.unlocksTechs)
-
-        def tech_extra_fields(tech):
-            if tech in teamState.techs:
-                return {"status": "owned"}
-            if tech in teamState.researching:
-                try:
-                    assignment = DbTaskAssignment.objects.get(
-                        team=team, techId=tech.id, finishedAt=None
-                    )
-                except DbTaskAssignment.DoesNotExist:
-                    return {"status": "researching"}
-                return {
-                    "status": "researching",
-                    "assignedTask": TeamViewSet.serialize_task(
-                        assignment.task, request.user
-                    ),
-                }
-            return {"status": "available"}
-
-        return Response(
-            {
-                tech.id: serializeEntity(tech, tech_extra_fields(tech))
-                for tech in teamTechs
-            }
-        )
+        techs = getTeamReadModel(pk)["techs"]
+
+        researching = [
+            techId for techId, tech in techs.items() if tech["status"] == "researching"
+        ]
+        assignments = DbTaskAssignment.objects.filter(
+            team=pk, techId__in=researching, finishedAt=None
+        ).prefetch_related(Prefetch("task", DbTask.objects.withAssignments()))
+        for assignment in assignments:
+            techs[assignment.techId]["assignedTask"] = TeamViewSet.serialize_task(
+                assignment.task, request.user
+            )
+        return Response(techs)
 
     @action(detail=True)
+    @teamConditional(tasksVersion)
     def tasks(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
         if request.user.is_org:
-            taskSet = DbTask.objects.all()
+            taskSet = DbTask.objects.withAssignments()
         else:
-            taskSet = DbTask.objects.filter(assignments__team=pk)
+            taskSet = DbTask.objects.withAssignments().filter(
+                id__in=DbTaskAssignment.objects.filter(team=pk).values("task")
+            )
 
         return Response(
             {t.id: TeamViewSet.serialize_task(t, request.user) for t in taskSet}
         )
 
     @action(detail=True)
+    @teamConditional()
     def special_resources(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        stateInfo = TeamStateInfo.get_latest(pk)
-        return Response(stateInfo.getTeamSpecialResources())
+        return Response(getTeamReadModel(pk)["special_resources"])
 
     @action(detail=True, methods=["POST"], permission_classes=[IsOrg])
     @transaction.atomic()
@@ -269,127 +215,76 @@ class TeamViewSet(viewsets.ViewSet):
         return Response({})
 
     @action(detail=True)
+    @teamConditional(unreadAnnouncementsVersion)
     def dashboard(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
         team = get_object_or_404(Team.objects.all(), pk=pk)
-        stateInfo = TeamStateInfo.get_latest(pk)
-        teamState = stateInfo.teamState
-        entities = stateInfo.entities
-
-        orgInfo = {
-            "groups": list(x.id for x in stateInfo.teamEntity.groups),
-            "techs": list(x.id for x in teamState.techs),
-            "attributes": list(x.id for x in teamState.attributes),
-        }
+        readModel = getTeamReadModel(pk)
 
         return Response(
             {
-                "specialres": stateInfo.getTeamSpecialResources(),
-                "worldTurn": stateInfo.state.world.turn,
-                "teamTurn": teamState.turn,
-                "researching": [serializeEntity(x) for x in teamState.researching],
-                "productions": [(r.id, a) for r, a in teamState.productions.items()],
-                "storage": [(r.id, a) for r, a in teamState.storage.items()],
-                "employees": [(e.id, a) for e, a in teamState.employees.items()],
+                **readModel["dashboard"],
                 # TODO: Add feeding info
-                # "feeding": stateSerialize(
-                #     computeFeedRequirements(
-                #         stateInfo.state, entities, stateInfo.teamEntity
-                #     )
-                # ),
-                "announcements": [
-                    team_serialize_announcement(announcement, read=False)
-                    for announcement in self.unreadAnnouncements(request.user, team)
-                ],
-                "armies": [self.serializeArmy(army, None) for army in teamState.armies],
-                **({"orginfo": orgInfo} if request.user.is_org else {}),
+                "announcements": team_serialize_announcements(
+                    self.unreadAnnouncements(request.user, team),
+                    user=request.user,
+                    read=False,
+                ),
+                **({"orginfo": readModel["orginfo"]} if request.user.is_org else {}),
             }
         )
 
     @action(detail=True)
+    @teamConditional(announcementsVersion)
     def announcements(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
         team = get_object_or_404(Team.objects.all(), pk=pk)
-        return Response(
-            [
-                team_serialize_announcement(
-                    announcement,
-                    read=request.user in announcement.read.all(),
-                    org_info=request.user.is_org,
-                )
-                for announcement in Announcement.objects.get_team(team)
-            ]
-        )
+        return team_announcements_response(request, Announcement.objects.get_team(team))
 
     @action(detail=True)
+    @teamConditional()
     def armies(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        stateInfo = TeamStateInfo.get_latest(pk)
-        reachableTiles = stateInfo.state.map.getReachableTiles(stateInfo.teamEntity)
-
-        return Response(
-            {
-                a.index: self.serializeArmy(a, reachableTiles)
-                for a in stateInfo.teamState.armies
-            }
-        )
+        return Response(getTeamReadModel(pk)["armies"])
 
     @action(detail=True)
+    @teamConditional(stickersVersion)
     def stickers(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
         stickers = DbSticker.objects.filter(team=pk).order_by("-awardedAt")
         return Response(DbStickerSerializer(stickers, many=True).data)
 
     @action(detail=True)
+    @teamConditional()
     def productions(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        teamState = TeamStateInfo.get_latest(pk).teamState
-        return Response(
-            {res.id: amount for res, amount in teamState.productions.items()}
-        )
+        return Response(getTeamReadModel(pk)["productions"])
 
     @action(detail=True)
+    @teamConditional()
     def storage(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        teamState = TeamStateInfo.get_latest(pk).teamState
-        return Response({res.id: amount for res, amount in teamState.storage.items()})
+        return Response(getTeamReadModel(pk)["storage"])
 
     @action(detail=True)
+    @teamConditional()
     def employees(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        teamState = TeamStateInfo.get_latest(pk).teamState
-        return Response({res.id: amount for res, amount in teamState.employees.items()})
+        return Response(getTeamReadModel(pk)["employees"])
 
     @action(detail=True)
+    @teamConditional()
     def feeding(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        stateInfo = TeamStateInfo.get_latest(pk)
-
         return Response(
             # TODO: Add feeding info
             # stateSerialize(
-            #     computeFeedRequirements(
-            #         stateInfo.state, stateInfo.entities, stateInfo.teamEntity
-            #     )
+            #     computeFeedRequirements(state, entities, teamEntity)
             # )
         )
 
     @action(detail=True)
+    @teamConditional()
     def tiles(self, request: Request, pk: TeamId) -> Response:
         self.validateAccess(request.user, pk)
-        stateInfo = TeamStateInfo.get_latest(pk)
-        reachableTiles = stateInfo.state.map.getReachableTiles(stateInfo.teamEntity)
-
-        return Response(
-            {
-                tile.entity.id: serializeEntity(
-                    tile.entity,
-                    {
-                        "is_home": tile.entity == stateInfo.teamEntity.homeTile,
-                        "buildings": [x.id for x in tile.buildings],
-                        "building_upgrades": [x.id for x in tile.building_upgrades],
-                    },
-                )
-                for tile in reachableTiles
-            }
-        )
+        return Response(getTeamReadModel(pk)["tiles"])
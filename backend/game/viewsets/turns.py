@@ -1,3 +1,5 @@
+from typing import Optional
+
 from game.models import DbTurn
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
@@ -8,6 +10,8 @@ from rest_framework.request import Request
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 
+from game.viewsets.conditional import conditional
+
 
 class TurnImmutableError(APIException):
     status_code = 403
@@ -22,9 +26,28 @@ class DbTurnSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "startedAt"]
 
 
+def turnsVersion(*args) -> tuple:
+    # Turns are edited and started independently of the game state
+    return tuple(
+        DbTurn.objects.order_by("id").values_list(
+            "id", "enabled", "duration", "startedAt"
+        )
+    )
+
+
+def activeTurnVersion(*args) -> tuple:
+    # The active turn ends with time, without any change in the database
+    try:
+        activeId: Optional[int] = DbTurn.getActiveTurn().id
+    except DbTurn.DoesNotExist:
+        activeId = None
+    return turnsVersion(), activeId
+
+
 class TurnsViewSet(viewsets.ViewSet):
     permission_classes = (IsAuthenticated,)
 
+    @conditional(turnsVersion)
     def list(self, request):
         if not request.user.is_org:
             raise PermissionError()
@@ -52,6 +75,7 @@ class TurnsViewSet(viewsets.ViewSet):
         return Response(DbTurnSerializer(turn).data)
 
     @action(detail=False)
+    @conditional(activeTurnVersion)
     def active(self, request: Request) -> Response:
         try:
             turn = DbTurn.getActiveTurn()
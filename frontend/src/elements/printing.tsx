@@ -87,24 +87,34 @@ export function PrintStickers(props: {
 
     const handlePrint = () => {
         setIsPrinting(true);
+        let batches = new Map<number | undefined, Sticker[]>();
+        props.stickers.forEach((sticker) => {
+            let printerId =
+                sticker.entityId.startsWith("tec-") ||
+                sticker.entityId.startsWith("bui-") ||
+                sticker.entityId.startsWith("vyr")
+                    ? stickerPrinterObj?.id
+                    : paperPrinterObj?.id;
+            batches.set(printerId, [
+                ...(batches.get(printerId) ?? []),
+                sticker,
+            ]);
+        });
         Promise.all(
-            props.stickers.map(async (sticker) => {
+            Array.from(batches.entries()).map(async ([printerId, stickers]) => {
+                let ids = stickers.map((s) => s.id).join(", ");
                 return axiosService
-                    .post<{}>(`/game/stickers/${sticker.id}/print/`, {
-                        printerId:
-                            sticker.entityId.startsWith("tec-") ||
-                            sticker.entityId.startsWith("bui-") ||
-                            sticker.entityId.startsWith("vyr")
-                                ? stickerPrinterObj?.id
-                                : paperPrinterObj?.id,
+                    .post<{}>(`/game/stickers/printbatch/`, {
+                        printerId: printerId,
+                        stickers: stickers.map((s) => s.id),
                     })
                     .then(() => {
-                        toast.success(`Samolepka ${sticker.id} vytištěna`);
+                        toast.success(`Samolepky ${ids} zařazeny do tisku`);
                     })
                     .catch((error) => {
-                        console.error(`Tisk samolepky ${sticker.id}:`, error);
+                        console.error(`Tisk samolepek ${ids}:`, error);
                         toast.error(
-                            `Samolepka ${sticker.id}: neočekávaná chyba: ${error}`
+                            `Samolepky ${ids}: neočekávaná chyba: ${error}`
                         );
                     });
             })
@@ -9,8 +9,13 @@ import { fetcher } from "../utils/axios";
 import { useHideMenu } from "./atoms";
 
 export const pageAtom = atomWithHash<number>("page", 1);
+export const cursorAtom = atomWithHash<string | null>("cursor", null);
 export const pageSizeAtom = atomWithHash<number>("page_size", 100);
 
+function cursorOf(link: string): string | null {
+    return new URL(link).searchParams.get("cursor");
+}
+
 enum InteractionType {
     initiate = "initiate",
     commit = "commit",
@@ -23,8 +28,9 @@ interface Interaction {
     author?: string;
     created: Date | string;
     action: number;
-    actionObject: any;
-    trace: string;
+    // Only in complete actions, not in the list
+    actionObject?: any;
+    trace?: string;
     new_state: number;
 }
 
@@ -41,19 +47,25 @@ export function ActionLog() {
     useHideMenu();
 
     const [page, setPage] = useAtom(pageAtom);
+    const [cursor, setCursor] = useAtom(cursorAtom);
     const [pageSize, setPageSize] = useAtom(pageSizeAtom);
+    const cursorParam = _.isNil(cursor)
+        ? ""
+        : `&cursor=${encodeURIComponent(cursor)}`;
     const { data: actions, error } = useSWR<{
-        count: number;
         results: Action[];
         next?: string;
         previous?: string;
-    }>(`game/actions/logs?page=${page}&page_size=${pageSize}`, fetcher);
+    }>(`game/actions/logs?page_size=${pageSize}${cursorParam}`, fetcher);
 
     if (_.isNil(actions)) {
         return <LoadingOrError error={error} message="Něco se nepovedlo" />;
     }
 
-    const pageCount = _.ceil(actions.count / pageSize);
+    const goTo = (link: string, newPage: number) => {
+        setCursor(cursorOf(link));
+        setPage(newPage);
+    };
 
     return (
         <>
@@ -61,8 +73,7 @@ export function ActionLog() {
                 <div className="mx-4">
                     <h1 className="my-2">Log akcí</h1>
                     <div className="mx-2 w-full text-sm text-gray-400">
-                        zobrazeno {actions.results.length} z {actions.count}{" "}
-                        akcí
+                        zobrazeno {actions.results.length} akcí
                     </div>
                 </div>
                 <div className="mx-4 md:flex md:items-center">
@@ -75,9 +86,11 @@ export function ActionLog() {
                         <select
                             className="select"
                             value={pageSize}
-                            onChange={(e) =>
-                                setPageSize(parseInt(e.target.value))
-                            }
+                            onChange={(e) => {
+                                setPageSize(parseInt(e.target.value));
+                                setCursor(null);
+                                setPage(1);
+                            }}
                         >
                             {[20, 50, 100, 200].map((size, i) => (
                                 <option key={i} value={size}>
@@ -96,16 +109,16 @@ export function ActionLog() {
                     className="w-1/3"
                     label="Novější akce"
                     disabled={_.isNil(actions.previous)}
-                    onClick={() => setPage(page - 1)}
+                    onClick={() => goTo(actions.previous!, page - 1)}
                 />
                 <div className="m-auto w-1/3 text-center align-middle">
-                    Aktuální strana {page}/{pageCount}
+                    Aktuální strana {page}
                 </div>
                 <Button
                     className="w-1/3"
                     label="Starší akce"
                     disabled={_.isNil(actions.next)}
-                    onClick={() => setPage(page + 1)}
+                    onClick={() => goTo(actions.next!, page + 1)}
                 />
             </div>
         </>
@@ -115,6 +128,11 @@ export function ActionLog() {
 function ActionView(props: { action: Action }) {
     const action = props.action;
     const [expanded, setExpanded] = useState(false);
+    const { data: details } = useSWR<Action>(
+        expanded ? `game/actions/logs/${action.id}` : null,
+        fetcher
+    );
+    const interactions = (details ?? action).interactions;
 
     console.log("Action log:", action);
     const author = action.interactions[0]?.author;
@@ -167,7 +185,7 @@ function ActionView(props: { action: Action }) {
                         </div>
                         <div className="w-1/2">
                             <h4 className="font-bold">Interakce</h4>
-                            {action.interactions.map((i, k) => (
+                            {interactions.map((i, k) => (
                                 <InteractionView interaction={i} key={k} />
                             ))}
                         </div>
@@ -202,7 +220,7 @@ function InteractionView(props: { interaction: Interaction }) {
                     tabSize: 4,
                 }}
             />
-            <CiviMarkdown>{props.interaction.trace}</CiviMarkdown>
+            <CiviMarkdown>{props.interaction.trace ?? ""}</CiviMarkdown>
         </div>
     );
 }
@@ -372,6 +372,7 @@ export interface Printer {
     address: string;
     port: number;
     registeredAt: string;
+    lastSeen: string;
     printsStickers: boolean;
 }
 
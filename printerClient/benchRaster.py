@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compare printImage with the python-escpos graphics path it replaced
+"""
+import struct
+import time
+
+import click
+from escpos.printer import Dummy
+from PIL import Image, ImageDraw
+
+from printerClient import RASTER_BAND_ROWS, printImage, rasterCommands
+
+class CountingPrinter(Dummy):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def _raw(self, data):
+        self.writes += 1
+        super()._raw(data)
+
+def printImageGraphics(printer, image):
+    printer.image(image, impl="graphics")
+    printer.cut()
+
+def makeImage(height):
+    img = Image.new("1", (384, height), color=1)
+    draw = ImageDraw.Draw(img)
+    for y in range(0, height, 40):
+        draw.text((10, y), f"Řádek číslo {y} na samolepce", fill=0)
+        draw.rectangle((300, y, 300 + y % 70, y + 20), fill=0)
+    return img
+
+def unpackRaster(commands, width):
+    """
+    Decode GS v 0 commands back into an image to check the packing
+    """
+    rows = []
+    rowBytes = width // 8
+    offset = 0
+    while offset < len(commands):
+        _, _, _, _, xBytes, height = struct.unpack_from("<BBBBHH", commands, offset)
+        assert xBytes == rowBytes and height <= RASTER_BAND_ROWS
+        offset += 8
+        for _ in range(height):
+            rows.append(commands[offset:offset + rowBytes])
+            offset += rowBytes
+    return Image.frombytes("1", (width, len(rows)), b"".join(rows), "raw", "1;I")
+
+def measure(fn, image, repeat):
+    best = None
+    for _ in range(repeat):
+        printer = CountingPrinter()
+        start = time.perf_counter()
+        fn(printer, image)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, printer
+
+@click.command()
+@click.option("--height", type=int, default=1200, help="Height of the sticker in dots")
+@click.option("--repeat", type=int, default=3)
+def run(height, repeat):
+    image = makeImage(height)
+    decoded = unpackRaster(rasterCommands(image), image.size[0])
+    assert decoded.tobytes() == image.tobytes(), "Packed raster differs from the image"
+
+    graphicsTime, graphicsPrinter = measure(printImageGraphics, image, repeat)
+    rasterTime, rasterPrinter = measure(printImage, image, repeat)
+
+    print(f"Image 384×{height}")
+    print(f"    escpos graphics: {1000 * graphicsTime:.1f} ms, "
+        f"{len(graphicsPrinter.output)} bytes, {graphicsPrinter.writes} writes")
+    print(f"    printImage:      {1000 * rasterTime:.1f} ms, "
+        f"{len(rasterPrinter.output)} bytes, {rasterPrinter.writes} writes")
+    print(f"    speedup:         {graphicsTime / rasterTime:.0f}×")
+
+if __name__ == "__main__":
+    run()
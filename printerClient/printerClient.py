@@ -17,19 +17,32 @@ app.host = "0.0.0.0"
 
 printQueue = Queue()
 
+PRINTER_WIDTH = 384
+
 @app.route("/print", methods=["POST"])
 def printRoute():
+    # A request may carry several stickers; they are printed as one job
+    if "raster" in request.files:
+        # ESC/POS raster commands prepared by the server, sent as they are
+        printQueue.put([f.read() for f in request.files.getlist("raster")])
+        return {"status": "OK"}
     if "image" not in request.files:
         abort(400)
     # We have to use BytesIO as PIL accesses file after the request ends
-    img = Image.open(io.BytesIO(request.files["image"].read()))
-    printQueue.put(img)
+    printQueue.put([Image.open(io.BytesIO(f.read()))
+        for f in request.files.getlist("image")])
     return {"status": "OK"}
 
 def resizeToFit(image):
     w, h = image.size
-    ratio = 384 / w
-    return image.resize((384, int(h * ratio)))
+    ratio = PRINTER_WIDTH / w
+    return image.resize((PRINTER_WIDTH, int(h * ratio)))
+
+def isPrinterReady(image):
+    """
+    The server sends stickers already scaled and dithered for the printer
+    """
+    return image.mode == "1" and image.size[0] == PRINTER_WIDTH
 
 def setSpeed(port, speed):
     port.write(struct.pack("BBB", 0x1D, 0x2F, speed))
@@ -37,21 +50,39 @@ def setSpeed(port, speed):
 def setIntensity(port, intensity):
     port.write(struct.pack("BBB", 0x1D, 0x44, intensity))
 
-def sendImage(port, image):
-    bytesize = image.size[0] * image.size[1] // 8
-    port.write(struct.pack("BBBBBBBB", 0x1B, 0x2A,
-        bytesize % 256, (bytesize // 256) % 256, (bytesize // 65536) % 256,
-        0, 0, image.size[0] // 8))
-    for y in range(image.size[1]):
-        b = 0
-        for x in range(image.size[0]):
-            v = 0 if image.getpixel((x, y)) > 0 else 1
-            b = b | v
-            if x % 8 == 7:
-                port.write(struct.pack("B", b))
-                b = 0
-            else:
-                b *= 2
+WRITE_CHUNK = 4096
+RASTER_BAND_ROWS = 960
+
+def packRaster(image):
+    """
+    Pack the image into rows of bits, set bit for each black pixel. Trailing
+    columns that don't fill a whole byte are dropped.
+    """
+    width = image.size[0] // 8 * 8
+    if image.size[0] != width:
+        image = image.crop((0, 0, width, image.size[1]))
+    if image.mode != "1":
+        image = image.convert("L").point(lambda v: 255 if v > 0 else 0, mode="1")
+    # "1;I" packs inverted bits - PIL sets bits for white pixels
+    return image.tobytes("raw", "1;I")
+
+def rasterCommands(image):
+    """
+    ESC/POS raster bit image commands (GS v 0) of the image, split into bands
+    the printer buffers at once
+    """
+    data = packRaster(image)
+    rowBytes = image.size[0] // 8
+    commands = bytearray()
+    for top in range(0, image.size[1], RASTER_BAND_ROWS):
+        rows = min(RASTER_BAND_ROWS, image.size[1] - top)
+        commands += struct.pack("<BBBBHH", 0x1D, 0x76, 0x30, 0x00, rowBytes, rows)
+        commands += data[top * rowBytes:(top + rows) * rowBytes]
+    return bytes(commands)
+
+def writeRaw(printer, data):
+    for i in range(0, len(data), WRITE_CHUNK):
+        printer._raw(data[i:i + WRITE_CHUNK])
 
 def readLevel(port):
     port.write(struct.pack("BB", 0x1D, 0x6F))
@@ -76,7 +107,11 @@ def findEdge(port):
     feedForward(port, GAP + 9)
 
 def printImage(printer, image):
-    printer.image(image, impl="graphics")
+    if not isinstance(image, bytes):
+        if not isPrinterReady(image):
+            image = resizeToFit(image).convert("1")
+        image = rasterCommands(image)
+    writeRaw(printer, image)
     printer.cut()
 
 @click.command()
@@ -107,11 +142,12 @@ def run(name, server, port, dummy, stickers):
         except Exception as e:
             print(f"WARNING: Cannot connect to server: {e}")
         try:
-            img = printQueue.get(timeout=30)
-            if dummy:
-                print("Printing image")
-            else:
-                printImage(printer, img)
+            images = printQueue.get(timeout=30)
+            for img in images:
+                if dummy:
+                    print("Printing image")
+                else:
+                    printImage(printer, img)
         except Empty:
             pass
 